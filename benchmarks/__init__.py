@@ -0,0 +1 @@
+"""Benchmarks for the matching system (see matching_benchmark.py)."""
@@ -0,0 +1,267 @@
+"""
+Matching benchmark.
+
+Generates a synthetic population (see population.py) of N users and times
+every matching path on it:
+
+- candidate_index.rebuild            (narrow load of all eligible users)
+- find_best_match_for_user           (instant match, for a sample of users)
+- calculate_opposition_score         (per-pair score, for a sample of pairs)
+- score_bucket                       (batched scores of the largest bucket)
+- run_batch_matching optimal/greedy  (full pass, creates matches)
+
+For every path it reports wall time, database time and number of SQL
+statements (query_stats.count_queries), peak Python memory (tracemalloc)
+and the number of pairs created.
+
+Usage (from the repository root):
+
+    python -m benchmarks.matching_benchmark
+    python -m benchmarks.matching_benchmark --sizes 100,1000 \\
+        --database-url sqlite:////tmp/bench.db \\
+        --database-url postgresql://localhost/matching_bench
+
+THE DATABASE IS WIPED. URLs must contain "bench" (or pass --force).
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+DEFAULT_SIZES = "100,1000,10000,100000"
+FIND_SAMPLE = 100              # users for find_best_match_for_user
+PAIR_SAMPLE = 200              # pairs for calculate_opposition_score
+SCORE_BUCKET_MAX = 5000        # larger buckets need N x N matrices of several GB
+GREEDY_MAX_USERS = 10000       # greedy runs one lookup per user
+
+
+def create_benchmark_app(database_url):
+    """create_app() for a benchmark database: no scheduler, no mail sending."""
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["SCHEDULER_ENABLED"] = "false"
+    os.environ["BACKGROUND_SERVICES"] = "false"
+    os.environ["MAIL_QUEUE_WORKERS"] = "0"
+
+    from website import create_app
+
+    app = create_app()
+    app.extensions["mail"].suppress = True  # the pool then never opens an SMTP connection
+    return app
+
+
+def reset_database():
+    from website import db, initialize_opinion_dimensions
+    from website.dimension_registry import invalidate_registry
+
+    db.drop_all()
+    db.create_all()
+    initialize_opinion_dimensions()
+    invalidate_registry()
+
+
+def release_all_users():
+    """Undo a matching pass so the next path starts from the same population."""
+    from website import db
+    from website.models import Match, Notification, OutboxEmail, User
+    from website.candidate_index import candidate_index
+
+    Match.query.delete(synchronize_session=False)
+    OutboxEmail.query.delete(synchronize_session=False)
+    Notification.query.delete(synchronize_session=False)
+    User.query.update(
+        {User.haspartner: False, User.partner_id: None, User.meeting_id: None},
+        synchronize_session=False,
+    )
+    db.session.commit()
+    db.session.expunge_all()
+    candidate_index.rebuild()
+
+
+@contextmanager
+def quiet():
+    """Hide the [MATCH]/[MAIL] prints of the measured code."""
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        yield
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+
+def measure(name, fn, track_memory=True):
+    """Run fn() once and return its report row. fn returns the number of pairs (or None)."""
+    from website.query_stats import count_queries
+
+    if track_memory:
+        tracemalloc.start()
+
+    with count_queries() as counter, quiet():
+        started = time.perf_counter()
+        pairs = fn()
+        seconds = time.perf_counter() - started
+
+    peak = None
+    if track_memory:
+        peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+
+    return {
+        "path": name,
+        "seconds": round(seconds, 4),
+        "queries": counter.count,
+        "db_seconds": round(counter.total_time, 4),
+        "peak_mb": round(peak, 2) if peak is not None else None,
+        "pairs": pairs,
+    }
+
+
+def run_size(n, seed, track_memory=True, paths=None):
+    """Benchmark all paths on a fresh population of n users. Returns report rows."""
+    from website import db
+    from website.models import User
+    from website.matching_service import MatchingService
+    from website.candidate_index import candidate_index, load_candidates
+    from benchmarks.population import generate_population, insert_population, add_opinions
+
+    reset_database()
+    started = time.perf_counter()
+    user_ids = insert_population(generate_population(n, seed))
+    print(f"  population of {n} users inserted in {time.perf_counter() - started:.1f}s")
+
+    rnd = random.Random(seed)
+    eligible = load_candidates()
+    sample = rnd.sample(eligible, min(FIND_SAMPLE, len(eligible)))
+    pair_users = rnd.sample(user_ids, min(2 * PAIR_SAMPLE, len(user_ids)))
+    add_opinions(pair_users)
+
+    buckets = {}
+    for record in eligible:
+        buckets.setdefault((record.topic, record.language), []).append(record)
+    largest = max(buckets, key=lambda key: len(buckets[key]), default=None)
+
+    def wanted(name):
+        return paths is None or name in paths
+
+    rows = []
+
+    if wanted("index"):
+        rows.append(measure("candidate_index.rebuild", candidate_index.rebuild, track_memory))
+
+    if wanted("find"):
+        def find_for_sample():
+            candidate_index.rebuild()
+            for record in sample:
+                MatchingService.find_best_match_for_user(db.session.get(User, record.user_id))
+        rows.append(measure(f"find_best_match_for_user x{len(sample)}", find_for_sample, track_memory))
+
+    if wanted("pair"):
+        def score_pairs():
+            users = User.query.filter(User.id.in_(pair_users)).all()
+            for a, b in zip(users[0::2], users[1::2]):
+                MatchingService.calculate_opposition_score(a, b)
+        rows.append(measure(f"calculate_opposition_score x{len(pair_users) // 2}", score_pairs, track_memory))
+        db.session.expunge_all()
+
+    if wanted("bucket") and largest is not None:
+        size = len(buckets[largest])
+        if size <= SCORE_BUCKET_MAX:
+            rows.append(measure(
+                f"score_bucket ({size} users)",
+                lambda: MatchingService.score_bucket(*largest) and None,
+                track_memory,
+            ))
+        else:
+            print(f"  score_bucket skipped: largest bucket has {size} users (> {SCORE_BUCKET_MAX})")
+
+    if wanted("optimal"):
+        release_all_users()
+        rows.append(measure(
+            "run_batch_matching optimal",
+            lambda: MatchingService.run_batch_matching(mode="optimal")["matches_created"],
+            track_memory,
+        ))
+
+    if wanted("greedy"):
+        if n <= GREEDY_MAX_USERS:
+            release_all_users()
+            rows.append(measure(
+                "run_batch_matching greedy",
+                lambda: MatchingService.run_batch_matching(mode="greedy")["matches_created"],
+                track_memory,
+            ))
+        else:
+            print(f"  greedy skipped: {n} users (> {GREEDY_MAX_USERS})")
+
+    return rows
+
+
+def print_table(database, n, rows):
+    print(f"\n  {database} | N = {n}")
+    print(f"  {'path':<42} {'seconds':>10} {'db sec':>9} {'queries':>9} {'peak MB':>9} {'pairs':>7}")
+    for row in rows:
+        peak = "-" if row["peak_mb"] is None else f"{row['peak_mb']:.2f}"
+        pairs = "-" if row["pairs"] is None else row["pairs"]
+        print(
+            f"  {row['path']:<42} {row['seconds']:>10.4f} {row['db_seconds']:>9.4f} "
+            f"{row['queries']:>9} {peak:>9} {pairs:>7}"
+        )
+    print()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the matching paths on a synthetic population.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"comma-separated N values (default {DEFAULT_SIZES})")
+    parser.add_argument("--database-url", action="append", dest="database_urls",
+                        help="database to run on (repeatable); default: a temporary SQLite file")
+    parser.add_argument("--paths", help="only these paths: index,find,pair,bucket,optimal,greedy")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc (it slows Python code down)")
+    parser.add_argument("--json", help="also write all results to this file")
+    parser.add_argument("--force", action="store_true", help="allow database URLs without 'bench' in them")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    paths = set(args.paths.split(",")) if args.paths else None
+
+    database_urls = args.database_urls
+    if not database_urls:
+        database_urls = ["sqlite:///" + os.path.join(tempfile.gettempdir(), "matching_bench.db")]
+
+    for url in database_urls:
+        if "bench" not in url and not args.force:
+            parser.error(f"refusing to wipe {url}: the URL must contain 'bench' (or pass --force)")
+
+    results = []
+    for url in database_urls:
+        app = create_benchmark_app(url)
+        database = app.config["SQLALCHEMY_DATABASE_URI"].split("://", 1)[0]
+
+        with app.app_context():
+            for n in sizes:
+                print(f"[BENCH] {database}: N = {n}")
+                rows = run_size(n, args.seed, track_memory=not args.no_memory, paths=paths)
+                print_table(database, n, rows)
+                results.extend({"database": database, "n": n, **row} for row in rows)
+
+            from website import db
+            db.session.remove()
+            db.engine.dispose()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"[BENCH] Results written to {args.json}")
+
+    return results
+
+
+if __name__ == "__main__":
+    main()
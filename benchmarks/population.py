@@ -0,0 +1,149 @@
+"""
+This file generates a synthetic study population for the matching benchmark.
+
+The distributions follow what the real forms allow:
+- topic: the 10 topics of the index page, a few much more popular than others
+- language: "en" or "de" (demographics form), more English than German
+- time slots: 3 of the 28 weekly slots (time_slots.SLOT_HOURS on 7 days),
+  with evenings and the weekend more popular; some users give fewer slots
+- attitude1..5 / match1..10: -2..+2 answers around a personal tendency,
+  openness_score is their average (as in save_questionnaire_responses)
+"""
+
+import random
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import insert
+
+from website import db
+from website.models import User, UserOpinion
+from website.feature_vectors import MATCH_FIELDS, features_from_user, pack_features
+from website.dimension_registry import get_registry
+from website.time_slots import SLOT_COUNT, SLOT_HOURS, encode_slots, slot_value
+
+
+TOPICS = [
+    ("climate_disobedience", 18),
+    ("ai_employment", 16),
+    ("universal_basic_income", 12),
+    ("freedom_speech", 11),
+    ("data_ownership", 9),
+    ("facial_privacy", 8),
+    ("digital_education", 8),
+    ("mental_health_overload", 7),
+    ("automation_inequality", 6),
+    ("ethical_fast_fashion", 5),
+]
+LANGUAGES = [("en", 60), ("de", 40)]
+HOUR_WEIGHTS = {11: 2, 13: 3, 15: 3, 18: 6}
+WEEKEND_WEIGHT = 1.5
+
+INSERT_CHUNK = 5000
+
+
+def weekly_slots(start=None):
+    """The 28 slot values of one week (like generate_time_slots) with their popularity."""
+    start = start or date.today()
+    days_until_sunday = (6 - start.weekday()) % 7
+    first_day = start + timedelta(days=days_until_sunday)
+
+    slots = []
+    for bit in range(SLOT_COUNT):
+        value = slot_value(first_day, bit)
+        day = datetime.fromisoformat(value)
+        day_weight = WEEKEND_WEIGHT if day.weekday() >= 5 else 1.0
+        slots.append((value, day_weight * HOUR_WEIGHTS[SLOT_HOURS[bit % len(SLOT_HOURS)]]))
+    return slots
+
+
+def _answer(rnd, tendency, spread):
+    return max(-2, min(2, round(rnd.gauss(tendency, spread))))
+
+
+def _weighted_sample(rnd, items, weights, k):
+    """k distinct items, drawn by weight."""
+    chosen = []
+    items, weights = list(items), list(weights)
+    for _ in range(min(k, len(items))):
+        index = rnd.choices(range(len(items)), weights=weights)[0]
+        chosen.append(items.pop(index))
+        weights.pop(index)
+    return chosen
+
+
+def generate_population(n, seed=1):
+    """Return n user rows (dicts of User columns)."""
+    rnd = random.Random(seed)
+    slot_values, slot_weights = zip(*weekly_slots())
+    topics, topic_weights = zip(*TOPICS)
+    languages, language_weights = zip(*LANGUAGES)
+
+    rows = []
+    for i in range(n):
+        openness_tendency = rnd.gauss(0.6, 0.8)
+        attitudes = [_answer(rnd, openness_tendency, 0.7) for _ in range(5)]
+        openness = sum(attitudes) / len(attitudes)
+
+        stance = rnd.gauss(0.0, 1.0)
+        answers = {field: _answer(rnd, stance * 1.2, 0.7) for field in MATCH_FIELDS}
+        if rnd.random() < 0.03:
+            answers[rnd.choice(MATCH_FIELDS)] = None  # a skipped answer
+
+        slot_count = rnd.choices([1, 2, 3], weights=[5, 10, 85])[0]
+        slots = _weighted_sample(rnd, slot_values, slot_weights, slot_count)
+        slots += [None] * (3 - len(slots))
+
+        row = {
+            "email": f"bench{i}@example.invalid",
+            "user_name": f"bench{i}",
+            "demo": rnd.random() < 0.9,
+            "topic": rnd.choices(topics, weights=topic_weights)[0],
+            "language": rnd.choices(languages, weights=language_weights)[0],
+            "time_slot_1": slots[0],
+            "time_slot_2": slots[1],
+            "time_slot_3": slots[2],
+            "openness_score": openness,
+            "is_extremist": openness < 0.0,
+            "haspartner": False,
+            "hasarrived": False,
+            **{f"attitude{k}": value for k, value in enumerate(attitudes, start=1)},
+            **answers,
+        }
+
+        # Bulk inserts skip the mapper events, so the derived columns are set here
+        row["matching_features"] = pack_features(features_from_user(SimpleNamespace(**answers)))
+        row["availability_week"], row["availability_mask"] = encode_slots(slots)
+        rows.append(row)
+
+    return rows
+
+
+def insert_population(rows):
+    """Insert the rows with bulk INSERTs. Returns the new user ids (in order)."""
+    ids = []
+    for start in range(0, len(rows), INSERT_CHUNK):
+        chunk = rows[start:start + INSERT_CHUNK]
+        ids.extend(db.session.scalars(insert(User).returning(User.id, sort_by_parameter_order=True), chunk))
+    db.session.commit()
+    return ids
+
+
+def add_opinions(user_ids):
+    """Store the match1..match10 answers of these users as UserOpinion rows."""
+    registry = get_registry()
+    users = db.session.query(User.id, *[getattr(User, field) for field in MATCH_FIELDS]).filter(
+        User.id.in_(list(user_ids))
+    ).all()
+
+    rows = []
+    for user in users:
+        for number, field in enumerate(MATCH_FIELDS, start=1):
+            dimension = registry.get_by_number("matching", number)
+            value = getattr(user, field)
+            if dimension is not None and value is not None:
+                rows.append({"user_id": user.id, "dimension_id": dimension.id, "score": float(value)})
+
+    if rows:
+        db.session.execute(insert(UserOpinion), rows)
+    db.session.commit()
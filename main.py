@@ -1,3 +1,13 @@
+try:
+    from gevent import monkey
+except ImportError:
+    monkey = None
+
+if monkey is not None and monkey.is_module_patched("socket"):
+    # gunicorn --worker-class gevent: psycopg2 waits for the database without blocking the other greenlets
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
+
 from website import create_app
 
 app = create_app()
@@ -0,0 +1,69 @@
+"""user.matching_features (packed match1..match10)
+
+Adds the column and fills it in for all existing users (see
+feature_vectors.py).
+
+db.create_all() creates the column for a new database already, so the
+upgrade checks first whether it is there.
+
+Revision ID: 2e7a9c5b3d16
+Revises: 7d4b1e6a2c83
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from website.feature_vectors import MATCH_FIELDS, features_from_user, pack_features
+
+
+# revision identifiers, used by Alembic.
+revision = '2e7a9c5b3d16'
+down_revision = '7d4b1e6a2c83'
+branch_labels = None
+depends_on = None
+
+
+def _backfill_matching_features():
+    """Compute the packed vector for every user that has none yet (see feature_vectors.py)."""
+    bind = op.get_bind()
+    user = sa.table(
+        'user',
+        sa.column('id', sa.Integer),
+        sa.column('matching_features', sa.LargeBinary),
+        *[sa.column(field, sa.Integer) for field in MATCH_FIELDS],
+    )
+
+    rows = bind.execute(
+        sa.select(user.c.id, *[user.c[field] for field in MATCH_FIELDS])
+        .where(user.c.matching_features.is_(None))
+    ).all()
+
+    updates = [
+        {'user_id': row.id, 'features': pack_features(features_from_user(row))}
+        for row in rows
+    ]
+
+    if updates:
+        bind.execute(
+            user.update()
+            .where(user.c.id == sa.bindparam('user_id'))
+            .values(matching_features=sa.bindparam('features')),
+            updates,
+        )
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    user_columns = {c['name'] for c in inspector.get_columns('user')}
+    if 'matching_features' not in user_columns:
+        with op.batch_alter_table('user') as batch_op:
+            batch_op.add_column(sa.Column('matching_features', sa.LargeBinary(), nullable=True))
+
+    _backfill_matching_features()
+
+
+def downgrade():
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.drop_column('matching_features')
@@ -0,0 +1,84 @@
+"""indexes for the matching queries
+
+- partial index on eligible, unmatched users by (topic, language)
+- matches: user_a_id, user_b_id, (status, expires_at)
+- scheduled_emails: send_at of unsent emails (replaces ix_scheduled_emails_sent_send_at)
+
+db.create_all() creates all of this for a new database already, so every
+step checks first whether the index is there.
+
+Revision ID: 3f1c2a9d7b10
+Revises: 2e7a9c5b3d16
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a9d7b10'
+down_revision = '2e7a9c5b3d16'
+branch_labels = None
+depends_on = None
+
+
+ELIGIBLE_USER_PREDICATE = {
+    'postgresql': "demo IS true AND is_extremist IS false "
+                  "AND (haspartner IS false OR haspartner IS NULL) AND openness_score IS NOT NULL",
+    'sqlite': "demo IS 1 AND is_extremist IS 0 "
+              "AND (haspartner IS 0 OR haspartner IS NULL) AND openness_score IS NOT NULL",
+}
+UNSENT_PREDICATE = {
+    'postgresql': "sent IS false",
+    'sqlite': "sent IS 0",
+}
+
+
+def _existing_indexes(inspector, table):
+    return {ix['name'] for ix in inspector.get_indexes(table)}
+
+
+def _partial(predicates):
+    return {
+        'postgresql_where': sa.text(predicates['postgresql']),
+        'sqlite_where': sa.text(predicates['sqlite']),
+    }
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    if 'ix_user_eligible_topic_language' not in _existing_indexes(inspector, 'user'):
+        op.create_index(
+            'ix_user_eligible_topic_language', 'user', ['topic', 'language'],
+            **_partial(ELIGIBLE_USER_PREDICATE)
+        )
+
+    match_indexes = _existing_indexes(inspector, 'matches')
+    if 'ix_matches_user_a_id' not in match_indexes:
+        op.create_index('ix_matches_user_a_id', 'matches', ['user_a_id'])
+    if 'ix_matches_user_b_id' not in match_indexes:
+        op.create_index('ix_matches_user_b_id', 'matches', ['user_b_id'])
+    if 'ix_matches_status_expires_at' not in match_indexes:
+        op.create_index('ix_matches_status_expires_at', 'matches', ['status', 'expires_at'])
+
+    email_indexes = _existing_indexes(inspector, 'scheduled_emails')
+    if 'ix_scheduled_emails_sent_send_at' in email_indexes:
+        op.drop_index('ix_scheduled_emails_sent_send_at', table_name='scheduled_emails')
+    if 'ix_scheduled_emails_unsent_send_at' not in email_indexes:
+        op.create_index(
+            'ix_scheduled_emails_unsent_send_at', 'scheduled_emails', ['send_at'],
+            **_partial(UNSENT_PREDICATE)
+        )
+
+
+def downgrade():
+    op.drop_index('ix_scheduled_emails_unsent_send_at', table_name='scheduled_emails')
+    op.create_index('ix_scheduled_emails_sent_send_at', 'scheduled_emails', ['sent', 'send_at'])
+
+    op.drop_index('ix_matches_status_expires_at', table_name='matches')
+    op.drop_index('ix_matches_user_b_id', table_name='matches')
+    op.drop_index('ix_matches_user_a_id', table_name='matches')
+
+    op.drop_index('ix_user_eligible_topic_language', table_name='user')
@@ -0,0 +1,46 @@
+"""outbox_emails table (outgoing mail drained by the mail worker pool)
+
+db.create_all() creates the table for a new database already, so the
+upgrade checks first whether it is there.
+
+Revision ID: 5a9e3c1f0b42
+Revises:
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a9e3c1f0b42'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'outbox_emails' in inspector.get_table_names():
+        return
+
+    op.create_table(
+        'outbox_emails',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('recipients', sa.Text(), nullable=False),
+        sa.Column('subject', sa.String(length=200), nullable=False),
+        sa.Column('body', sa.Text(), nullable=True),
+        sa.Column('body_html', sa.Text(), nullable=True),
+        sa.Column('sender', sa.String(length=200), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade():
+    op.drop_table('outbox_emails')
@@ -0,0 +1,30 @@
+"""(sent, send_at) index on scheduled_emails for the email dispatcher
+
+db.create_all() creates the index for a new database already, so the
+upgrade checks first whether it is there.
+
+Revision ID: 6c2f8a4d9e15
+Revises: 5a9e3c1f0b42
+Create Date: 2026-10-17 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6c2f8a4d9e15'
+down_revision = '5a9e3c1f0b42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'ix_scheduled_emails_sent_send_at' in {ix['name'] for ix in inspector.get_indexes('scheduled_emails')}:
+        return
+    op.create_index('ix_scheduled_emails_sent_send_at', 'scheduled_emails', ['sent', 'send_at'])
+
+
+def downgrade():
+    op.drop_index('ix_scheduled_emails_sent_send_at', table_name='scheduled_emails')
@@ -0,0 +1,46 @@
+"""matching_events and scheduler_leases tables (scheduler leader election)
+
+db.create_all() creates the tables for a new database already, so the
+upgrade checks first whether they are there.
+
+Revision ID: 7d4b1e6a2c83
+Revises: 6c2f8a4d9e15
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d4b1e6a2c83'
+down_revision = '6c2f8a4d9e15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    tables = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'matching_events' not in tables:
+        op.create_table(
+            'matching_events',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+        )
+
+    if 'scheduler_leases' not in tables:
+        op.create_table(
+            'scheduler_leases',
+            sa.Column('name', sa.String(length=100), nullable=False),
+            sa.Column('holder', sa.String(length=200), nullable=False),
+            sa.Column('expires_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('name'),
+        )
+
+
+def downgrade():
+    op.drop_table('scheduler_leases')
+    op.drop_table('matching_events')
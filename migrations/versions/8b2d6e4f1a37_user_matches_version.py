@@ -0,0 +1,35 @@
+"""user.matches_version for the ETag of /api/matching/matches
+
+db.create_all() creates the column for a new database already, so the
+upgrade checks first whether it is there.
+
+Revision ID: 8b2d6e4f1a37
+Revises: 3f1c2a9d7b10
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2d6e4f1a37'
+down_revision = '3f1c2a9d7b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    user_columns = {c['name'] for c in inspector.get_columns('user')}
+    if 'matches_version' not in user_columns:
+        with op.batch_alter_table('user') as batch_op:
+            batch_op.add_column(
+                sa.Column('matches_version', sa.Integer(), nullable=False, server_default='0')
+            )
+
+
+def downgrade():
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.drop_column('matches_version')
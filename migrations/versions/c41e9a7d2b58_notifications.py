@@ -0,0 +1,53 @@
+"""notifications table (structured email payloads, rendered in the background)
+
+db.create_all() creates the table for a new database already, so the
+upgrade checks first whether it is there.
+
+Revision ID: c41e9a7d2b58
+Revises: 8b2d6e4f1a37
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41e9a7d2b58'
+down_revision = '8b2d6e4f1a37'
+branch_labels = None
+depends_on = None
+
+
+PENDING_PREDICATE = "status = 'pending'"
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'notifications' in inspector.get_table_names():
+        return
+
+    op.create_table(
+        'notifications',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=30), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=True),
+        sa.Column('send_at', sa.DateTime(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('rendered_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_notifications_pending_send_at', 'notifications', ['send_at'],
+        postgresql_where=sa.text(PENDING_PREDICATE),
+        sqlite_where=sa.text(PENDING_PREDICATE),
+    )
+
+
+def downgrade():
+    op.drop_index('ix_notifications_pending_send_at', table_name='notifications')
+    op.drop_table('notifications')
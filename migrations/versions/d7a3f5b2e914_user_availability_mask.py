@@ -0,0 +1,79 @@
+"""user.availability_week / user.availability_mask (time slots as bits)
+
+Adds the columns and fills them in from time_slot_1..3 for all existing
+users (see time_slots.py). Slots that are not on the form's slot grid
+stay only in the string columns.
+
+db.create_all() creates the columns for a new database already, so the
+upgrade checks first whether they are there.
+
+Revision ID: d7a3f5b2e914
+Revises: c41e9a7d2b58
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from website.time_slots import encode_slots
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7a3f5b2e914'
+down_revision = 'c41e9a7d2b58'
+branch_labels = None
+depends_on = None
+
+
+SLOT_FIELDS = ['time_slot_1', 'time_slot_2', 'time_slot_3']
+
+
+def _backfill_availability():
+    """Encode the string slots of every user that has no mask yet."""
+    bind = op.get_bind()
+    user = sa.table(
+        'user',
+        sa.column('id', sa.Integer),
+        sa.column('availability_week', sa.Date),
+        sa.column('availability_mask', sa.Integer),
+        *[sa.column(field, sa.String) for field in SLOT_FIELDS],
+    )
+
+    rows = bind.execute(
+        sa.select(user.c.id, *[user.c[field] for field in SLOT_FIELDS])
+        .where(user.c.availability_mask.is_(None))
+    ).all()
+
+    updates = []
+    for row in rows:
+        week, mask = encode_slots([row.time_slot_1, row.time_slot_2, row.time_slot_3])
+        if mask:
+            updates.append({'user_id': row.id, 'week': week, 'mask': mask})
+
+    if updates:
+        bind.execute(
+            user.update()
+            .where(user.c.id == sa.bindparam('user_id'))
+            .values(availability_week=sa.bindparam('week'), availability_mask=sa.bindparam('mask')),
+            updates,
+        )
+    print(f"Encoded the time slots of {len(updates)} of {len(rows)} users")
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    user_columns = {c['name'] for c in inspector.get_columns('user')}
+    with op.batch_alter_table('user') as batch_op:
+        if 'availability_week' not in user_columns:
+            batch_op.add_column(sa.Column('availability_week', sa.Date(), nullable=True))
+        if 'availability_mask' not in user_columns:
+            batch_op.add_column(sa.Column('availability_mask', sa.Integer(), nullable=True))
+
+    _backfill_availability()
+
+
+def downgrade():
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.drop_column('availability_mask')
+        batch_op.drop_column('availability_week')
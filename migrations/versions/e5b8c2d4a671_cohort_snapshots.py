@@ -0,0 +1,91 @@
+"""cohort_snapshots table (opinion shift aggregates per topic + language)
+
+Creates the table and fills it in from the answers of all existing users
+(see cohort_analytics.py). Afterwards every post-questionnaire updates its
+cohort's row.
+
+db.create_all() creates the table for a new database already, so the
+upgrade checks first whether it is there.
+
+Revision ID: e5b8c2d4a671
+Revises: d7a3f5b2e914
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+from website.cohort_analytics import (
+    MATCH_FIELDS, POST_MATCH_FIELDS, cohort_key, compute_snapshots, response_arrays, stats_to_json,
+)
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b8c2d4a671'
+down_revision = 'd7a3f5b2e914'
+branch_labels = None
+depends_on = None
+
+
+def _backfill_snapshots():
+    """Aggregate the answers of every user into one row per cohort."""
+    bind = op.get_bind()
+    user = sa.table(
+        'user',
+        sa.column('topic', sa.String),
+        sa.column('language', sa.String),
+        *[sa.column(field, sa.Integer) for field in MATCH_FIELDS + POST_MATCH_FIELDS],
+    )
+    snapshots_table = sa.table(
+        'cohort_snapshots',
+        sa.column('topic', sa.String),
+        sa.column('language', sa.String),
+        sa.column('users', sa.Integer),
+        sa.column('stats', sa.JSON),
+        sa.column('updated_at', sa.DateTime),
+    )
+
+    rows = bind.execute(
+        sa.select(user.c.topic, user.c.language, *[user.c[field] for field in MATCH_FIELDS + POST_MATCH_FIELDS])
+    ).all()
+    before, after = response_arrays([row[2:] for row in rows])
+    snapshots = compute_snapshots([cohort_key(row[0], row[1]) for row in rows], before, after)
+
+    now = datetime.utcnow()
+    if snapshots:
+        bind.execute(snapshots_table.insert(), [
+            {
+                'topic': topic,
+                'language': language,
+                'users': int(stats['users']),
+                'stats': stats_to_json(stats),
+                'updated_at': now,
+            }
+            for (topic, language), stats in snapshots.items()
+        ])
+    print(f"Aggregated {len(rows)} users into {len(snapshots)} cohort snapshots")
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'cohort_snapshots' not in inspector.get_table_names():
+        op.create_table(
+            'cohort_snapshots',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('topic', sa.String(length=100), nullable=False),
+            sa.Column('language', sa.String(length=10), nullable=False),
+            sa.Column('users', sa.Integer(), nullable=False),
+            sa.Column('stats', sa.JSON(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('topic', 'language', name='uq_cohort_snapshots_topic_language'),
+        )
+
+    if op.get_bind().execute(sa.text('SELECT COUNT(*) FROM cohort_snapshots')).scalar() == 0:
+        _backfill_snapshots()
+
+
+def downgrade():
+    op.drop_table('cohort_snapshots')
@@ -0,0 +1,35 @@
+"""notifications.attempts, so failed notifications are retried with backoff
+
+db.create_all() creates the column for a new database already, so the
+upgrade checks first whether it is there.
+
+Revision ID: f3a6d9c1b824
+Revises: e5b8c2d4a671
+Create Date: 2026-10-17 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a6d9c1b824'
+down_revision = 'e5b8c2d4a671'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    notification_columns = {c['name'] for c in inspector.get_columns('notifications')}
+    if 'attempts' not in notification_columns:
+        with op.batch_alter_table('notifications') as batch_op:
+            batch_op.add_column(
+                sa.Column('attempts', sa.Integer(), nullable=False, server_default='0')
+            )
+
+
+def downgrade():
+    with op.batch_alter_table('notifications') as batch_op:
+        batch_op.drop_column('attempts')
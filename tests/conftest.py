@@ -0,0 +1,45 @@
+"""
+This file contains the shared pytest fixtures.
+
+The pure matching modules are tested without a database; `app` builds the
+real application on a temporary SQLite database with all background
+services (mail workers, matching scheduler) turned off.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    database = tmp_path_factory.mktemp("db") / "test.db"
+    os.environ["DATABASE_URL"] = f"sqlite:///{database}"
+    os.environ["BACKGROUND_SERVICES"] = "false"
+    os.environ["SCHEDULER_ENABLED"] = "false"
+    os.environ["MAIL_QUEUE_WORKERS"] = "0"
+
+    from website import create_app
+
+    app = create_app()
+    app.config["TESTING"] = True
+    return app
+
+
+@pytest.fixture
+def db_session(app):
+    """An app context whose users, matches, notifications and cohort snapshots are removed afterwards."""
+    from website import db
+    from website.models import CohortSnapshot, Match, Notification, User
+
+    with app.app_context():
+        yield db.session
+        db.session.rollback()
+        CohortSnapshot.query.delete()
+        Notification.query.delete()
+        Match.query.delete()
+        User.query.delete()
+        db.session.commit()
@@ -0,0 +1,43 @@
+import pytest
+
+from website.models import User
+
+
+@pytest.fixture
+def client(app, db_session, monkeypatch):
+    monkeypatch.setitem(app.config, "ADMIN_EMAILS", {"admin@example.org"})
+    return app.test_client()
+
+
+def login(client, session, email):
+    user = User(email=email, user_name=email.split("@")[0])
+    session.add(user)
+    session.commit()
+    user_id = str(user.id)
+    with client.session_transaction() as flask_session:
+        flask_session["_user_id"] = user_id
+        flask_session["_fresh"] = True
+
+
+@pytest.mark.parametrize("url", ["/admin/export/participants", "/admin/cohort_stats", "/admin/mail_queue"])
+def test_admin_routes_reject_other_users(client, db_session, url):
+    login(client, db_session, "someone@example.org")
+
+    assert client.get(url).status_code == 403
+
+
+def test_admin_routes_need_a_login(client):
+    response = client.get("/admin/export/participants")
+
+    assert response.status_code == 302
+    assert "/login" in response.headers["Location"]
+
+
+def test_admin_can_export(client, db_session):
+    login(client, db_session, "Admin@example.org")
+
+    response = client.get("/admin/export/participants")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/csv"
+    assert b"admin@example.org" not in response.data.lower()
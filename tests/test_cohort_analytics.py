@@ -0,0 +1,48 @@
+from website.cohort_analytics import MATCH_FIELDS, POST_MATCH_FIELDS, record_post_questionnaire
+from website.models import CohortSnapshot, User
+
+
+def make_user(session, name, before, after):
+    user = User(email=f"{name}@example.org", user_name=name, topic="climate", language="en",
+                **dict(zip(MATCH_FIELDS, before)), **dict(zip(POST_MATCH_FIELDS, after)))
+    session.add(user)
+    session.commit()
+    return user
+
+
+def test_first_submission_creates_the_snapshot(db_session):
+    user = make_user(db_session, "a", [1] * 10, [3] * 10)
+
+    record_post_questionnaire(user)
+    db_session.commit()
+
+    snapshot = CohortSnapshot.query.one()
+    assert (snapshot.topic, snapshot.language, snapshot.users) == ("climate", "en", 1)
+
+
+def test_submission_after_a_concurrent_first_insert(db_session):
+    # Another request created the (still empty) row between our check and insert
+    db_session.add(CohortSnapshot(topic="climate", language="en", users=0))
+    db_session.commit()
+    user = make_user(db_session, "a", [1] * 10, [3] * 10)
+
+    record_post_questionnaire(user)
+    db_session.commit()
+
+    assert CohortSnapshot.query.one().users == 1
+
+
+def test_resubmission_replaces_the_previous_answers(db_session):
+    first = make_user(db_session, "a", [1] * 10, [3] * 10)
+    second = make_user(db_session, "b", [2] * 10, [2] * 10)
+    record_post_questionnaire(first)
+    record_post_questionnaire(second)
+    db_session.commit()
+
+    first.post_match1_support = 5
+    record_post_questionnaire(first, previous_answers=[3] * 10)
+    db_session.commit()
+
+    snapshot = CohortSnapshot.query.one()
+    assert snapshot.users == 2
+    assert snapshot.stats["after_sum"][0] == 7
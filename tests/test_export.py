@@ -0,0 +1,123 @@
+import csv
+import io
+import os
+import tempfile
+from datetime import datetime
+
+import pytest
+
+from website import views
+from website.export import ExportError, iter_csv, parse_date
+from website.matching_service import MatchingService
+from website.models import User
+
+
+@pytest.fixture
+def participants(db_session):
+    users = [
+        User(email="a@example.org", user_name="a", topic="climate", language="en", created_at=datetime(2026, 1, 5)),
+        User(email="b@example.org", user_name="b", topic="climate", language="en", created_at=datetime(2026, 2, 5)),
+        User(email="c@example.org", user_name="c", topic="climate", language="de", created_at=datetime(2026, 2, 6)),
+        User(email="d@example.org", user_name="d", topic="migration", language="de", created_at=datetime(2026, 3, 1)),
+        User(email="e@example.org", user_name="e", topic="migration", language="de", created_at=datetime(2026, 3, 2)),
+    ]
+    db_session.add_all(users)
+    db_session.commit()
+    return users
+
+
+def exported_ids(dataset, **filters):
+    text = "".join(iter_csv(dataset, **filters))
+    return [int(row["id"]) for row in csv.DictReader(io.StringIO(text))]
+
+
+def test_participant_filters(participants):
+    a, b, c, d, e = (user.id for user in participants)
+
+    assert exported_ids("participants") == [a, b, c, d, e]
+    assert exported_ids("participants", topic="climate") == [a, b, c]
+    assert exported_ids("participants", language="de") == [c, d, e]
+    assert exported_ids("participants", topic="climate", language="de") == [c]
+    assert exported_ids("participants", since=parse_date("2026-02-05")) == [b, c, d, e]
+    # A plain `until` date includes the whole day
+    assert exported_ids("participants", until=parse_date("2026-02-05", end=True)) == [a, b]
+    assert exported_ids("participants", since=parse_date("2026-02-01"), until=parse_date("2026-03-01", end=True)) == [b, c, d]
+
+
+def test_match_filters(participants):
+    a, b, c, d, e = participants
+    climate = MatchingService.create_match(a, b, 1.0, "ideal_match")
+    migration = MatchingService.create_match(d, e, 1.0, "ideal_match")
+
+    assert exported_ids("matches") == [climate.id, migration.id]
+    assert exported_ids("matches", topic="migration") == [migration.id]
+    assert exported_ids("matches", language="en") == [climate.id]
+
+
+def test_csv_is_streamed_in_chunks(participants):
+    chunks = list(iter_csv("participants", chunk_size=2))
+
+    assert len(chunks) == 3  # header + 2 rows, 2 rows, 1 row
+    assert chunks[0].startswith("id,topic,language,")
+    assert sum(chunk.count("\n") for chunk in chunks) == 1 + len(participants)
+
+
+def test_invalid_exports_are_rejected():
+    with pytest.raises(ExportError):
+        parse_date("05.02.2026")
+    with pytest.raises(ExportError):
+        list(iter_csv("passwords"))
+
+
+@pytest.fixture
+def admin_client(app, db_session, monkeypatch):
+    monkeypatch.setitem(app.config, "ADMIN_EMAILS", {"admin@example.org"})
+    admin = User(email="admin@example.org", user_name="admin")
+    db_session.add(admin)
+    db_session.commit()
+    admin_id = str(admin.id)
+
+    client = app.test_client()
+    with client.session_transaction() as flask_session:
+        flask_session["_user_id"] = admin_id
+        flask_session["_fresh"] = True
+    return client
+
+
+def test_route_streams_filtered_csv(admin_client, participants):
+    expected = [participants[4].id]
+
+    response = admin_client.get("/admin/export/participants?topic=migration&since=2026-03-02")
+
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert [int(row["id"]) for row in csv.DictReader(io.StringIO(response.get_data(as_text=True)))] == expected
+
+
+def test_route_validates_before_creating_a_temporary_file(admin_client, monkeypatch):
+    created = []
+    monkeypatch.setattr(views.tempfile, "NamedTemporaryFile", lambda **kwargs: created.append(kwargs))
+
+    assert admin_client.get("/admin/export/passwords?format=parquet").status_code == 400
+    assert admin_client.get("/admin/export/participants?format=xlsx").status_code == 400
+    assert created == []
+
+
+def test_route_removes_the_temporary_file_of_a_failed_export(admin_client, monkeypatch):
+    files = []
+    original = tempfile.NamedTemporaryFile
+
+    def named_temporary_file(**kwargs):
+        files.append(original(**kwargs))
+        return files[-1]
+
+    def export_to_file(*args, **kwargs):
+        raise ExportError("Parquet / Arrow export needs the pyarrow package (pip install pyarrow)")
+
+    monkeypatch.setattr(views.tempfile, "NamedTemporaryFile", named_temporary_file)
+    monkeypatch.setattr(views, "export_to_file", export_to_file)
+
+    assert admin_client.get("/admin/export/participants?format=parquet").status_code == 400
+    assert len(files) == 1
+    assert files[0].closed
+    assert not os.path.exists(files[0].name)
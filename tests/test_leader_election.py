@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from website import MatchingScheduler, notify_eligibility_change
+from website.leader_election import LeaderElection
+from website.models import MatchingEvent, SchedulerLease
+
+
+@pytest.fixture
+def session(db_session):
+    yield db_session
+    SchedulerLease.query.delete()
+    MatchingEvent.query.delete()
+    db_session.commit()
+
+
+def test_only_one_process_holds_the_lease(app, session):
+    changes = []
+    first = LeaderElection(app, "test-job", on_change=changes.append)
+    second = LeaderElection(app, "test-job")
+
+    assert first.ensure()
+    assert not second.ensure()
+    assert first.ensure()  # renewing its own lease
+    assert changes == [True]
+    assert session.get(SchedulerLease, "test-job").holder == first.holder
+
+
+def test_expired_lease_is_taken_over(app, session):
+    first = LeaderElection(app, "test-job")
+    second = LeaderElection(app, "test-job")
+    assert first.ensure()
+
+    lease = session.get(SchedulerLease, "test-job")
+    lease.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    session.commit()
+
+    assert second.ensure()
+    assert not first.ensure()
+    assert not first.is_leader
+
+
+def test_release_hands_leadership_over(app, session):
+    changes = []
+    first = LeaderElection(app, "test-job", on_change=changes.append)
+    second = LeaderElection(app, "test-job")
+    assert first.ensure()
+
+    first.release()
+
+    assert changes == [True, False]
+    assert session.get(SchedulerLease, "test-job") is None
+    assert second.ensure()
+
+
+def test_events_are_not_stored_without_a_scheduler(app, session):
+    assert not app.config["SCHEDULER_ENABLED"]
+
+    notify_eligibility_change(1, 2)
+    session.commit()
+
+    assert MatchingEvent.query.count() == 0
+
+
+def test_events_join_the_callers_transaction(app, session, monkeypatch):
+    monkeypatch.setitem(app.config, "SCHEDULER_ENABLED", True)
+
+    notify_eligibility_change(1, None, 2)
+    session.rollback()
+    assert MatchingEvent.query.count() == 0
+
+    notify_eligibility_change(1, None, 2)
+    session.commit()
+    assert sorted(event.user_id for event in MatchingEvent.query) == [1, 2]
+
+
+def test_full_pass_prunes_old_events(app, session):
+    session.add(MatchingEvent(user_id=1, created_at=datetime.utcnow() - timedelta(days=3)))
+    session.commit()
+
+    MatchingScheduler(app)._reconcile()
+
+    assert MatchingEvent.query.count() == 0
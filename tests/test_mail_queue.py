@@ -0,0 +1,111 @@
+import socket
+from datetime import datetime, timedelta
+
+import pytest
+
+from website import send_email_safe, smtp_pool
+from website.mail_queue import MAX_ATTEMPTS, backoff_delay, drain_once, enqueue_email
+from website.models import OutboxEmail, User
+
+controller = pytest.importorskip("aiosmtpd.controller")
+
+
+class RecordingHandler:
+    """aiosmtpd handler that keeps every message, or rejects them while `fail` is set."""
+
+    def __init__(self):
+        self.messages = []
+        self.fail = False
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.fail:
+            return "451 Try again later"
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+@pytest.fixture
+def smtp_server(app, monkeypatch):
+    """A local aiosmtpd server that the app's mail settings point to."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+
+    handler = RecordingHandler()
+    server = controller.Controller(handler, hostname="127.0.0.1", port=port)
+    server.start()
+
+    state = app.extensions["mail"]
+    monkeypatch.setattr(state, "server", "127.0.0.1")
+    monkeypatch.setattr(state, "port", port)
+    monkeypatch.setattr(state, "use_tls", False)
+    monkeypatch.setattr(state, "use_ssl", False)
+    monkeypatch.setattr(state, "username", None)
+    monkeypatch.setattr(state, "password", None)
+    monkeypatch.setattr(state, "default_sender", "study@example.org")
+
+    yield handler
+
+    smtp_pool.smtp_pool.close_all()
+    server.stop()
+
+
+@pytest.fixture
+def outbox(db_session):
+    yield db_session
+    OutboxEmail.query.delete()
+    db_session.commit()
+
+
+def test_outbox_rows_are_drained(outbox, smtp_server):
+    email = enqueue_email("Hello", ["a@example.org"], body="Hi")
+
+    assert drain_once() == 1
+
+    outbox.expire_all()
+    assert email.status == "sent"
+    assert email.attempts == 1
+    assert [message.rcpt_tos for message in smtp_server.messages] == [["a@example.org"]]
+
+
+def test_failed_send_backs_off_and_gives_up(outbox, smtp_server):
+    smtp_server.fail = True
+    email = enqueue_email("Hello", ["a@example.org"], body="Hi")
+
+    before = datetime.utcnow()
+    assert drain_once() == 1
+    outbox.expire_all()
+    assert email.status == "pending"
+    assert email.attempts == 1
+    assert email.next_attempt_at >= before + timedelta(seconds=backoff_delay(1))
+
+    # Not due yet: the next drain leaves it alone
+    assert drain_once() == 0
+
+    for _ in range(MAX_ATTEMPTS - 1):
+        email.next_attempt_at = datetime.utcnow()
+        outbox.commit()
+        drain_once()
+        outbox.expire_all()
+
+    assert email.status == "failed"
+    assert email.attempts == MAX_ATTEMPTS
+    assert smtp_server.messages == []
+
+
+def test_queued_email_joins_the_callers_transaction(app, outbox, monkeypatch):
+    monkeypatch.setitem(app.config, "MAIL_QUEUE_WORKERS", 1)
+
+    outbox.add(User(email="a@example.org", user_name="a"))
+    assert send_email_safe("Hello", ["a@example.org"], body="Hi")
+    outbox.rollback()
+
+    assert User.query.count() == 0
+    assert OutboxEmail.query.count() == 0
+
+    outbox.add(User(email="a@example.org", user_name="a"))
+    assert send_email_safe("Hello", ["a@example.org"], body="Hi")
+    outbox.commit()
+
+    assert User.query.count() == 1
+    assert OutboxEmail.query.count() == 1
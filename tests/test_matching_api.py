@@ -0,0 +1,103 @@
+import calendar
+from datetime import timedelta
+
+import pytest
+
+from website import db
+from website.matching_service import MatchingService
+from website.models import Match, User
+
+
+@pytest.fixture
+def client(app):
+    """A test client whose requests each get their own app context, as in production."""
+    yield app.test_client()
+    with app.app_context():
+        Match.query.delete()
+        User.query.delete()
+        db.session.commit()
+
+
+def make_users(app, count):
+    with app.app_context():
+        users = [User(email=f"user{i}@example.org", user_name=f"user{i}", topic="climate") for i in range(count)]
+        db.session.add_all(users)
+        db.session.commit()
+        return [user.id for user in users]
+
+
+def make_match(app, user_id, partner_id):
+    with app.app_context():
+        match = MatchingService.create_match(db.session.get(User, user_id), db.session.get(User, partner_id),
+                                             1.0, "ideal_match")
+        return match.id
+
+
+def login(client, user_id):
+    with client.session_transaction() as flask_session:
+        flask_session["_user_id"] = str(user_id)
+        flask_session["_fresh"] = True
+
+
+def test_unchanged_matches_answer_304(app, client):
+    user, partner, other = make_users(app, 3)
+    make_match(app, user, partner)
+    login(client, user)
+
+    first = client.get("/api/matching/matches")
+    etag = first.headers["ETag"]
+    again = client.get("/api/matching/matches", headers={"If-None-Match": etag})
+
+    assert first.status_code == 200
+    assert again.status_code == 304
+    assert again.headers["ETag"] == etag
+
+    # A new match bumps the user's matches_version
+    make_match(app, other, user)
+    changed = client.get("/api/matching/matches", headers={"If-None-Match": etag})
+
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert len(changed.get_json()["matches"]) == 2
+
+
+def test_etag_runs_out_when_an_active_match_expires(app, client):
+    user, partner = make_users(app, 2)
+    match_id = make_match(app, user, partner)
+    login(client, user)
+
+    key, _, expiry = client.get("/api/matching/matches").headers["ETag"].strip('"').partition("-")
+    with app.app_context():
+        expires_at = db.session.get(Match, match_id).expires_at
+    # The same version, sent by a client whose active match has expired since
+    expired = int(expiry) - int(timedelta(days=15).total_seconds())
+
+    assert int(expiry) == calendar.timegm(expires_at.utctimetuple())
+    assert client.get("/api/matching/matches", headers={"If-None-Match": f'"{key}-{expiry}"'}).status_code == 304
+    assert client.get("/api/matching/matches", headers={"If-None-Match": f'"{key}-{expired}"'}).status_code == 200
+
+
+def test_matches_are_paged_with_a_cursor(app, client):
+    user, *partners = make_users(app, 6)
+    match_ids = [make_match(app, user, partner) for partner in partners]
+    login(client, user)
+
+    pages = []
+    cursor = None
+    while True:
+        query = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        body = client.get("/api/matching/matches", query_string=query).get_json()
+        pages.append([match["id"] for match in body["matches"]])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+
+    newest_first = sorted(match_ids, reverse=True)
+    assert pages == [newest_first[0:2], newest_first[2:4], newest_first[4:]]
+
+
+def test_invalid_cursor_is_rejected(app, client):
+    user, = make_users(app, 1)
+    login(client, user)
+
+    assert client.get("/api/matching/matches?cursor=abc").status_code == 400
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+
+from website.matching_service import MatchingService, stored_match_score
+from website.models import Match, User
+from website.query_plans import check_index_usage
+
+
+def make_user(session, name, **kwargs):
+    kwargs.setdefault("haspartner", False)
+    user = User(email=f"{name}@example.org", user_name=name, topic="climate", language="en", **kwargs)
+    session.add(user)
+    session.commit()
+    return user
+
+
+def test_matching_queries_use_their_indexes(db_session):
+    results = check_index_usage()
+
+    assert results
+    assert [r["name"] for r in results if r["missing"]] == []
+
+
+def test_stored_match_score_keeps_the_scale():
+    assert stored_match_score(-2) == 0.0
+    assert stored_match_score(1.5) == 1.5
+    assert stored_match_score(3.25) == 3.25
+    assert stored_match_score(6) == 4.0
+
+
+def test_batch_is_stored_in_one_transaction(db_session):
+    a, b, c, d = (make_user(db_session, name) for name in "abcd")
+
+    created = MatchingService.create_matches_batch([
+        (a, b, 1.0, "ideal_match", None),
+        (c, d, 2.0, "ideal_match", None),
+    ])
+
+    assert len(created) == 2
+    db_session.expire_all()
+    assert (a.partner_id, b.partner_id, c.partner_id, d.partner_id) == (b.id, a.id, d.id, c.id)
+    assert a.meeting_id == b.meeting_id == a.id
+
+
+def test_batch_skips_only_the_pairs_of_partnered_users(db_session):
+    a, b, c = (make_user(db_session, name) for name in "abc")
+    d = make_user(db_session, "d", haspartner=True)
+
+    created = MatchingService.create_matches_batch([
+        (a, b, 1.0, "ideal_match", None),
+        (c, d, 2.0, "ideal_match", None),
+    ])
+
+    assert [pair[:2] for _match_id, pair in created] == [(a, b)]
+    assert [(m.user_a_id, m.user_b_id) for m in Match.query] == [(a.id, b.id)]
+    db_session.expire_all()
+    assert (a.partner_id, b.partner_id) == (b.id, a.id)
+    # c is released again; d keeps its own partnership
+    assert not c.haspartner and c.partner_id is None
+    assert d.haspartner and d.partner_id is None
+
+
+def test_expired_matches_release_both_users(db_session):
+    a, b = make_user(db_session, "a"), make_user(db_session, "b")
+    MatchingService.create_matches_batch([(a, b, 1.0, "ideal_match", None)])
+    match = Match.query.one()
+    match.status = "pending"
+    match.expires_at = datetime.utcnow() - timedelta(minutes=1)
+    db_session.commit()
+
+    assert MatchingService.expire_old_matches() == 1
+
+    db_session.expire_all()
+    assert match.status == "expired"
+    assert not a.haspartner and a.partner_id is None
+    assert not b.haspartner and b.partner_id is None
+
+
+def test_rename_bumps_the_partners_matches_version(db_session):
+    a, b, c = (make_user(db_session, name) for name in "abc")
+    MatchingService.create_matches_batch([(a, b, 1.0, "ideal_match", None)])
+    db_session.expire_all()
+    versions = (a.matches_version, b.matches_version, c.matches_version)
+
+    a.user_name = "renamed"
+    db_session.commit()
+
+    db_session.expire_all()
+    assert b.matches_version == versions[1] + 1
+    assert c.matches_version == versions[2]
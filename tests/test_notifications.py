@@ -0,0 +1,60 @@
+from datetime import datetime
+
+import pytest
+
+from website import smtp_pool
+from website.mail_queue import MAX_ATTEMPTS
+from website.models import Notification, User
+from website.notifications import enqueue_notification, render_due_notifications
+
+
+@pytest.fixture
+def failing_smtp(monkeypatch):
+    def send_pooled(msg):
+        raise ConnectionError("SMTP server unavailable")
+
+    monkeypatch.setattr(smtp_pool, "send_pooled", send_pooled)
+
+
+def make_user(session, name, email):
+    user = User(email=email, user_name=name, topic="climate", language="en")
+    session.add(user)
+    session.commit()
+    return user
+
+
+def test_failed_notification_is_retried_with_backoff(db_session, failing_smtp):
+    user = make_user(db_session, "a", "a@example.org")
+
+    enqueue_notification("payout", user.id)
+
+    notification = Notification.query.one()
+    assert notification.status == "pending"
+    assert notification.attempts == 1
+    assert notification.send_at > datetime.utcnow()
+    assert "SMTP server unavailable" in notification.last_error
+
+
+def test_notification_gives_up_after_max_attempts(db_session, failing_smtp):
+    user = make_user(db_session, "a", "a@example.org")
+    enqueue_notification("payout", user.id)
+    notification = Notification.query.one()
+
+    for _ in range(MAX_ATTEMPTS - 1):
+        notification.send_at = datetime.utcnow()
+        db_session.commit()
+        render_due_notifications()
+
+    db_session.expire_all()
+    assert notification.attempts == MAX_ATTEMPTS
+    assert notification.status == "failed"
+
+
+def test_notification_without_address_fails_at_once(db_session):
+    user = make_user(db_session, "a", None)
+
+    enqueue_notification("payout", user.id)
+
+    notification = Notification.query.one()
+    assert notification.status == "failed"
+    assert notification.attempts == 1
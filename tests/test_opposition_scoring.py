@@ -0,0 +1,91 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from website.opposition_scoring import (
+    DECISIONS, IDEAL_MAX, MIN_DIMENSIONS, TOO_SIMILAR_BELOW, build_score_matrix, compute_opposition_matrix,
+    score_pair,
+)
+
+
+WEIGHTS = np.array([1.0, 2.0, 0.5, 1.5, 1.0, 1.0, 3.0, 0.5, 1.0, 2.0])
+
+
+def make_user(answers):
+    return SimpleNamespace(**{f"match{k + 1}": value for k, value in enumerate(answers)})
+
+
+def reference_score(answers_a, answers_b, weights):
+    """The original per-pair formula: weighted mean distance over shared answers."""
+    diff_sum = 0.0
+    total = 0.0
+    used = 0
+    for a, b, weight in zip(answers_a, answers_b, weights):
+        if a is None or b is None:
+            continue
+        diff_sum += weight * abs(a - b)
+        total += weight
+        used += 1
+
+    if used < MIN_DIMENSIONS or total == 0:
+        return 0.0, "too_similar"
+    score = diff_sum / total
+    if score < TOO_SIMILAR_BELOW:
+        return score, "too_similar"
+    if score <= IDEAL_MAX:
+        return score, "ideal_match"
+    return score, "too_extreme"
+
+
+def test_build_score_matrix_marks_missing_answers():
+    users = [make_user([1, 2, None, 4, 5, 1, 2, 3, 4, 5]), make_user(["3"] + ["x"] * 9)]
+
+    scores = build_score_matrix(users)
+
+    assert scores.shape == (2, 10)
+    assert scores[0, 1] == 2.0
+    assert np.isnan(scores[0, 2])
+    assert scores[1, 0] == 3.0
+    assert np.isnan(scores[1, 1:]).all()
+
+
+def test_matrix_matches_per_pair_formula():
+    rng = np.random.default_rng(7)
+    answers = []
+    for _ in range(40):
+        row = [int(v) for v in rng.integers(1, 6, size=10)]
+        for k in rng.choice(10, size=rng.integers(0, 4), replace=False):
+            row[k] = None
+        answers.append(row)
+
+    opposition, decisions = compute_opposition_matrix(build_score_matrix([make_user(a) for a in answers]), WEIGHTS)
+
+    for i in range(len(answers)):
+        for j in range(len(answers)):
+            score, decision = reference_score(answers[i], answers[j], WEIGHTS)
+            assert opposition[i, j] == pytest.approx(score, abs=1e-12)
+            assert DECISIONS[decisions[i, j]] == decision
+
+
+def test_too_few_shared_answers_are_too_similar():
+    shared = MIN_DIMENSIONS - 1
+    a = make_user([1] * 10)
+    b = make_user([5] * shared + [None] * (10 - shared))
+
+    assert score_pair(a, b, WEIGHTS) == (0.0, "too_similar")
+
+
+def test_decision_thresholds():
+    base = [3] * 10
+
+    assert score_pair(make_user(base), make_user(base), WEIGHTS) == (0.0, "too_similar")
+    assert score_pair(make_user(base), make_user([5] * 10), WEIGHTS) == (2.0, "ideal_match")
+    assert score_pair(make_user([1] * 10), make_user([5] * 10), WEIGHTS) == (4.0, "too_extreme")
+
+
+def test_missing_weights_score_nothing():
+    opposition, decisions = compute_opposition_matrix(build_score_matrix([make_user([1] * 10)] * 2), None)
+
+    assert not opposition.any()
+    assert not decisions.any()
@@ -0,0 +1,98 @@
+from datetime import date
+from itertools import permutations
+
+from website.pair_assignment import (
+    assign_pairs, blossom_pairs, build_compatibility_graph, build_slot_buckets, greedy_pairs,
+)
+from website.time_slots import slot_value
+
+
+WEEK = date(2026, 10, 11)
+
+
+class Candidate:
+    def __init__(self, user_id, mask, topic="climate", language="en", week=WEEK, score=0):
+        self.user_id = user_id
+        self.mask = mask
+        self.topic = topic
+        self.language = language
+        self.week = week
+        self.openness_score = score
+
+
+def best_total(edges, n):
+    """Brute force: the heaviest set of disjoint edges among the largest ones."""
+    best = (0, 0.0)
+    for order in permutations(range(n)):
+        pairs = set()
+        for k in range(0, n - 1, 2):
+            key = tuple(sorted(order[k:k + 2]))
+            if key in edges:
+                pairs.add(key)
+        best = max(best, (len(pairs), sum(edges[key][0] for key in pairs)))
+    return best
+
+
+def test_buckets_per_slot_bit():
+    users = [Candidate(1, 0b011), Candidate(2, 0b010), Candidate(3, 0b010, language="de")]
+
+    buckets = build_slot_buckets(users)
+
+    assert buckets[("climate", "en", WEEK, 0)] == [0]
+    assert buckets[("climate", "en", WEEK, 1)] == [0, 1]
+    assert buckets[("climate", "de", WEEK, 1)] == [2]
+
+
+def test_graph_keeps_earliest_common_slot():
+    users = [Candidate(1, 0b1110), Candidate(2, 0b1100), Candidate(3, 0b0001)]
+
+    edges = build_compatibility_graph(users, lambda a, b: 1.0)
+
+    assert edges == {(0, 1): (1.0, slot_value(WEEK, 2))}
+
+
+def test_graph_skips_forbidden_pairs():
+    users = [Candidate(1, 0b1), Candidate(2, 0b1), Candidate(3, 0b1)]
+
+    edges = build_compatibility_graph(users, lambda a, b: None if b.user_id == 3 else 2.0)
+
+    assert list(edges) == [(0, 1)]
+
+
+def test_blossom_is_optimal_where_greedy_is_not():
+    # The heaviest edge (1, 2) blocks both other edges
+    edges = {(0, 1): (3.0, "s"), (1, 2): (4.0, "s"), (2, 3): (3.0, "s")}
+
+    assert greedy_pairs(edges) == [(1, 2)]
+    assert sorted(blossom_pairs(edges)) == [(0, 1), (2, 3)]
+
+
+def test_blossom_matches_brute_force():
+    users = [Candidate(i, 0b1, score=(i * 7) % 5) for i in range(8)]
+
+    edges = build_compatibility_graph(users, lambda a, b: 1.0 + abs(a.openness_score - b.openness_score))
+    pairs = blossom_pairs(edges)
+
+    assert len({i for pair in pairs for i in pair}) == 2 * len(pairs)
+    assert (len(pairs), sum(edges[pair][0] for pair in pairs)) == best_total(edges, len(users))
+
+
+def test_assign_pairs_groups_by_topic_and_language():
+    users = [
+        Candidate(1, 0b01), Candidate(2, 0b11),
+        Candidate(3, 0b10, topic="migration"), Candidate(4, 0b10, topic="migration"),
+        Candidate(5, 0b01, language="de"),
+    ]
+
+    result = assign_pairs(users, lambda a, b: 1.0)
+
+    pairs = {(a.user_id, b.user_id): slot for a, b, _weight, slot in result}
+    assert pairs == {(1, 2): slot_value(WEEK, 0), (3, 4): slot_value(WEEK, 1)}
+
+
+def test_assign_pairs_greedy_fallback():
+    users = [Candidate(i, 0b1) for i in range(4)]
+
+    result = assign_pairs(users, lambda a, b: 1.0, exact_limit=2)
+
+    assert len(result) == 2
@@ -0,0 +1,94 @@
+from threading import Thread
+
+import pytest
+
+from website import presence
+from website.models import User
+from website.query_stats import count_queries
+
+
+@pytest.fixture
+def client(app, db_session):
+    return app.test_client()
+
+
+def make_pair(session):
+    user, partner = User(email="a@example.org", user_name="a"), User(email="b@example.org", user_name="b")
+    session.add_all([user, partner])
+    session.commit()
+    user.partner_id, partner.partner_id = partner.id, user.id
+    session.commit()
+    return user, partner
+
+
+def login(client, user):
+    user_id = str(user.id)
+    with client.session_transaction() as flask_session:
+        flask_session["_user_id"] = user_id
+        flask_session["_fresh"] = True
+
+
+def test_arrival_is_written_once(db_session):
+    user, _partner = make_pair(db_session)
+
+    presence.user_arrived(user)
+    with count_queries() as stats:
+        presence.user_arrived(user)
+
+    assert user.hasarrived
+    assert not [shape for shape in stats.shapes if shape.startswith("UPDATE")]
+
+
+def test_arrival_wakes_a_waiting_stream(db_session):
+    user, partner = make_pair(db_session)
+    results = []
+
+    presence.arrivals.watch(partner.id)
+    try:
+        waiter = Thread(target=lambda: results.append(presence.arrivals.wait_for(partner.id, 5)))
+        waiter.start()
+        presence.user_arrived(partner)
+        waiter.join(5)
+    finally:
+        presence.arrivals.unwatch(partner.id)
+
+    assert results == [True]
+    assert partner.id not in presence.arrivals.arrived
+
+
+def test_board_sees_arrivals_written_by_other_workers(app, db_session, monkeypatch):
+    monkeypatch.setattr(presence, "SHARED_CHECK_INTERVAL", 0.05)
+    presence.arrivals.start(app)
+    _user, partner = make_pair(db_session)
+
+    presence.arrivals.watch(partner.id)
+    try:
+        # Another process sets the flag: nothing in this process is told about it
+        db_session.query(User).filter(User.id == partner.id).update({"hasarrived": True})
+        db_session.commit()
+
+        assert presence.arrivals.wait_for(partner.id, 5)
+    finally:
+        presence.arrivals.unwatch(partner.id)
+
+
+def test_event_stream_reports_a_partner_who_is_already_there(client, db_session):
+    user, partner = make_pair(db_session)
+    presence.user_arrived(partner)
+    login(client, user)
+
+    response = client.get("/Interaction/WaitingPage/events")
+
+    assert response.mimetype == "text/event-stream"
+    assert response.get_data(as_text=True).endswith("event: partner_arrived\ndata: {}\n\n")
+
+
+def test_event_stream_ends_without_partner(client, db_session, monkeypatch):
+    monkeypatch.setattr(presence, "STREAM_TIMEOUT", 0.1)
+    user, _partner = make_pair(db_session)
+    login(client, user)
+
+    body = client.get("/Interaction/WaitingPage/events").get_data(as_text=True)
+
+    assert body.startswith("retry: ")
+    assert "partner_arrived" not in body
@@ -0,0 +1,57 @@
+import pytest
+
+from website import smtp_pool
+from website.matching_service import MatchingService
+from website.models import User
+from website.query_stats import query_budget
+
+
+MONDAY_11 = "2026-10-12T11:00:00"
+TUESDAY_11 = "2026-10-13T11:00:00"
+
+
+def make_users(session, count, **kwargs):
+    users = [
+        User(email=f"user{i}@example.org", user_name=f"user{i}", topic="climate", language="en",
+             demo=True, is_extremist=False, haspartner=False, openness_score=(i % 5) - 2.0,
+             time_slot_1=MONDAY_11, time_slot_2=TUESDAY_11, **kwargs)
+        for i in range(count)
+    ]
+    session.add_all(users)
+    session.commit()
+    return users
+
+
+def login(client, user):
+    user_id = str(user.id)
+    with client.session_transaction() as flask_session:
+        flask_session["_user_id"] = user_id
+        flask_session["_fresh"] = True
+
+
+@pytest.mark.parametrize("count", [4, 40])
+def test_batch_matching_pass_has_a_fixed_query_budget(db_session, monkeypatch, count):
+    sent = []
+    monkeypatch.setattr(smtp_pool, "send_pooled", sent.append)
+    make_users(db_session, count)
+
+    with query_budget(11):
+        stats = MatchingService.run_batch_matching(mode="optimal")
+
+    assert stats["matches_created"] == count // 2
+    assert len(sent) == count  # the match emails are rendered in the same budget
+
+
+@pytest.mark.parametrize("count", [3, 30])
+def test_match_list_has_a_fixed_query_budget(app, db_session, count):
+    user, *partners = make_users(db_session, count + 1)
+    for partner in partners:
+        MatchingService.create_match(user, partner, 1.0, "ideal_match")
+    client = app.test_client()
+    login(client, user)
+
+    with query_budget(2):
+        response = client.get("/api/matching/matches")
+
+    assert response.status_code == 200
+    assert len(response.get_json()["matches"]) == min(count, 20)
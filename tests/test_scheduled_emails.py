@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from website import claim_due_scheduled_emails, send_due_followup_emails, smtp_pool
+from website.models import OutboxEmail, ScheduledEmail, User
+
+
+@pytest.fixture
+def session(db_session):
+    yield db_session
+    ScheduledEmail.query.delete()
+    OutboxEmail.query.delete()
+    db_session.commit()
+
+
+def schedule(session, user_id, minutes, sent=False):
+    email = ScheduledEmail(user_id=user_id, send_at=datetime.utcnow() + timedelta(minutes=minutes),
+                           subject="Follow-up", body_html="<p>Hi</p>", sent=sent)
+    session.add(email)
+    session.commit()
+    return email
+
+
+def make_user(session, name, email):
+    user = User(email=email, user_name=name)
+    session.add(user)
+    session.commit()
+    return user
+
+
+def test_claim_returns_due_unsent_emails_once(session):
+    user = make_user(session, "a", "a@example.org")
+    later = schedule(session, user.id, -1)
+    first = schedule(session, user.id, -10)
+    schedule(session, user.id, 10)
+    schedule(session, user.id, -5, sent=True)
+    now = datetime.utcnow()
+
+    claimed = claim_due_scheduled_emails(now, limit=10)
+
+    assert [(email.id, address) for email, address in claimed] == [
+        (first.id, "a@example.org"), (later.id, "a@example.org"),
+    ]
+    assert claim_due_scheduled_emails(now, limit=10) == []
+
+
+def test_claim_respects_limit_and_skip_ids(session):
+    user = make_user(session, "a", "a@example.org")
+    emails = [schedule(session, user.id, -minutes) for minutes in (3, 2, 1)]
+
+    claimed = claim_due_scheduled_emails(datetime.utcnow(), limit=1, skip_ids={emails[0].id})
+
+    assert [email.id for email, _address in claimed] == [emails[1].id]
+
+
+def test_due_emails_go_to_the_outbox(app, session, monkeypatch):
+    monkeypatch.setitem(app.config, "MAIL_QUEUE_WORKERS", 1)
+    user = make_user(session, "a", "a@example.org")
+    due = [schedule(session, user.id, -1) for _ in range(3)]
+    future = schedule(session, user.id, 10)
+
+    assert send_due_followup_emails(batch_size=2) == 3
+
+    session.expire_all()
+    assert all(email.sent for email in due)
+    assert not future.sent
+    assert OutboxEmail.query.count() == 3
+
+
+def test_email_without_address_is_marked_done(app, session, monkeypatch):
+    monkeypatch.setitem(app.config, "MAIL_QUEUE_WORKERS", 1)
+    user = make_user(session, "a", None)
+    email = schedule(session, user.id, -1)
+
+    assert send_due_followup_emails() == 0
+
+    session.expire_all()
+    assert email.sent
+    assert OutboxEmail.query.count() == 0
+
+
+def test_failed_send_stays_unsent(app, session, monkeypatch):
+    def send_pooled(msg):
+        raise ConnectionError("SMTP server unavailable")
+
+    monkeypatch.setitem(app.config, "MAIL_QUEUE_WORKERS", 0)
+    monkeypatch.setattr(smtp_pool, "send_pooled", send_pooled)
+    user = make_user(session, "a", "a@example.org")
+    email = schedule(session, user.id, -1)
+
+    assert send_due_followup_emails() == 0
+
+    session.expire_all()
+    assert not email.sent
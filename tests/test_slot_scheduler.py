@@ -0,0 +1,46 @@
+from collections import Counter
+
+from website.slot_scheduler import assign_slots
+
+
+def test_unlimited_capacity_places_every_pair():
+    options = [["a", "b"], ["a"], ["b", "c"]]
+
+    chosen = assign_slots(options, {})
+
+    assert all(slot in opts for slot, opts in zip(chosen, options))
+
+
+def test_capacity_is_respected():
+    options = [["a", "b"]] * 5
+
+    chosen = assign_slots(options, {"a": 1}, capacity=3)
+
+    counts = Counter(slot for slot in chosen if slot)
+    assert counts["a"] <= 2
+    assert counts["b"] <= 3
+    assert chosen.count(None) == 0
+
+
+def test_pair_without_room_stays_unplaced():
+    chosen = assign_slots([["a"], ["a"], []], {}, capacity=1)
+
+    assert chosen == ["a", None, None]
+
+
+def test_repair_through_full_slots():
+    # Greedy puts pair 0 into "a" and pair 1 into "b"; pair 2 only fits if
+    # pair 1 moves on to "c".
+    options = [["a", "b"], ["b", "c"], ["b", "a"]]
+
+    chosen = assign_slots(options, {}, capacity=1)
+
+    assert chosen == ["a", "c", "b"]
+
+
+def test_balancing_spreads_pairs():
+    options = [["a", "b"]] * 4
+
+    chosen = assign_slots(options, {})
+
+    assert Counter(chosen) == {"a": 2, "b": 2}
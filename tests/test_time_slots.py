@@ -0,0 +1,66 @@
+from datetime import date
+
+from website.time_slots import (
+    SLOT_COUNT, common_mask, decode_slots, encode_slots, first_bit, mask_bits, parse_slot, slot_value,
+    week_start,
+)
+
+
+SUNDAY = date(2026, 10, 11)
+
+
+def test_week_starts_on_sunday():
+    assert week_start(SUNDAY) == SUNDAY
+    assert week_start(date(2026, 10, 17)) == SUNDAY  # Saturday
+    assert week_start(date(2026, 10, 12)) == SUNDAY  # Monday
+
+
+def test_parse_slot_grid():
+    assert parse_slot("2026-10-11T11:00:00") == (SUNDAY, 0)
+    assert parse_slot("2026-10-17T18:00:00") == (SUNDAY, SLOT_COUNT - 1)
+    assert parse_slot("2026-10-12T13:00:00") == (SUNDAY, 5)
+
+
+def test_parse_slot_off_grid():
+    assert parse_slot(None) is None
+    assert parse_slot("  ") is None
+    assert parse_slot("not a date") is None
+    assert parse_slot("2026-10-11T12:00:00") is None
+    assert parse_slot("2026-10-11T11:30:00") is None
+
+
+def test_encode_decode_round_trip():
+    slots = ["2026-10-14T18:00:00", "2026-10-11T11:00:00", "2026-10-12T15:00:00"]
+    week, mask = encode_slots(slots)
+
+    assert week == SUNDAY
+    assert mask_bits(mask) == sorted(parse_slot(slot)[1] for slot in slots)
+    assert decode_slots(week, mask) == tuple(sorted(slots))
+
+
+def test_encode_drops_other_weeks_and_off_grid_slots():
+    week, mask = encode_slots(["2026-10-13T11:00:00", "2026-10-20T11:00:00", "2026-10-13T12:00:00", ""])
+
+    assert week == SUNDAY
+    assert decode_slots(week, mask) == ("2026-10-13T11:00:00",)
+
+
+def test_encode_without_grid_slots():
+    assert encode_slots([None, "", "2026-10-13T12:00:00"]) == (None, None)
+    assert decode_slots(None, None) == ()
+
+
+def test_slot_value_is_interned():
+    first = slot_value(SUNDAY, 7)
+    again = slot_value(SUNDAY, 7)
+
+    assert first == "2026-10-12T18:00:00"
+    assert first is again
+
+
+def test_common_mask_and_first_bit():
+    assert common_mask(SUNDAY, 0b1110, SUNDAY, 0b0111) == 0b0110
+    assert common_mask(SUNDAY, 0b1, date(2026, 10, 18), 0b1) == 0
+    assert common_mask(None, 0b1, None, 0b1) == 0
+    assert common_mask(SUNDAY, None, SUNDAY, 0b1) == 0
+    assert first_bit(0b10100) == 2
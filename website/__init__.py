@@ -12,17 +12,18 @@ It sets up:
 
 """
 
-from flask import Flask
+from flask import Flask, current_app
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import exc, text
 import os
+import sys
 from flask_login import LoginManager
 from flask_migrate import Migrate
 from flask_mail import Mail, Message
 from dotenv import load_dotenv
 from datetime import datetime
 import time
-from threading import Thread 
+import atexit
+from threading import Thread, Event, Lock
 
 # Load environment variables from .env (DATABASE_URL, MAIL_*)
 load_dotenv()
@@ -32,6 +33,24 @@ mail = Mail()
 
 
 def send_email_safe(subject, recipients, body=None, html=None, sender=None):
+    """
+    Central helper to send emails without crashing the request.
+    With MAIL_QUEUE_WORKERS > 0 the email is only added to the outbox and
+    sent by the mail worker pool (see mail_queue.py); otherwise it is sent
+    right away.
+    The outbox row joins the caller's transaction: it is written (and sent)
+    when the caller commits, and dropped with the rest if the caller rolls back.
+    """
+    if current_app.config.get('MAIL_QUEUE_WORKERS', 0) > 0:
+        try:
+            from .mail_queue import enqueue_email
+            enqueue_email(subject, recipients, body=body, html=html, sender=sender, commit=False)
+            print(f"[MAIL] Queued email to {recipients} with subject '{subject}'")
+            return True
+        except Exception as e:
+            print(f"[MAIL ERROR] Failed to queue email to {recipients}: {e}")
+            return False
+
     try:
         # Build message WITHOUT sender first
         msg = Message(subject=subject, recipients=recipients)
@@ -44,7 +63,8 @@ def send_email_safe(subject, recipients, body=None, html=None, sender=None):
         if html:
             msg.html = html
 
-        mail.send(msg)
+        from .smtp_pool import send_pooled
+        send_pooled(msg)
         print(f"[MAIL] Sent email to {recipients} with subject '{subject}'")
         return True
     except Exception as e:
@@ -53,6 +73,31 @@ def send_email_safe(subject, recipients, body=None, html=None, sender=None):
         print(f"[MAIL ERROR] Failed to send email to {recipients}: {e}")
         return False
 
+# `flask` options that take a value (the subcommand is the first other argument)
+CLI_OPTIONS_WITH_VALUE = ('--app', '-A', '--env-file', '-e')
+
+
+def cli_command():
+    """
+    The `flask` subcommand this process was started with ('db', 'export', 'run', ...),
+    or None if it was not started through the flask CLI (gunicorn, python main.py).
+    """
+    program = sys.argv[0] if sys.argv else ''
+    name = os.path.splitext(os.path.basename(program))[0]
+    if name == '__main__':  # python -m flask
+        name = os.path.basename(os.path.dirname(program))
+    if name != 'flask':
+        return None
+
+    args = iter(sys.argv[1:])
+    for arg in args:
+        if arg in CLI_OPTIONS_WITH_VALUE:
+            next(args, None)
+        elif not arg.startswith('-'):
+            return arg
+    return None
+
+
 def create_app():
     # instance_relative_config=True so app.instance_path points to /instance
     app = Flask(__name__, instance_relative_config=True)
@@ -76,8 +121,34 @@ def create_app():
     app.config['SQLALCHEMY_DATABASE_URI'] = db_url
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+    # Connection pool: recycling, liveness checks and size (see db_pool.py)
+    from .db_pool import engine_options, init_pool_events
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(db_url)
+
     print("📌 USING DATABASE:", app.config['SQLALCHEMY_DATABASE_URI'])
 
+    # Batch matching mode: "optimal" (global pairing) or "greedy" (per user)
+    app.config['MATCHING_MODE'] = os.getenv('MATCHING_MODE', 'optimal')
+
+    # Maximum number of dialogue sessions per time slot, 0 = no limit (see slot_scheduler.py)
+    app.config['SLOT_CAPACITY'] = int(os.getenv('SLOT_CAPACITY', 0))
+
+    # Background matching scheduler (turned off e.g. for benchmarks and one-off scripts)
+    app.config['SCHEDULER_ENABLED'] = os.getenv('SCHEDULER_ENABLED', 'true').lower() == 'true'
+
+    # Background threads (mail workers, matching scheduler). "auto": only for the web server,
+    # not for one-off CLI commands like `flask db upgrade` or `flask export`
+    background_services = os.getenv('BACKGROUND_SERVICES', 'auto').lower()
+    if background_services == 'auto':
+        app.config['BACKGROUND_SERVICES'] = cli_command() in (None, 'run')
+    else:
+        app.config['BACKGROUND_SERVICES'] = background_services == 'true'
+
+    # Accounts that may use the /admin routes (comma-separated emails); empty = nobody
+    app.config['ADMIN_EMAILS'] = {
+        email.strip().lower() for email in os.getenv('ADMIN_EMAILS', '').split(',') if email.strip()
+    }
+
     app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
     app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 587))
     app.config['MAIL_USE_TLS'] = os.getenv('MAIL_USE_TLS', 'true').lower() == 'true'
@@ -93,6 +164,13 @@ def create_app():
     # make sure sending is NOT suppressed
     app.config['MAIL_SUPPRESS_SEND'] = False
 
+    # Background mail worker pool (0 = send synchronously inside the request)
+    app.config['MAIL_QUEUE_WORKERS'] = int(os.getenv('MAIL_QUEUE_WORKERS', 2))
+
+    # Persistent SMTP connections shared by all senders in this process
+    app.config['MAIL_POOL_SIZE'] = int(os.getenv('MAIL_POOL_SIZE', 2))
+    app.config['MAIL_POOL_IDLE_TIMEOUT'] = int(os.getenv('MAIL_POOL_IDLE_TIMEOUT', 60))
+
     mail.init_app(app)
     db.init_app(app)
     migrate = Migrate(app, db)
@@ -112,6 +190,7 @@ def create_app():
 
     # Optional: create tables if they don't exist
     with app.app_context():
+        init_pool_events(app, db.engine)
         db.create_all()
         db.session.commit()
         initialize_opinion_dimensions()
@@ -125,15 +204,9 @@ def create_app():
     def load_user(id):
         return User.query.get(int(id))
 
-    @app.before_request
-    def before_request():
-        # Check if the database connection is valid
-        try:
-            db.session.execute(text("SELECT 1"))
-        except exc.SQLAlchemyError:
-            db.session.rollback()
-            db.session.remove()
-            db.engine.dispose()
+    # Opt-in per-request SQL statistics / N+1 detection (SQL_QUERY_STATS=true)
+    from .query_stats import init_query_stats
+    init_query_stats(app)
 
     @app.teardown_request
     def teardown_request(exception=None):
@@ -159,8 +232,73 @@ def create_app():
             print("MAIL ERROR:", e)
             return f"Error while sending mail: {e}", 500
 
+    @app.cli.command("check-indexes")
+    def check_indexes():
+        """EXPLAIN the matching queries and fail if one does not use its index."""
+        from .query_plans import check_index_usage
+
+        failed = False
+        for result in check_index_usage():
+            status = "ok" if not result["missing"] else "MISSING " + ", ".join(result["missing"])
+            print(f"[{status}] {result['name']}")
+            for line in result["plan"]:
+                print(f"    {line}")
+            failed = failed or bool(result["missing"])
+
+        if failed:
+            raise SystemExit(1)
+
+    import click
+
+    @app.cli.command("export")
+    @click.argument("dataset", type=click.Choice(["participants", "matches"]))
+    @click.option("--format", "file_format", type=click.Choice(["csv", "parquet", "arrow"]), default="csv")
+    @click.option("-o", "--output", required=True, help="file to write")
+    @click.option("--topic")
+    @click.option("--language")
+    @click.option("--since", help="created on or after this date (YYYY-MM-DD)")
+    @click.option("--until", help="created on or before this date (YYYY-MM-DD)")
+    @click.option("--chunk-size", type=int, default=1000, show_default=True)
+    def export_results(dataset, file_format, output, topic, language, since, until, chunk_size):
+        """Stream the study results into a CSV / Parquet / Arrow file."""
+        from .export import ExportError, export_to_file, parse_date
+
+        try:
+            rows = export_to_file(
+                dataset, output, file_format, chunk_size,
+                topic=topic, language=language,
+                since=parse_date(since), until=parse_date(until, end=True),
+            )
+        except ExportError as e:
+            raise click.UsageError(str(e))
+        print(f"✓ Exported {rows} {dataset} rows to {output}")
+
+    @app.cli.command("cohort-stats")
+    @click.option("--rebuild", is_flag=True, help="recompute all snapshots from the user table first")
+    def cohort_stats(rebuild):
+        """Show the opinion shift statistics per topic and language."""
+        from .cohort_analytics import cohort_overview, rebuild_snapshots
+
+        if rebuild:
+            rebuild_snapshots()
+        overview = cohort_overview()
+        for group in ("topics", "languages"):
+            print(f"{group}:")
+            for name, summary in sorted(overview[group].items()):
+                avg_shift = "-" if summary["avg_shift"] is None else f"{summary['avg_shift']:+.2f}"
+                std_shift = "-" if summary["std_shift"] is None else f"{summary['std_shift']:.2f}"
+                print(f"  {name:<30} users {summary['users']:>6}  mean shift {avg_shift:>6}  sd {std_shift}")
+
+    # Start background mail workers (drain the outbox table)
+    from .smtp_pool import init_smtp_pool
+    from .mail_queue import init_mail_queue
+    init_smtp_pool(app)
+    if app.config['BACKGROUND_SERVICES']:
+        init_mail_queue(app)
+
     # Start autonomous matching + follow-up scheduler
-    init_scheduler(app)
+    if app.config['SCHEDULER_ENABLED'] and app.config['BACKGROUND_SERVICES']:
+        init_scheduler(app)
 
     return app
 
@@ -180,6 +318,7 @@ def initialize_opinion_dimensions():
     B. Topic-Specific (10 questions) - For opposition matching
     """
     from .models import OpinionDimension
+    from .dimension_registry import invalidate_registry
 
     dimensions = [
         # A. GENERAL ATTITUDE (5)
@@ -322,6 +461,9 @@ def initialize_opinion_dimensions():
             db.session.add(dimension)
 
     db.session.commit()
+
+    # Make every hot path reload the (possibly new) dimensions
+    invalidate_registry()
     print("✓ Initialized 15 opinion dimensions")
 
 
@@ -330,13 +472,18 @@ def save_questionnaire_responses(user_id, form_data):
     Save responses from the 15-question questionnaire
     Using -2 to +2 scale (no conversion needed)
     """
-    from .models import User, UserOpinion, OpinionDimension
+    from .models import User
+    from .opinion_store import upsert_user_opinions
+    from .dimension_registry import get_registry
+    from .candidate_index import candidate_index
 
     user = User.query.get(user_id)
     if not user:
         return None
 
     attitude_scores = []
+    registry = get_registry()
+    scores = {}
 
     # Process attitude questions (1-5)
     for i in range(1, 6):
@@ -344,28 +491,9 @@ def save_questionnaire_responses(user_id, form_data):
         if field_name in form_data:
             score = float(form_data[field_name])
 
-            dimension = OpinionDimension.query.filter_by(
-                question_type='attitude',
-                question_number=i
-            ).first()
-
+            dimension = registry.get_by_number('attitude', i)
             if dimension:
-                opinion = UserOpinion.query.filter_by(
-                    user_id=user_id,
-                    dimension_id=dimension.id
-                ).first()
-
-                if opinion:
-                    opinion.score = score
-                    opinion.updated_at = datetime.utcnow()
-                else:
-                    opinion = UserOpinion(
-                        user_id=user_id,
-                        dimension_id=dimension.id,
-                        score=score
-                    )
-                    db.session.add(opinion)
-
+                scores[dimension.id] = score
                 attitude_scores.append(score)
 
     # Process matching questions (1-10)
@@ -374,27 +502,12 @@ def save_questionnaire_responses(user_id, form_data):
         if field_name in form_data:
             score = float(form_data[field_name])
 
-            dimension = OpinionDimension.query.filter_by(
-                question_type='matching',
-                question_number=i
-            ).first()
-
+            dimension = registry.get_by_number('matching', i)
             if dimension:
-                opinion = UserOpinion.query.filter_by(
-                    user_id=user_id,
-                    dimension_id=dimension.id
-                ).first()
-
-                if opinion:
-                    opinion.score = score
-                    opinion.updated_at = datetime.utcnow()
-                else:
-                    opinion = UserOpinion(
-                        user_id=user_id,
-                        dimension_id=dimension.id,
-                        score=score
-                    )
-                    db.session.add(opinion)
+                scores[dimension.id] = score
+
+    # Write all answers in one upsert statement
+    upsert_user_opinions(user_id, scores)
 
     # Calculate openness score (average of 5 attitude questions)
     if attitude_scores:
@@ -402,8 +515,12 @@ def save_questionnaire_responses(user_id, form_data):
         user.openness_score = openness_score
         user.is_extremist = openness_score < 0.0  # Threshold: below neutral
 
+    # Openness / extremist flag may change matching eligibility
+    notify_eligibility_change(user.id)
     db.session.commit()
 
+    candidate_index.update_user(user)
+
     return {
         'openness_score': user.openness_score,
         'is_extremist': user.is_extremist,
@@ -429,44 +546,102 @@ def get_openness_category(openness_score):
 # Follow-up Email Sending
 # ========================================
 
-def send_due_followup_emails():
-    """Send follow-up emails that are scheduled and due."""
-    # Import models here to avoid circular import at module load time
-    from .models import User, ScheduledEmail
+SCHEDULED_EMAIL_BATCH_SIZE = 50
 
-    now = datetime.utcnow()
 
-    pending = ScheduledEmail.query.filter(
-        ScheduledEmail.sent.is_(False),
-        ScheduledEmail.send_at <= now
-    ).all()
+def claim_due_scheduled_emails(now, limit, skip_ids=()):
+    """
+    Claim a batch of due, unsent ScheduledEmail rows together with the
+    recipient address (one joined query). Returns [(email, address)].
 
-    if not pending:
-        return
+    On PostgreSQL the rows are locked with FOR UPDATE SKIP LOCKED, so several
+    gunicorn workers can drain the table at the same time without sending
+    anything twice. Other databases claim each row with a conditional UPDATE.
+    """
+    from sqlalchemy import update
+    from .models import User, ScheduledEmail
 
-    print(f"⏰ Sending {len(pending)} scheduled follow-up email(s)")
+    query = (
+        db.session.query(ScheduledEmail, User.email)
+        .outerjoin(User, User.id == ScheduledEmail.user_id)
+        .filter(
+            ScheduledEmail.sent.is_(False),
+            ScheduledEmail.send_at <= now,
+        )
+    )
+    if skip_ids:
+        query = query.filter(ScheduledEmail.id.notin_(list(skip_ids)))
+    query = query.order_by(ScheduledEmail.send_at, ScheduledEmail.id).limit(limit)
+
+    if db.session.get_bind().dialect.name == "postgresql":
+        return query.with_for_update(skip_locked=True, of=ScheduledEmail).all()
+
+    claimed = []
+    for email, address in query.all():
+        result = db.session.execute(
+            update(ScheduledEmail)
+            .where(ScheduledEmail.id == email.id, ScheduledEmail.sent.is_(False))
+            .values(sent=True)
+        )
+        if result.rowcount == 1:
+            claimed.append((email, address))
+    return claimed
+
+
+def send_due_followup_emails(batch_size=SCHEDULED_EMAIL_BATCH_SIZE):
+    """
+    Send all scheduled emails that are due, batch by batch.
+    This is the only dispatcher for ScheduledEmail rows (scheduler thread and
+    /admin/run_scheduled_emails both use it). Returns the number of emails sent.
+    """
+    from .smtp_pool import send_pooled
 
-    for email in pending:
-        user = User.query.get(email.user_id)
-        if not user or not user.email:
-            # Nothing to send, mark as done so we don't retry forever
-            email.sent = True
-            db.session.commit()
-            continue
+    now = datetime.utcnow()
+    use_queue = current_app.config.get('MAIL_QUEUE_WORKERS', 0) > 0
+    failed_ids = set()
+    sent_count = 0
 
+    while True:
         try:
-            msg = Message(
-                subject=email.subject,
-                recipients=[user.email],
-            )
-            msg.html = email.body_html
-            mail.send(msg)
-
-            email.sent = True
-            db.session.commit()
+            batch = claim_due_scheduled_emails(now, batch_size, failed_ids)
         except Exception as e:
             db.session.rollback()
-            print(f"Error sending scheduled email {email.id}: {e}")
+            print(f"Error claiming scheduled emails: {e}")
+            break
+
+        if not batch:
+            break
+
+        print(f"⏰ Sending {len(batch)} scheduled follow-up email(s)")
+
+        for email, address in batch:
+            if not address:
+                # Nothing to send, mark as done so we don't retry forever
+                email.sent = True
+                continue
+
+            try:
+                if use_queue:
+                    # Handed to the outbox in the same transaction
+                    from .mail_queue import enqueue_email
+                    enqueue_email(email.subject, [address], html=email.body_html, commit=False)
+                else:
+                    msg = Message(subject=email.subject, recipients=[address])
+                    msg.html = email.body_html
+                    send_pooled(msg)
+
+                email.sent = True
+                sent_count += 1
+            except Exception as e:
+                # Keep it unsent so a later run retries it
+                email.sent = False
+                failed_ids.add(email.id)
+                print(f"Error sending scheduled email {email.id}: {e}")
+
+        # One commit per batch (also releases the row locks)
+        db.session.commit()
+
+    return sent_count
 
 
 # ========================================
@@ -474,36 +649,218 @@ def send_due_followup_emails():
 # ========================================
 
 class MatchingScheduler:
+    """
+    Event-driven matching loop.
+
+    Eligibility changes (questionnaire, demographics, match rejection) call
+    notify_eligibility_change(user_id), which puts the user on a work queue
+    and wakes the thread. After a short quiet period (debounce) only the
+    (topic, language) buckets of those users are matched again.
+    Once every RECONCILE_INTERVAL a full pass runs as a safety net, together
+    with match expiry and the follow-up emails.
+
+    Every gunicorn worker starts this thread, but only the elected leader
+    (see leader_election.py) does any work. Events are stored in the
+    matching_events table, so the leader also sees changes that were
+    made through the other workers.
+    """
+
+    DEBOUNCE_SECONDS = 5       # wait until no new event came in for this long
+    MAX_EVENT_DELAY = 30       # but never delay a queued event longer than this
+    RECONCILE_INTERVAL = 3600  # full matching pass every hour
+    EVENT_POLL_SECONDS = 5     # how often the leader reads matching_events
+    EVENT_BATCH_SIZE = 1000
+
     def __init__(self, app):
+        from .leader_election import LeaderElection
+
         self.app = app
         self.running = False
         self.thread = None
+        self.election = LeaderElection(app, "matching-scheduler", on_change=self._on_leadership_change)
+
+        self.lock = Lock()
+        self.wakeup = Event()
+        self.dirty_users = set()
+        self.first_event_at = None
+        self.last_event_at = None
+        self.last_reconcile = None
 
     def start(self):
         if not self.running:
             self.running = True
+            self.election.start()
             self.thread = Thread(target=self._run_scheduler, daemon=True)
             self.thread.start()
             print("✓ Autonomous matching + follow-up scheduler started")
 
-    def _run_scheduler(self):
-        from .matching_service import MatchingService
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+        self.election.stop()
+
+    def wake(self):
+        self.wakeup.set()
+
+    def _on_leadership_change(self, leader):
+        # A new leader starts with a full pass; a follower forgets its queue
+        if not leader:
+            with self.lock:
+                self.dirty_users = set()
+                self.first_event_at = self.last_event_at = None
+        self.last_reconcile = None
+        self.wakeup.set()
+
+    # ---------------- work queue ----------------
+
+    def mark_dirty(self, user_id):
+        """Queue a user whose matching eligibility may have changed."""
+        with self.lock:
+            now = time.monotonic()
+            self.dirty_users.add(user_id)
+            if self.first_event_at is None:
+                self.first_event_at = now
+            self.last_event_at = now
+        self.wakeup.set()
+
+    def _take_dirty(self):
+        """Return the queued user ids once the burst of events has settled, else None."""
+        with self.lock:
+            if not self.dirty_users:
+                return None
+            now = time.monotonic()
+            settled = now - self.last_event_at >= self.DEBOUNCE_SECONDS
+            overdue = now - self.first_event_at >= self.MAX_EVENT_DELAY
+            if not (settled or overdue):
+                return None
+            user_ids, self.dirty_users = self.dirty_users, set()
+            self.first_event_at = self.last_event_at = None
+            return user_ids
+
+    def _pull_events(self):
+        """Move events written by any worker from matching_events into the queue."""
+        from .models import MatchingEvent
+
+        with self.app.app_context():
+            rows = (
+                db.session.query(MatchingEvent.id, MatchingEvent.user_id)
+                .order_by(MatchingEvent.id)
+                .limit(self.EVENT_BATCH_SIZE)
+                .all()
+            )
+            if not rows:
+                return
+            MatchingEvent.query.filter(
+                MatchingEvent.id.in_([row.id for row in rows])
+            ).delete(synchronize_session=False)
+            db.session.commit()
 
+        for row in rows:
+            self.mark_dirty(row.user_id)
+
+    def _reconcile_due(self):
+        # last_reconcile is reset to None by the heartbeat thread at any time: read it once
+        last_reconcile = self.last_reconcile
+        return last_reconcile is None or time.monotonic() - last_reconcile >= self.RECONCILE_INTERVAL
+
+    def _seconds_until_next_work(self):
+        now = time.monotonic()
+        last_reconcile = self.last_reconcile
+        if last_reconcile is None:
+            return 0.1  # a full pass is due
+        wait = min(
+            self.EVENT_POLL_SECONDS,
+            self.RECONCILE_INTERVAL - (now - last_reconcile),
+        )
+        with self.lock:
+            if self.dirty_users:
+                wait = min(
+                    wait,
+                    self.DEBOUNCE_SECONDS - (now - self.last_event_at),
+                    self.MAX_EVENT_DELAY - (now - self.first_event_at),
+                )
+        return max(wait, 0.1)
+
+    # ---------------- loop ----------------
+
+    def _run_scheduler(self):
         while self.running:
+            if not self.election.is_leader:
+                # Follower: the heartbeat wakes us up when we become leader
+                self.wakeup.wait(self.EVENT_POLL_SECONDS)
+                self.wakeup.clear()
+                continue
+
+            # After an error, retry at the normal poll interval instead of spinning
+            wait = self.EVENT_POLL_SECONDS
             try:
-                with self.app.app_context():
-                    # 1) Run matching
-                    stats = MatchingService.run_batch_matching()
-                    expired = MatchingService.expire_old_matches()
-                    if expired > 0:
-                        print(f"✓ Expired {expired} old matches")
-
-                    # 2) Send any due follow-up emails
-                    send_due_followup_emails()
+                self._pull_events()
+                if self._reconcile_due():
+                    self._reconcile()
+                else:
+                    user_ids = self._take_dirty()
+                    if user_ids:
+                        self._match_dirty_buckets(user_ids)
+                wait = self._seconds_until_next_work()
             except Exception as e:
                 print(f"✗ Scheduler error: {e}")
 
-            time.sleep(3600)  # Run every hour
+            self.wakeup.wait(wait)
+            self.wakeup.clear()
+
+    def _match_dirty_buckets(self, user_ids):
+        """Run matching only for the (topic, language) buckets of the queued users."""
+        from .matching_service import MatchingService
+        from .models import User
+
+        with self.app.app_context():
+            buckets = {
+                (topic, language)
+                for topic, language in db.session.query(User.topic, User.language)
+                .filter(User.id.in_(list(user_ids)))
+                .distinct()
+                .all()
+                if topic and language
+            }
+            if buckets:
+                print(f"[SCHEDULER] {len(user_ids)} changed user(s) -> matching {len(buckets)} bucket(s)")
+                MatchingService.run_batch_matching(buckets=buckets)
+
+    def _reconcile(self):
+        """Full pass: expire old matches, match everybody, send due follow-ups."""
+        from .matching_service import MatchingService
+        from .models import MatchingEvent
+
+        # A full pass covers everything that is queued right now
+        with self.lock:
+            self.dirty_users = set()
+            self.first_event_at = self.last_event_at = None
+        started_at = datetime.utcnow()
+
+        try:
+            with self.app.app_context():
+                # 0) Drop the events the pass covers, also any left over while no leader ran
+                pruned = MatchingEvent.query.filter(
+                    MatchingEvent.created_at < started_at
+                ).delete(synchronize_session=False)
+                db.session.commit()
+                if pruned > 0:
+                    print(f"[SCHEDULER] Pruned {pruned} matching event(s) covered by the full pass")
+
+                # 1) Expire old matches first, so the released users are matched in this pass
+                expired = MatchingService.expire_old_matches()
+                if expired > 0:
+                    print(f"✓ Expired {expired} old matches")
+
+                # 2) Run matching
+                stats = MatchingService.run_batch_matching()
+
+                # 3) Render due notifications and send any due follow-up emails
+                from .notifications import render_all_due_notifications
+                render_all_due_notifications()
+                send_due_followup_emails()
+        finally:
+            self.last_reconcile = time.monotonic()
 
 
 # Global scheduler instance
@@ -516,4 +873,33 @@ def init_scheduler(app):
     if scheduler is None:
         scheduler = MatchingScheduler(app)
         scheduler.start()
+        # Hand leadership over immediately on a clean worker shutdown
+        atexit.register(scheduler.stop)
     return scheduler
+
+
+def notify_eligibility_change(*user_ids):
+    """
+    Tell the scheduler that these users may now be matchable (or no longer).
+    The event is stored in matching_events, so it reaches the leader even
+    when this request is handled by another worker, a CLI command or a
+    process without a scheduler of its own.
+
+    The rows join the caller's transaction: the caller commits. Nothing is
+    written when SCHEDULER_ENABLED is off, as nobody would consume the events.
+    """
+    from sqlalchemy import event
+    from .models import MatchingEvent
+
+    if not current_app.config.get('SCHEDULER_ENABLED'):
+        return
+
+    user_ids = [user_id for user_id in user_ids if user_id is not None]
+    if not user_ids:
+        return
+
+    db.session.add_all([MatchingEvent(user_id=user_id) for user_id in user_ids])
+
+    # The leader polls the table anyway; only wake it right away if it runs in this process
+    if isinstance(scheduler, MatchingScheduler) and scheduler.election.is_leader:
+        event.listen(db.session(), "after_commit", lambda session: scheduler.wake(), once=True)
@@ -8,12 +8,15 @@ It includes:
 - Password validation and hashing
 - Basic error handling and user feedback
 - Sending a confirmation email after successful registration
+- The admin check of the /admin routes (ADMIN_EMAILS)
 
 so it manages how users create accounts
 and securely access the application.
 """
 
-from flask import Blueprint, render_template, request, flash, redirect, url_for
+from functools import wraps
+
+from flask import Blueprint, render_template, request, flash, redirect, url_for, abort, current_app
 from flask_login import login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from .models import User
@@ -21,6 +24,18 @@ from . import db, send_email_safe
 
 auth = Blueprint('auth', __name__)
 
+
+def admin_required(view):
+    """Like login_required, but the user's email must also be in ADMIN_EMAILS (403 otherwise)."""
+    @wraps(view)
+    @login_required
+    def wrapped(*args, **kwargs):
+        if (current_user.email or '').lower() not in current_app.config.get('ADMIN_EMAILS', ()):
+            abort(403)
+        return view(*args, **kwargs)
+    return wrapped
+
+
 # Login Page logic
 @auth.route('/login', methods=['GET', 'POST'])
 def login():
@@ -121,6 +136,7 @@ def sign_up():
                 )
                 if not ok:
                     print("Signup email error: see [MAIL ERROR] log above")
+                db.session.commit()  # writes the queued confirmation email
 
 
                 login_user(new_user, remember=True)
@@ -0,0 +1,237 @@
+"""
+This file contains the in-memory candidate index used for matching.
+
+It keeps, per worker process, a bucket map
+    (topic, language, week, slot bit) -> set of eligible, unmatched user ids
+plus a small record for each of these users (openness score and the
+availability bitmask, see time_slots.py).
+
+The index is updated whenever a user's eligibility changes
+(demographics form, questionnaire, match creation), so the synchronous
+match lookup after the demographics form only looks at one bucket
+instead of querying the whole user table.
+
+load_candidates() is the narrow loader used by the whole matching pipeline:
+it selects only the columns matching needs and returns CandidateRecords,
+no full User objects (no password hashes, questionnaire texts, ...).
+
+Because every gunicorn worker has its own copy, the index is also
+rebuilt from the database every REBUILD_INTERVAL seconds, and a chosen
+partner is always re-checked against the database before a match is created.
+"""
+
+import time
+from collections import defaultdict
+from threading import RLock
+
+from . import db
+from .models import User
+from .time_slots import common_mask, decode_slots, encode_slots, first_bit, mask_bits, slot_value
+
+
+REBUILD_INTERVAL = 300  # seconds
+
+# The only User columns the matching pipeline loads
+CANDIDATE_COLUMNS = (
+    User.id,
+    User.topic,
+    User.language,
+    User.openness_score,
+    User.availability_week,
+    User.availability_mask,
+)
+
+
+class CandidateRecord:
+    """Compact matching data of one eligible user."""
+    __slots__ = ("user_id", "topic", "language", "week", "mask", "openness_score")
+
+    # Only eligible users are loaded as records, and they are never extremists
+    is_extremist = False
+
+    def __init__(self, user_id, topic, language, week, mask, openness_score):
+        self.user_id = user_id
+        self.topic = topic
+        self.language = language
+        self.week = week
+        self.mask = mask
+        self.openness_score = openness_score
+
+    @classmethod
+    def from_user(cls, user):
+        week, mask = availability_of(user)
+        return cls(
+            user_id=user.id,
+            topic=user.topic,
+            language=user.language,
+            week=week,
+            mask=mask,
+            openness_score=float(user.openness_score),
+        )
+
+    @property
+    def id(self):
+        return self.user_id
+
+    @property
+    def slots(self):
+        """The slot strings (earliest first)."""
+        return decode_slots(self.week, self.mask)
+
+    def common_slot(self, other):
+        """Earliest slot both are available in (slot string), or None."""
+        common = common_mask(self.week, self.mask, other.week, other.mask)
+        return slot_value(self.week, first_bit(common)) if common else None
+
+
+def availability_of(user):
+    """
+    (week, mask) of a CandidateRecord, a User or a CANDIDATE_COLUMNS row.
+    A User that was not saved since its slots changed is encoded from time_slot_1..3.
+    """
+    if isinstance(user, CandidateRecord):
+        return user.week, user.mask
+    if getattr(user, "availability_mask", None) is None and hasattr(user, "time_slot_1"):
+        return encode_slots([user.time_slot_1, user.time_slot_2, user.time_slot_3])
+    return user.availability_week, user.availability_mask
+
+
+def is_eligible(user):
+    """Same conditions as the candidate filter in find_best_match_for_user."""
+    return bool(
+        user is not None
+        and user.topic
+        and user.language
+        and user.demo
+        and not user.is_extremist
+        and not user.haspartner
+        and user.openness_score is not None
+        and availability_of(user)[1]
+    )
+
+
+def eligible_criteria():
+    """Filter conditions of an eligible, unmatched user (see is_eligible)."""
+    return (
+        User.demo.is_(True),
+        User.is_extremist.is_(False),
+        (User.haspartner.is_(False) | User.haspartner.is_(None)),
+        User.openness_score.isnot(None),
+        User.topic.isnot(None),
+        User.language.isnot(None),
+    )
+
+
+def load_candidates(*criteria):
+    """
+    Load all eligible users (optionally narrowed by extra filter criteria)
+    as CandidateRecords, with one query over CANDIDATE_COLUMNS only.
+    """
+    rows = (
+        db.session.query(*CANDIDATE_COLUMNS)
+        .filter(*eligible_criteria(), *criteria)
+        .order_by(User.id)
+        .all()
+    )
+    return [CandidateRecord.from_user(row) for row in rows]
+
+
+def load_candidate(user_id):
+    """The CandidateRecord of one user, or None if the user is not eligible (anymore)."""
+    records = load_candidates(User.id == user_id)
+    return records[0] if records else None
+
+
+class CandidateIndex:
+    def __init__(self, rebuild_interval=REBUILD_INTERVAL):
+        self.rebuild_interval = rebuild_interval
+        self.lock = RLock()
+        self.buckets = defaultdict(set)
+        self.records = {}
+        self.built_at = None
+
+    # ---------------- maintenance ----------------
+
+    def rebuild(self):
+        """Reload all eligible users from the database (one narrow query)."""
+        records = load_candidates()
+
+        with self.lock:
+            self.buckets = defaultdict(set)
+            self.records = {}
+            for record in records:
+                self._add(record)
+            self.built_at = time.monotonic()
+
+        print(f"[INDEX] Rebuilt candidate index: {len(self.records)} users, {len(self.buckets)} buckets")
+
+    def ensure_fresh(self):
+        """Build the index on first use and refresh it when it gets old."""
+        if self.built_at is None or time.monotonic() - self.built_at > self.rebuild_interval:
+            self.rebuild()
+
+    def update_user(self, user):
+        """Re-evaluate one user after their eligibility may have changed."""
+        with self.lock:
+            self._remove(user.id)
+            if is_eligible(user):
+                self._add(CandidateRecord.from_user(user))
+
+    def update_record(self, user_id, record):
+        """Replace the entry of one user with a freshly loaded record (None = remove)."""
+        with self.lock:
+            self._remove(user_id)
+            if record is not None and record.mask:
+                self._add(record)
+
+    def remove_user(self, user_id):
+        with self.lock:
+            self._remove(user_id)
+
+    def _add(self, record):
+        self.records[record.user_id] = record
+        for bit in mask_bits(record.mask or 0):
+            self.buckets[(record.topic, record.language, record.week, bit)].add(record.user_id)
+
+    def _remove(self, user_id):
+        record = self.records.pop(user_id, None)
+        if record is None:
+            return
+        for bit in mask_bits(record.mask or 0):
+            key = (record.topic, record.language, record.week, bit)
+            bucket = self.buckets.get(key)
+            if bucket is not None:
+                bucket.discard(user_id)
+                if not bucket:
+                    del self.buckets[key]
+
+    # ---------------- lookup ----------------
+
+    def candidates_for(self, record):
+        """
+        Return [(record, common_slot)] for all indexed users sharing at least
+        one (topic, language, week, bit) bucket with the given CandidateRecord.
+        common_slot is the earliest shared slot.
+        """
+        self.ensure_fresh()
+
+        found = {}
+        with self.lock:
+            for bit in mask_bits(record.mask or 0):
+                for user_id in self.buckets.get((record.topic, record.language, record.week, bit), ()):
+                    if user_id != record.user_id and user_id not in found:
+                        found[user_id] = (self.records[user_id], slot_value(record.week, bit))
+
+        return list(found.values())
+
+    def stats(self):
+        with self.lock:
+            return {
+                "users": len(self.records),
+                "buckets": len(self.buckets),
+                "largest_bucket": max((len(b) for b in self.buckets.values()), default=0),
+            }
+
+
+# Global index instance (one per worker process)
+candidate_index = CandidateIndex()
@@ -0,0 +1,370 @@
+"""
+This file contains the cohort statistics of the opinion shift (before vs after the discussion).
+
+A cohort is everybody with the same topic and language. For each cohort one
+row in cohort_snapshots keeps the aggregates of all its post-questionnaires:
+
+- per question: number of paired answers (match_i AND post_match_i), sums of
+  the before / after values, sum and sum of squares of the shift, and the
+  distribution of the shift (-4..+4)
+- per user: number of users, sum and sum of squares of their mean shift and
+  its distribution in steps of 0.25
+
+All of these are sums, so
+- a new post-questionnaire only adds its own contribution to one row
+  (record_post_questionnaire); a changed answer removes the old one first
+- per-topic and per-language figures are the sum of the matching rows
+- the opinion shift page compares a user with their cohort from one or two
+  rows instead of reading every user
+
+rebuild_snapshots() recomputes every row from the user table with one
+column query and NumPy (no ORM objects):
+
+    flask --app main cohort-stats --rebuild
+"""
+
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from . import db
+from .models import User, CohortSnapshot
+from .feature_vectors import MATCH_FIELDS
+
+
+POST_MATCH_FIELDS = [
+    'post_match1_support', 'post_match2_benefits', 'post_match3_action',
+    'post_match4_impact', 'post_match5_attention', 'post_match6_trust',
+    'post_match7_econnected', 'post_match8_misunderstanding',
+    'post_match9_priority', 'post_match10_values',
+]
+QUESTION_COUNT = len(MATCH_FIELDS)
+
+# Answers are -2..2, so a shift is -4..4
+SHIFT_MIN, SHIFT_MAX = -4, 4
+SHIFT_BINS = SHIFT_MAX - SHIFT_MIN + 1
+MEAN_SHIFT_STEP = 0.25
+MEAN_SHIFT_BINS = int((SHIFT_MAX - SHIFT_MIN) / MEAN_SHIFT_STEP) + 1
+
+# name -> shape of one cohort's aggregate
+STAT_SHAPES = {
+    "answered": (QUESTION_COUNT,),
+    "before_sum": (QUESTION_COUNT,),
+    "after_sum": (QUESTION_COUNT,),
+    "shift_sum": (QUESTION_COUNT,),
+    "shift_sq_sum": (QUESTION_COUNT,),
+    "shift_hist": (QUESTION_COUNT, SHIFT_BINS),
+    "users": (),
+    "user_shift_sum": (),
+    "user_shift_sq_sum": (),
+    "user_shift_hist": (MEAN_SHIFT_BINS,),
+}
+
+
+# ========================================
+# Aggregation (vectorized)
+# ========================================
+
+def empty_stats(groups=None):
+    """Zero aggregates of one cohort, or of `groups` cohorts stacked on axis 0."""
+    prefix = () if groups is None else (groups,)
+    return {name: np.zeros(prefix + shape) for name, shape in STAT_SHAPES.items()}
+
+
+def cohort_key(topic, language):
+    """Snapshot key of a user; a missing topic / language is stored as ''."""
+    return topic or '', language or ''
+
+
+def response_arrays(rows):
+    """
+    Rows of (match1..10, post_match1..10) -> (before, after), two
+    (n, 10) float arrays with NaN for a missing answer.
+    """
+    values = np.array(rows, dtype=np.float64).reshape(len(rows), 2 * QUESTION_COUNT)
+    return values[:, :QUESTION_COUNT], values[:, QUESTION_COUNT:]
+
+
+def aggregate(before, after, group=None, groups=1):
+    """
+    Aggregates of the users in (before, after), summed per cohort.
+    group: cohort index of every user (all in cohort 0 if None).
+    Returns the stats of `groups` cohorts stacked on axis 0.
+    """
+    n = len(before)
+    group = np.zeros(n, dtype=np.intp) if group is None else np.asarray(group, dtype=np.intp)
+    stats = empty_stats(groups)
+    if n == 0:
+        return stats
+
+    shift = after - before
+    paired = ~np.isnan(shift)
+    shift0 = np.where(paired, shift, 0.0)
+
+    def per_group(values):
+        out = np.zeros((groups,) + values.shape[1:])
+        np.add.at(out, group, values)
+        return out
+
+    stats["answered"] = per_group(paired.astype(np.float64))
+    stats["before_sum"] = per_group(np.where(paired, before, 0.0))
+    stats["after_sum"] = per_group(np.where(paired, after, 0.0))
+    stats["shift_sum"] = per_group(shift0)
+    stats["shift_sq_sum"] = per_group(shift0 ** 2)
+
+    rows, questions = np.nonzero(paired)
+    bins = np.clip(shift[rows, questions] - SHIFT_MIN, 0, SHIFT_BINS - 1).astype(np.intp)
+    np.add.at(stats["shift_hist"], (group[rows], questions, bins), 1)
+
+    # Mean shift of every user with at least one paired answer
+    answered = paired.sum(axis=1)
+    has_shift = answered > 0
+    user_shift = shift0[has_shift].sum(axis=1) / answered[has_shift]
+    user_group = group[has_shift]
+    np.add.at(stats["users"], user_group, 1)
+    np.add.at(stats["user_shift_sum"], user_group, user_shift)
+    np.add.at(stats["user_shift_sq_sum"], user_group, user_shift ** 2)
+    np.add.at(stats["user_shift_hist"], (user_group, mean_shift_bin(user_shift)), 1)
+    return stats
+
+
+def mean_shift_bin(mean_shift):
+    """Bin of user_shift_hist a mean shift falls into."""
+    index = np.rint((np.asarray(mean_shift) - SHIFT_MIN) / MEAN_SHIFT_STEP)
+    return np.clip(index, 0, MEAN_SHIFT_BINS - 1).astype(np.intp)
+
+
+def combine(stats_list, signs=None):
+    """Sum of several cohorts' aggregates (signs: +1 / -1 per entry)."""
+    total = empty_stats()
+    for i, stats in enumerate(stats_list):
+        sign = 1 if signs is None else signs[i]
+        for name in STAT_SHAPES:
+            total[name] = total[name] + sign * stats[name]
+    return total
+
+
+def stats_to_json(stats):
+    return {name: np.asarray(value).tolist() for name, value in stats.items()}
+
+
+def stats_from_json(data):
+    stats = empty_stats()
+    for name, shape in STAT_SHAPES.items():
+        if data and name in data:
+            stats[name] = np.asarray(data[name], dtype=np.float64).reshape(shape)
+    return stats
+
+
+# ========================================
+# Snapshots
+# ========================================
+
+def load_responses(*filters):
+    """(keys, before, after) of all users, from one column query."""
+    rows = db.session.execute(
+        select(User.topic, User.language,
+               *[getattr(User, f) for f in MATCH_FIELDS],
+               *[getattr(User, f) for f in POST_MATCH_FIELDS])
+        .where(*filters)
+    ).all()
+    keys = [cohort_key(row[0], row[1]) for row in rows]
+    before, after = response_arrays([row[2:] for row in rows])
+    return keys, before, after
+
+
+def compute_snapshots(keys, before, after):
+    """{(topic, language): stats} of every cohort that has at least one shift."""
+    if not keys:
+        return {}
+    cohorts = sorted(set(keys))
+    index = {key: i for i, key in enumerate(cohorts)}
+    group = np.fromiter((index[key] for key in keys), dtype=np.intp, count=len(keys))
+    stacked = aggregate(before, after, group, len(cohorts))
+
+    snapshots = {}
+    for i, key in enumerate(cohorts):
+        stats = {name: stacked[name][i] for name in STAT_SHAPES}
+        if stats["users"] > 0:
+            snapshots[key] = stats
+    return snapshots
+
+
+def rebuild_snapshots():
+    """Recompute all cohort snapshots from the user table. Returns the number of cohorts."""
+    snapshots = compute_snapshots(*load_responses())
+    now = datetime.utcnow()
+    try:
+        CohortSnapshot.query.delete(synchronize_session=False)
+        if snapshots:
+            db.session.execute(insert(CohortSnapshot), [
+                {
+                    "topic": topic,
+                    "language": language,
+                    "users": int(stats["users"]),
+                    "stats": stats_to_json(stats),
+                    "updated_at": now,
+                }
+                for (topic, language), stats in snapshots.items()
+            ])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    print(f"[COHORT] Rebuilt {len(snapshots)} cohort snapshot(s)")
+    return len(snapshots)
+
+
+def post_answers(user):
+    """The user's post_match1..10 answers, in question order."""
+    return [getattr(user, f, None) for f in POST_MATCH_FIELDS]
+
+
+def _create_empty_snapshot(topic, language):
+    """
+    Make sure the cohort has a snapshot row before it is locked.
+    Two first submissions of a new cohort may both get here; the unique
+    (topic, language) constraint lets only one insert win, the other one
+    then updates that row.
+    """
+    row = {"topic": topic, "language": language, "users": 0, "stats": None, "updated_at": datetime.utcnow()}
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        db.session.execute(
+            dialect_insert(CohortSnapshot).values(**row)
+            .on_conflict_do_nothing(index_elements=["topic", "language"])
+        )
+        return
+
+    if CohortSnapshot.query.filter_by(topic=topic, language=language).first() is not None:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(CohortSnapshot).values(**row))
+    except IntegrityError:
+        pass  # created concurrently
+
+
+def record_post_questionnaire(user, previous_answers=None):
+    """
+    Add a submitted post-questionnaire to the snapshot of the user's cohort.
+    previous_answers: the post_match answers before this submission, whose
+    contribution is removed first (None for a first submission).
+    The caller commits.
+    """
+    before = [getattr(user, f, None) for f in MATCH_FIELDS]
+    rows = [before + post_answers(user)]
+    signs = [1]
+    if previous_answers is not None:
+        rows.append(before + list(previous_answers))
+        signs.append(-1)
+
+    before_values, after_values = response_arrays(rows)
+    contribution = aggregate(before_values, after_values, group=np.arange(len(rows)), groups=len(rows))
+    delta = combine([{name: contribution[name][i] for name in STAT_SHAPES} for i in range(len(rows))], signs)
+    if not any(np.any(value) for value in delta.values()):
+        return None  # nothing changed
+
+    topic, language = cohort_key(user.topic, user.language)
+    _create_empty_snapshot(topic, language)
+    snapshot = (
+        CohortSnapshot.query
+        .filter_by(topic=topic, language=language)
+        .with_for_update()
+        .one()
+    )
+
+    stats = combine([stats_from_json(snapshot.stats), delta])
+    snapshot.stats = stats_to_json(stats)
+    snapshot.users = int(stats["users"])
+    snapshot.updated_at = datetime.utcnow()
+    return snapshot
+
+
+# ========================================
+# Reading
+# ========================================
+
+def _mean(total, count):
+    return float(total) / float(count) if count else None
+
+
+def summarize(stats):
+    """Means, spread and distributions of one cohort's aggregates."""
+    answered = stats["answered"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_shift = np.where(answered > 0, stats["shift_sum"] / answered, np.nan)
+        mean_before = np.where(answered > 0, stats["before_sum"] / answered, np.nan)
+        mean_after = np.where(answered > 0, stats["after_sum"] / answered, np.nan)
+
+    def as_list(values):
+        return [None if np.isnan(v) else round(float(v), 3) for v in values]
+
+    users = int(stats["users"])
+    avg_shift = _mean(stats["user_shift_sum"], users)
+    std_shift = None
+    if users:
+        std_shift = float(np.sqrt(max(stats["user_shift_sq_sum"] / users - avg_shift ** 2, 0.0)))
+
+    return {
+        "users": users,
+        "mean_shift": as_list(mean_shift),
+        "mean_before": as_list(mean_before),
+        "mean_after": as_list(mean_after),
+        "avg_shift": avg_shift,
+        "std_shift": std_shift,
+        "shift_distribution": stats["shift_hist"].astype(int).tolist(),
+        "user_shift_distribution": stats["user_shift_hist"].astype(int).tolist(),
+    }
+
+
+def shift_percentile(stats, avg_shift):
+    """Percentage of the cohort with a lower mean shift (ties count half)."""
+    users = stats["users"]
+    if not users or avg_shift is None:
+        return None
+    index = int(mean_shift_bin(avg_shift))
+    hist = stats["user_shift_hist"]
+    below = hist[:index].sum() + 0.5 * hist[index]
+    return round(float(100.0 * below / users), 1)
+
+
+def cohort_comparison(user, avg_shift=None):
+    """
+    The user's topic cohort (all languages) and topic + language cohort,
+    each summarized with the user's percentile. Reads only the snapshots of
+    the user's topic.
+    """
+    topic, language = cohort_key(user.topic, user.language)
+    snapshots = CohortSnapshot.query.filter_by(topic=topic).all()
+
+    comparison = {}
+    topic_stats = combine([stats_from_json(s.stats) for s in snapshots])
+    language_stats = combine([stats_from_json(s.stats) for s in snapshots if s.language == language])
+    for name, stats in (("topic", topic_stats), ("language", language_stats)):
+        if stats["users"] > 0:
+            summary = summarize(stats)
+            summary["percentile"] = shift_percentile(stats, avg_shift)
+            comparison[name] = summary
+    return comparison
+
+
+def cohort_overview():
+    """Per-topic and per-language summaries of all snapshots."""
+    snapshots = CohortSnapshot.query.all()
+    by_topic = {}
+    by_language = {}
+    for snapshot in snapshots:
+        stats = stats_from_json(snapshot.stats)
+        by_topic.setdefault(snapshot.topic, []).append(stats)
+        by_language.setdefault(snapshot.language, []).append(stats)
+
+    return {
+        "topics": {topic or "unknown": summarize(combine(items)) for topic, items in by_topic.items()},
+        "languages": {language or "unknown": summarize(combine(items)) for language, items in by_language.items()},
+        "updated_at": max((s.updated_at for s in snapshots if s.updated_at), default=None),
+    }
@@ -0,0 +1,152 @@
+"""
+This file contains the database connection pool settings and metrics.
+
+Before, every request ran "SELECT 1" first to find out whether the
+database connection still works. Now the pool takes care of that:
+
+- pool_recycle replaces connections before the server drops them
+- DB_POOL_PRE_PING decides how connections are checked on checkout:
+    "idle"   (default) only connections that were idle for DB_POOL_PING_AFTER_IDLE seconds
+    "always" every checkout (SQLAlchemy's pool_pre_ping)
+    "off"    never
+- a dead connection is replaced by a fresh one transparently
+
+pool_metrics() shows checkouts, waiting time for a free connection and the
+current pool usage, which helps to size DB_POOL_SIZE for the worker count.
+"""
+
+import os
+import time
+from threading import Lock
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+
+class PoolMetrics:
+    def __init__(self):
+        self.lock = Lock()
+        self.checkouts = 0
+        self.connects = 0
+        self.invalidated = 0
+        self.pings = 0
+        self.ping_failures = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_wait(self, seconds):
+        with self.lock:
+            self.wait_count += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def increment(self, name):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "checkouts": self.checkouts,
+                "connects": self.connects,
+                "invalidated": self.invalidated,
+                "pings": self.pings,
+                "ping_failures": self.ping_failures,
+                "checkout_wait_avg": (self.wait_total / self.wait_count) if self.wait_count else None,
+                "checkout_wait_max": self.wait_max if self.wait_count else None,
+            }
+
+
+metrics = PoolMetrics()
+
+
+class MeasuredQueuePool(QueuePool):
+    """QueuePool that records how long a checkout had to wait for a free connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.record_wait(time.perf_counter() - started)
+
+
+def engine_options(db_url):
+    """Build SQLALCHEMY_ENGINE_OPTIONS from the DB_POOL_* environment variables."""
+    pre_ping = os.getenv('DB_POOL_PRE_PING', 'idle').lower()
+
+    options = {
+        "pool_pre_ping": pre_ping == "always",
+        "pool_recycle": int(os.getenv('DB_POOL_RECYCLE', 1800)),
+    }
+
+    # SQLite uses its own pool types; size and overflow only apply to server databases
+    if not db_url.startswith("sqlite"):
+        options.update({
+            "poolclass": MeasuredQueuePool,
+            "pool_size": int(os.getenv('DB_POOL_SIZE', 5)),
+            "max_overflow": int(os.getenv('DB_MAX_OVERFLOW', 10)),
+            "pool_timeout": int(os.getenv('DB_POOL_TIMEOUT', 30)),
+        })
+
+    return options
+
+
+def init_pool_events(app, engine):
+    """Attach metrics and (optional) ping-after-idle validation to the engine's pool."""
+    ping_after_idle = None
+    if os.getenv('DB_POOL_PRE_PING', 'idle').lower() == "idle":
+        ping_after_idle = int(os.getenv('DB_POOL_PING_AFTER_IDLE', 30))
+    app.config['DB_POOL_PING_AFTER_IDLE'] = ping_after_idle
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        metrics.increment("connects")
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.increment("invalidated")
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.increment("checkouts")
+
+        if ping_after_idle is None:
+            return
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if checked_in_at is None or time.monotonic() - checked_in_at < ping_after_idle:
+            return
+
+        metrics.increment("pings")
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+        except Exception:
+            metrics.increment("ping_failures")
+            # The pool throws this connection away and retries with a new one
+            raise exc.DisconnectionError()
+        finally:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+
+
+def pool_metrics(engine):
+    """Counters of this process plus the current state of the pool."""
+    data = metrics.snapshot()
+    pool = engine.pool
+    data["pool_class"] = type(pool).__name__
+    if isinstance(pool, QueuePool):
+        data.update({
+            "pool_size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": pool.overflow(),
+        })
+    return data
@@ -0,0 +1,112 @@
+"""
+This file contains the process-wide registry of opinion dimensions.
+
+OpinionDimension rows do not change after initialize_opinion_dimensions(),
+so they are loaded once per worker into an immutable snapshot with:
+- lookup by id, by name and by (question_type, question_number)
+- the precomputed weight vector of the 10 matching dimensions
+
+Every snapshot has a version number. Whenever dimensions or their weights
+are changed, call invalidate_registry() so the next access reloads them.
+"""
+
+from collections import namedtuple
+from threading import Lock
+from types import MappingProxyType
+
+import numpy as np
+
+from .models import OpinionDimension
+
+
+DimensionInfo = namedtuple(
+    "DimensionInfo",
+    [
+        "id",
+        "name",
+        "display_name",
+        "question_type",
+        "question_number",
+        "description",
+        "default_weight",
+        "is_active",
+    ],
+)
+
+
+class DimensionRegistry:
+    """Immutable snapshot of all opinion dimensions."""
+
+    def __init__(self, dimensions, version):
+        self.version = version
+
+        ordered = sorted(dimensions, key=lambda d: (d.question_type or "", d.question_number or 0))
+        self.dimensions = tuple(ordered)
+
+        self.by_id = MappingProxyType({d.id: d for d in ordered})
+        self.by_name = MappingProxyType({d.name: d for d in ordered})
+        self.by_key = MappingProxyType({(d.question_type, d.question_number): d for d in ordered})
+
+        matching = [d for d in ordered if d.question_type == "matching"]
+        self.matching = tuple(matching)
+
+        weights = np.array([float(d.default_weight) for d in matching], dtype=np.float64)
+        weights.setflags(write=False)
+        self.matching_weights = weights
+
+    def get(self, dimension_id):
+        return self.by_id.get(dimension_id)
+
+    def get_by_name(self, name):
+        return self.by_name.get(name)
+
+    def get_by_number(self, question_type, question_number):
+        return self.by_key.get((question_type, question_number))
+
+    def active(self):
+        return [d for d in self.dimensions if d.is_active]
+
+
+_registry = None
+_version = 0
+_lock = Lock()
+
+
+def _load_registry():
+    global _version
+    rows = OpinionDimension.query.all()
+    dimensions = [
+        DimensionInfo(
+            id=row.id,
+            name=row.name,
+            display_name=row.display_name,
+            question_type=row.question_type,
+            question_number=row.question_number,
+            description=row.description,
+            default_weight=row.default_weight if row.default_weight is not None else 1.0,
+            is_active=bool(row.is_active),
+        )
+        for row in rows
+    ]
+    _version += 1
+    print(f"[DIMENSIONS] Loaded registry v{_version} with {len(dimensions)} dimensions")
+    return DimensionRegistry(dimensions, _version)
+
+
+def get_registry():
+    """Return the current registry, loading it on first use."""
+    global _registry
+    registry = _registry
+    if registry is None:
+        with _lock:
+            if _registry is None:
+                _registry = _load_registry()
+            registry = _registry
+    return registry
+
+
+def invalidate_registry():
+    """Drop the cached registry; the next get_registry() reloads from the database."""
+    global _registry
+    with _lock:
+        _registry = None
@@ -0,0 +1,216 @@
+"""
+This file contains the streaming export of the study results.
+
+Two datasets can be exported:
+- participants: the questionnaire columns of every user (attitude1..5,
+  match1..10, post_match*, disc_evaluation*, openness_score, demographics),
+  without email, password or names
+- matches:      the Match rows
+
+Rows are never loaded as ORM objects. One column query is streamed with
+yield_per (a server-side cursor on PostgreSQL, fetchmany elsewhere) and
+written chunk by chunk, so memory stays the same for 100 or 100000
+participants:
+
+- CSV:             iter_csv() yields text chunks (used for the HTTP response)
+- Parquet / Arrow: write_columnar() writes one row group / record batch per
+                   chunk; needs the optional pyarrow package
+
+Filters: topic, language and a created_at date range (since / until).
+
+    flask --app main export participants --format parquet -o results.parquet --topic ai_employment
+    GET /admin/export/matches?language=de&since=2026-01-01
+"""
+
+import csv
+import io
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+from . import db
+from .models import User, Match
+
+
+CHUNK_SIZE = 1000
+FORMATS = ("csv", "parquet", "arrow")
+
+PARTICIPANT_COLUMNS = [
+    "id", "topic", "language", "demo", "gender", "age", "education", "job",
+    "openness_score", "is_extremist", "haspartner", "partner_id", "created_at",
+    *[f"attitude{i}" for i in range(1, 6)],
+    *[f"match{i}" for i in range(1, 11)],
+    "post_match1_support", "post_match2_benefits", "post_match3_action",
+    "post_match4_impact", "post_match5_attention", "post_match6_trust",
+    "post_match7_econnected", "post_match8_misunderstanding",
+    "post_match9_priority", "post_match10_values", "post_reflection",
+    *[f"disc_evaluation{i}" for i in range(1, 11)],
+]
+
+MATCH_COLUMNS = [
+    "id", "user_a_id", "user_b_id", "topic", "opposition_score", "match_decision",
+    "scheduled_time_slot", "both_open_minded", "status", "created_at", "expires_at",
+]
+
+
+class ExportError(ValueError):
+    """Invalid export request (unknown dataset / format, bad filter value)."""
+
+
+def parse_date(value, end=False):
+    """
+    'YYYY-MM-DD' or an ISO datetime -> datetime (None stays None).
+    A plain date as `end` means the whole day, i.e. the next midnight.
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ExportError(f"Invalid date: {value!r} (expected YYYY-MM-DD)")
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+def build_query(dataset, topic=None, language=None, since=None, until=None):
+    """The column query of a dataset with the filters applied. `until` is exclusive."""
+    if dataset == "participants":
+        query = select(*[getattr(User, name) for name in PARTICIPANT_COLUMNS])
+        created_at = User.created_at
+        if topic:
+            query = query.where(User.topic == topic)
+        if language:
+            query = query.where(User.language == language)
+        order = User.id
+    elif dataset == "matches":
+        query = select(*[getattr(Match, name) for name in MATCH_COLUMNS])
+        created_at = Match.created_at
+        if topic:
+            query = query.where(Match.topic == topic)
+        if language:
+            # Both users of a match have the same language
+            user_a = aliased(User)
+            query = query.join(user_a, user_a.id == Match.user_a_id).where(user_a.language == language)
+        order = Match.id
+    else:
+        raise ExportError(f"Unknown dataset: {dataset!r} (expected participants or matches)")
+
+    if since:
+        query = query.where(created_at >= since)
+    if until:
+        query = query.where(created_at < until)
+    return query.order_by(order)
+
+
+def iter_chunks(query, chunk_size=CHUNK_SIZE):
+    """Yield the rows of a query as lists of at most chunk_size tuples, streamed from the database."""
+    result = db.session.execute(query.execution_options(yield_per=chunk_size))
+    try:
+        for partition in result.partitions():
+            yield partition
+    finally:
+        result.close()
+
+
+def iter_csv(dataset, chunk_size=CHUNK_SIZE, **filters):
+    """Yield the CSV text of a dataset: the header, then one piece per chunk."""
+    query = build_query(dataset, **filters)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(query.selected_columns.keys())
+    for chunk in iter_chunks(query, chunk_size):
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def write_csv(dataset, path, chunk_size=CHUNK_SIZE, **filters):
+    """Write a dataset to a CSV file. Returns the number of rows."""
+    query = build_query(dataset, **filters)
+    rows = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(query.selected_columns.keys())
+        for chunk in iter_chunks(query, chunk_size):
+            writer.writerows(chunk)
+            rows += len(chunk)
+    return rows
+
+
+def _arrow_schema(query):
+    import pyarrow as pa
+    from sqlalchemy import Boolean, Date, DateTime, Float, Integer
+
+    fields = []
+    for column in query.selected_columns:
+        if isinstance(column.type, Boolean):
+            arrow_type = pa.bool_()
+        elif isinstance(column.type, Integer):
+            arrow_type = pa.int64()
+        elif isinstance(column.type, Float):
+            arrow_type = pa.float64()
+        elif isinstance(column.type, DateTime):
+            arrow_type = pa.timestamp("us")
+        elif isinstance(column.type, Date):
+            arrow_type = pa.date32()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column.key, arrow_type))
+    return pa.schema(fields)
+
+
+def write_columnar(dataset, path, file_format="parquet", chunk_size=CHUNK_SIZE, **filters):
+    """
+    Write a dataset as Parquet (one row group per chunk) or as an Arrow IPC
+    file (one record batch per chunk). Returns the number of rows.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportError("Parquet / Arrow export needs the pyarrow package (pip install pyarrow)")
+
+    query = build_query(dataset, **filters)
+    schema = _arrow_schema(query)
+
+    if file_format == "parquet":
+        writer = pq.ParquetWriter(path, schema)
+        write = writer.write_table
+    elif file_format == "arrow":
+        writer = pa.ipc.new_file(path, schema)
+        write = writer.write_table
+    else:
+        raise ExportError(f"Unknown columnar format: {file_format!r}")
+
+    rows = 0
+    try:
+        for chunk in iter_chunks(query, chunk_size):
+            columns = list(zip(*chunk))
+            write(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema,
+            ))
+            rows += len(chunk)
+    finally:
+        writer.close()
+    return rows
+
+
+def check_format(file_format):
+    if file_format not in FORMATS:
+        raise ExportError(f"Unknown format: {file_format!r} (expected one of {', '.join(FORMATS)})")
+
+
+def export_to_file(dataset, path, file_format="csv", chunk_size=CHUNK_SIZE, **filters):
+    """Export a dataset into a file in the given format. Returns the number of rows."""
+    check_format(file_format)
+    if file_format == "csv":
+        return write_csv(dataset, path, chunk_size, **filters)
+    return write_columnar(dataset, path, file_format, chunk_size, **filters)
@@ -0,0 +1,54 @@
+"""
+This file contains the packed matching feature vector of a user.
+
+The answers match1..match10 are stored a second time in
+User.matching_features as 10 little-endian float32 values (40 bytes),
+with NaN for a missing answer (the scorers only compare the dimensions
+both users answered).
+
+The column is filled automatically whenever a User with changed match
+answers is saved (see the mapper events in models.py), so the matchers can
+load a whole bucket with one narrow (id, matching_features) query instead
+of loading full User objects and converting every column.
+"""
+
+import numpy as np
+
+
+MATCH_FIELDS = [f'match{i}' for i in range(1, 11)]
+FEATURE_DTYPE = np.dtype('<f4')
+FEATURE_BYTES = len(MATCH_FIELDS) * FEATURE_DTYPE.itemsize
+
+
+def features_from_user(user):
+    """float32 vector of match1..match10 (NaN for missing or invalid answers)."""
+    vector = np.full(len(MATCH_FIELDS), np.nan, dtype=FEATURE_DTYPE)
+    for col, field in enumerate(MATCH_FIELDS):
+        value = getattr(user, field, None)
+        if value is None:
+            continue
+        try:
+            vector[col] = float(value)
+        except (ValueError, TypeError):
+            continue
+    return vector
+
+
+def pack_features(vector):
+    return np.asarray(vector, dtype=FEATURE_DTYPE).tobytes()
+
+
+def unpack_features(blob):
+    """Read-only float32 vector from a packed blob; all NaN if there is none."""
+    if not blob or len(blob) != FEATURE_BYTES:
+        return np.full(len(MATCH_FIELDS), np.nan, dtype=FEATURE_DTYPE)
+    return np.frombuffer(blob, dtype=FEATURE_DTYPE)
+
+
+def unpack_matrix(blobs):
+    """(N, 10) float64 score matrix from N packed blobs."""
+    scores = np.full((len(blobs), len(MATCH_FIELDS)), np.nan, dtype=np.float64)
+    for row, blob in enumerate(blobs):
+        if blob and len(blob) == FEATURE_BYTES:
+            scores[row] = np.frombuffer(blob, dtype=FEATURE_DTYPE)
+    return scores
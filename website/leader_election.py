@@ -0,0 +1,173 @@
+"""
+This file makes sure only ONE process runs the background matching loop.
+
+Under gunicorn every worker calls create_app() and starts its own
+scheduler thread. Without coordination every worker would run the same
+batch matching over the same users. Each scheduler therefore asks
+LeaderElection.ensure() before doing any work:
+
+- PostgreSQL: a session-level advisory lock (pg_try_advisory_lock) held on a
+  dedicated connection. If the leader process dies, its connection closes,
+  the lock is released, and another worker takes over on its next try.
+- other databases (SQLite): a lease row in scheduler_leases that the leader
+  renews every few seconds; it can be taken over once it has expired.
+
+A small heartbeat thread calls ensure() every RENEW_SECONDS, so leadership
+is kept (or taken over) even while the scheduler is busy with a long pass.
+"""
+
+import os
+import socket
+import uuid
+import zlib
+from datetime import datetime, timedelta
+from threading import Event, Thread
+
+from sqlalchemy import text, update
+from sqlalchemy.exc import IntegrityError
+
+from . import db
+from .models import SchedulerLease
+
+
+LEASE_SECONDS = 15   # a dead leader is replaced after at most this long
+RENEW_SECONDS = 5    # leader renews / followers retry this often
+
+
+class LeaderElection:
+    def __init__(self, app, name, lease_seconds=LEASE_SECONDS, on_change=None):
+        self.app = app
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self.on_change = on_change  # called with True/False when leadership changes
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lock_key = zlib.crc32(name.encode("utf-8"))
+        self.connection = None  # dedicated connection holding the advisory lock
+        self.is_leader = False
+        self.running = False
+        self.stopped = Event()
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            Thread(target=self._run_heartbeat, name=f"leader-{self.name}", daemon=True).start()
+
+    def stop(self):
+        """Stop the heartbeat and hand leadership over right away."""
+        self.running = False
+        self.stopped.set()
+        try:
+            self.release()
+        except Exception as e:
+            print(f"[LEADER] Could not release leadership: {e}")
+
+    def _run_heartbeat(self):
+        while self.running:
+            try:
+                self.ensure()
+            except Exception as e:
+                print(f"[LEADER] Election error: {e}")
+                self._set_leader(False)
+            self.stopped.wait(RENEW_SECONDS)
+
+    def ensure(self):
+        """Acquire or keep leadership. Returns True if this process is the leader."""
+        with self.app.app_context():
+            if db.engine.dialect.name == "postgresql":
+                leader = self._ensure_advisory_lock()
+            else:
+                leader = self._ensure_lease()
+
+        self._set_leader(leader)
+        return leader
+
+    def _set_leader(self, leader):
+        if leader == self.is_leader:
+            return
+        self.is_leader = leader
+        state = "became" if leader else "lost"
+        print(f"[LEADER] {self.holder} {state} leader for '{self.name}'")
+        if self.on_change is not None:
+            self.on_change(leader)
+
+    def release(self):
+        with self.app.app_context():
+            if self.connection is not None:
+                self._close_connection()
+            elif self.is_leader:
+                SchedulerLease.query.filter_by(name=self.name, holder=self.holder).delete()
+                db.session.commit()
+        self._set_leader(False)
+
+    # ---------------- PostgreSQL advisory lock ----------------
+
+    def _ensure_advisory_lock(self):
+        if self.connection is not None:
+            try:
+                # The lock lives as long as this connection does
+                self.connection.execute(text("SELECT 1"))
+                return True
+            except Exception as e:
+                print(f"[LEADER] Lost connection holding the advisory lock: {e}")
+                self._close_connection()
+
+        connection = db.engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            acquired = connection.execute(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": self.lock_key}
+            ).scalar()
+        except Exception:
+            connection.close()
+            raise
+
+        if acquired:
+            self.connection = connection
+            return True
+
+        connection.close()
+        return False
+
+    def _close_connection(self):
+        # Closing only returns the connection to the pool, where the session
+        # (and with it the lock) would live on: unlock explicitly, or throw
+        # the connection away if that is not possible.
+        try:
+            self.connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.lock_key})
+            self.connection.close()
+        except Exception:
+            try:
+                self.connection.invalidate()
+            except Exception:
+                pass
+        self.connection = None
+
+    # ---------------- lease row ----------------
+
+    def _ensure_lease(self):
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.lease_seconds)
+
+        try:
+            # Renew our own lease, or take over an expired one
+            result = db.session.execute(
+                update(SchedulerLease)
+                .where(
+                    SchedulerLease.name == self.name,
+                    (SchedulerLease.holder == self.holder) | (SchedulerLease.expires_at < now),
+                )
+                .values(holder=self.holder, expires_at=expires_at)
+            )
+            if result.rowcount == 1:
+                db.session.commit()
+                return True
+
+            if SchedulerLease.query.get(self.name) is not None:
+                db.session.rollback()
+                return False  # somebody else holds a valid lease
+
+            db.session.add(SchedulerLease(name=self.name, holder=self.holder, expires_at=expires_at))
+            db.session.commit()
+            return True
+        except IntegrityError:
+            db.session.rollback()  # another process inserted the lease first
+            return False
@@ -0,0 +1,280 @@
+"""
+This file contains the asynchronous outbound mail queue.
+
+Request handlers and the scheduler no longer talk to the SMTP server.
+send_email_safe() only stores the email in the outbox_emails table
+(durable, survives restarts), and a small, fixed pool of worker threads
+drains that table in the background:
+
+- rows are claimed with a conditional UPDATE, so several workers
+  (and several gunicorn processes) never send the same email twice
+- failed sends are retried with exponential backoff, up to MAX_ATTEMPTS
+- a crashed worker's claim runs out after CLAIM_LEASE and is picked up again
+- before draining, a worker renders due notifications (notifications.py)
+  into new outbox rows, so no template is rendered on a request path
+
+Queue depth and send latency are available via mail_queue_metrics().
+"""
+
+import time
+from datetime import datetime, timedelta
+from email.utils import formataddr
+from threading import Event, Lock, Thread
+
+from flask_mail import Message
+from sqlalchemy import event, update
+
+from . import db
+from .models import Notification, OutboxEmail
+from .smtp_pool import send_pooled, smtp_pool_stats
+
+
+BATCH_SIZE = 10
+POLL_INTERVAL = 5          # seconds between checks when nobody wakes the pool
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 30          # seconds; 30s, 60s, 120s, 240s ...
+BACKOFF_MAX = 3600
+CLAIM_LEASE = timedelta(minutes=10)
+
+
+# ========================================
+# Enqueue
+# ========================================
+
+def enqueue_email(subject, recipients, body=None, html=None, sender=None, commit=True):
+    """
+    Store an email in the outbox and wake up the worker pool.
+    With commit=False the row joins the caller's transaction, and the pool
+    is woken when the caller commits.
+    """
+    if isinstance(sender, (tuple, list)):
+        sender = formataddr(tuple(sender))
+
+    email = OutboxEmail(
+        recipients=",".join(r for r in recipients if r),
+        subject=subject,
+        body=body,
+        body_html=html,
+        sender=sender,
+        status="pending",
+        attempts=0,
+        next_attempt_at=datetime.utcnow(),
+    )
+    db.session.add(email)
+    if commit:
+        db.session.commit()
+        if pool is not None:
+            pool.wake()
+    elif pool is not None:
+        # The row is only visible to the workers once the caller has committed
+        event.listen(db.session(), "after_commit", lambda session: pool.wake(), once=True)
+    return email
+
+
+# ========================================
+# Metrics
+# ========================================
+
+class MailMetrics:
+    def __init__(self):
+        self.lock = Lock()
+        self.sent = 0
+        self.failed_attempts = 0
+        self.gave_up = 0
+        self.latency_count = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.latency_last = None
+
+    def record_sent(self, seconds):
+        with self.lock:
+            self.sent += 1
+            self.latency_count += 1
+            self.latency_total += seconds
+            self.latency_max = max(self.latency_max, seconds)
+            self.latency_last = seconds
+
+    def record_failure(self, gave_up):
+        with self.lock:
+            self.failed_attempts += 1
+            if gave_up:
+                self.gave_up += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "sent": self.sent,
+                "failed_attempts": self.failed_attempts,
+                "gave_up": self.gave_up,
+                "send_latency_avg": (self.latency_total / self.latency_count) if self.latency_count else None,
+                "send_latency_max": self.latency_max if self.latency_count else None,
+                "send_latency_last": self.latency_last,
+            }
+
+
+metrics = MailMetrics()
+
+
+def mail_queue_metrics():
+    """Queue depth (from the database) plus this process' send metrics."""
+    depth = {}
+    for status, count in db.session.query(
+        OutboxEmail.status, db.func.count(OutboxEmail.id)
+    ).group_by(OutboxEmail.status).all():
+        depth[status] = count
+
+    data = metrics.snapshot()
+    data["queue_depth"] = depth.get("pending", 0) + depth.get("sending", 0)
+    data["by_status"] = depth
+    data["notifications_pending"] = db.session.query(db.func.count(Notification.id)).filter(
+        Notification.status == "pending"
+    ).scalar()
+    data["workers"] = pool.size if pool is not None else 0
+    data["smtp_pool"] = smtp_pool_stats()
+    return data
+
+
+# ========================================
+# Worker pool
+# ========================================
+
+def backoff_delay(attempts):
+    """Seconds to wait before the next attempt after `attempts` failures."""
+    return min(BACKOFF_BASE * (2 ** (attempts - 1)), BACKOFF_MAX)
+
+
+def claim_batch(limit=BATCH_SIZE):
+    """
+    Claim up to `limit` due emails for this worker and return their ids.
+    Each row is claimed with a conditional UPDATE, so only one worker wins it.
+    """
+    now = datetime.utcnow()
+    due = OutboxEmail.status.in_(("pending", "sending"))
+
+    candidate_ids = [
+        row_id for (row_id,) in db.session.query(OutboxEmail.id)
+        .filter(due, OutboxEmail.next_attempt_at <= now)
+        .order_by(OutboxEmail.next_attempt_at, OutboxEmail.id)
+        .limit(limit)
+        .all()
+    ]
+
+    claimed = []
+    for row_id in candidate_ids:
+        result = db.session.execute(
+            update(OutboxEmail)
+            .where(OutboxEmail.id == row_id, due, OutboxEmail.next_attempt_at <= now)
+            .values(status="sending", next_attempt_at=now + CLAIM_LEASE)
+        )
+        if result.rowcount == 1:
+            claimed.append(row_id)
+
+    db.session.commit()
+    return claimed
+
+
+def deliver(email):
+    """Send one outbox row over SMTP. Raises on failure."""
+    msg = Message(subject=email.subject, recipients=email.recipients.split(","))
+    if email.sender:
+        msg.sender = email.sender
+    if email.body:
+        msg.body = email.body
+    if email.body_html:
+        msg.html = email.body_html
+    send_pooled(msg)
+
+
+def process_email(email_id):
+    """Send one claimed email and store the outcome."""
+    email = db.session.get(OutboxEmail, email_id)
+    if email is None or email.status != "sending":
+        return
+
+    started = time.perf_counter()
+    try:
+        deliver(email)
+    except Exception as e:
+        email.attempts += 1
+        email.last_error = str(e)[:1000]
+        gave_up = email.attempts >= MAX_ATTEMPTS
+        if gave_up:
+            email.status = "failed"
+        else:
+            email.status = "pending"
+            email.next_attempt_at = datetime.utcnow() + timedelta(seconds=backoff_delay(email.attempts))
+        db.session.commit()
+        metrics.record_failure(gave_up)
+        print(f"[MAIL ERROR] Outbox email {email.id} to {email.recipients} failed (attempt {email.attempts}): {e}")
+        return
+
+    email.status = "sent"
+    email.sent_at = datetime.utcnow()
+    email.attempts += 1
+    db.session.commit()
+    metrics.record_sent(time.perf_counter() - started)
+    print(f"[MAIL] Sent email to {email.recipients} with subject '{email.subject}'")
+
+
+def drain_once(limit=BATCH_SIZE):
+    """Claim and send one batch. Returns the number of emails processed."""
+    claimed = claim_batch(limit)
+    for email_id in claimed:
+        process_email(email_id)
+    return len(claimed)
+
+
+class MailWorkerPool:
+    def __init__(self, app, size):
+        self.app = app
+        self.size = size
+        self.running = False
+        self.threads = []
+        self.wakeup = Event()
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        for i in range(self.size):
+            thread = Thread(target=self._run_worker, name=f"mail-worker-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        print(f"✓ Mail worker pool started ({self.size} workers)")
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+
+    def wake(self):
+        self.wakeup.set()
+
+    def _run_worker(self):
+        while self.running:
+            processed = 0
+            try:
+                with self.app.app_context():
+                    from .notifications import render_due_notifications
+                    processed = render_due_notifications()
+                    processed += drain_once()
+            except Exception as e:
+                print(f"✗ Mail worker error: {e}")
+
+            # Keep draining while there is work, otherwise sleep until woken up
+            if processed == 0:
+                self.wakeup.wait(POLL_INTERVAL)
+                self.wakeup.clear()
+
+
+# Global pool instance
+pool = None
+
+
+def init_mail_queue(app):
+    """Initialize and start the mail worker pool (MAIL_QUEUE_WORKERS threads)."""
+    global pool
+    size = app.config.get('MAIL_QUEUE_WORKERS', 2)
+    if pool is None and size > 0:
+        pool = MailWorkerPool(app, size)
+        pool.start()
+    return pool
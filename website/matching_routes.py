@@ -14,30 +14,42 @@ This file connects the matching logic with the frontend through JSON-based API r
 """
 
 
-from flask import Blueprint, jsonify, request
+import calendar
+import hashlib
+
+from flask import Blueprint, jsonify, make_response, request
 from flask_login import login_required, current_user
 from datetime import datetime
-from .models import db, User, UserOpinion, OpinionDimension, Match
+from .models import db, UserOpinion, Match
 from .matching_service import MatchingService
+from .dimension_registry import get_registry
+from .auth import admin_required
 
 matching_bp = Blueprint('matching', __name__, url_prefix='/api/matching')
 
+MATCHES_PAGE_SIZE = 20
+MATCHES_PAGE_MAX = 100
+
 
 @matching_bp.route('/opinions', methods=['GET'])
 @login_required
 def get_user_opinions():
     """Get current user's opinions"""
     opinions = UserOpinion.query.filter_by(user_id=current_user.id).all()
-    
-    return jsonify({
-        'opinions': [{
-            'dimension': op.dimension.name,
-            'display_name': op.dimension.display_name,
+    registry = get_registry()
+
+    result = []
+    for op in opinions:
+        dimension = registry.get(op.dimension_id) or op.dimension
+        result.append({
+            'dimension': dimension.name,
+            'display_name': dimension.display_name,
             'score': op.score,
             'weight': op.effective_weight,
-            'question_type': op.dimension.question_type
-        } for op in opinions]
-    })
+            'question_type': dimension.question_type
+        })
+
+    return jsonify({'opinions': result})
 
 
 @matching_bp.route('/opinions', methods=['POST'])
@@ -50,6 +62,7 @@ def update_opinions():
         return jsonify({'error': 'Invalid data'}), 400
     
     try:
+        registry = get_registry()
         for opinion_data in data['opinions']:
             dimension_name = opinion_data.get('dimension')
             score = opinion_data.get('score')
@@ -57,7 +70,7 @@ def update_opinions():
             if score is None or not -2 <= score <= 2:
                 continue
             
-            dimension = OpinionDimension.query.filter_by(name=dimension_name).first()
+            dimension = registry.get_by_name(dimension_name)
             if not dimension:
                 continue
             
@@ -88,31 +101,78 @@ def update_opinions():
 @matching_bp.route('/matches', methods=['GET'])
 @login_required
 def get_matches():
-    """Get current user's matches"""
-    status = request.args.get('status', None)
-    matches = MatchingService.get_user_matches(current_user.id, status)
-    
+    """
+    Get current user's matches (newest first), one page at a time.
+
+    Query parameters: status, limit (default 20, max 100) and cursor
+    (next_cursor of the previous page).
+
+    The response has an ETag built from User.matches_version, which is
+    already loaded with current_user. A client that polls with If-None-Match
+    gets 304 without any match query, until one of its matches changes or
+    an active match reaches expires_at (that time is part of the ETag).
+    The partner's user_name is shown too: renaming a user bumps the version
+    of all their partners (see models.py).
+    """
+    status = request.args.get('status') or None
+    cursor = request.args.get('cursor') or None
+    try:
+        limit = min(max(int(request.args.get('limit', MATCHES_PAGE_SIZE)), 1), MATCHES_PAGE_MAX)
+        before_id = int(cursor) if cursor else None
+    except ValueError:
+        return jsonify({'error': 'Invalid limit or cursor'}), 400
+
+    now = datetime.utcnow()
+    version_key = _matches_etag_key(status, cursor, limit)
+    for tag in request.if_none_match.as_set():
+        if _etag_still_valid(tag, version_key, now):
+            response = make_response('', 304)
+            response.set_etag(tag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+
+    rows, has_more = MatchingService.get_user_match_page(current_user.id, status, before_id, limit)
+
     result = []
-    for match in matches:
-        matched_user_id = match.user_b_id if match.user_a_id == current_user.id else match.user_a_id
-        matched_user = User.query.get(matched_user_id)
-        
-        # Skip if matched user not found
-        if not matched_user:
-            continue
-            
+    next_expiry = None
+    for row in rows:
+        is_active = Match.active_at(row.status, row.expires_at, now)
+        if is_active and row.expires_at:
+            next_expiry = min(next_expiry or row.expires_at, row.expires_at)
+
         result.append({
-            'id': match.id,
+            'id': row.id,
             'matched_user': {
-                'id': matched_user.id,
-                'user_name': matched_user.user_name
+                'id': row.partner_id,
+                'user_name': row.partner_user_name
             },
-            'opposition_score': round(match.opposition_score, 2),
-            'status': match.status,
-            'is_active': match.is_active
+            'opposition_score': round(row.opposition_score, 2),
+            'status': row.status,
+            'is_active': is_active
         })
-    
-    return jsonify({'matches': result})
+
+    response = jsonify({
+        'matches': result,
+        'next_cursor': str(rows[-1].id) if has_more else None
+    })
+    expiry = calendar.timegm(next_expiry.utctimetuple()) if next_expiry else 0
+    response.set_etag(f"{version_key}-{expiry}")
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _matches_etag_key(status, cursor, limit):
+    """Hash of everything the match list depends on, except the clock."""
+    key = f"{current_user.id}:{current_user.matches_version or 0}:{status}:{cursor}:{limit}"
+    return hashlib.sha1(key.encode()).hexdigest()[:20]
+
+
+def _etag_still_valid(tag, version_key, now):
+    """True if tag was sent for the same version and no active match has expired since."""
+    key, _, expiry = tag.partition('-')
+    if key != version_key or not expiry.isdigit():
+        return False
+    return expiry == '0' or calendar.timegm(now.utctimetuple()) < int(expiry)
 
 
 @matching_bp.route('/matches/<int:match_id>/accept', methods=['POST'])
@@ -142,7 +202,7 @@ def reject_match(match_id):
 @matching_bp.route('/dimensions', methods=['GET'])
 def get_opinion_dimensions():
     """Get all opinion dimensions"""
-    dimensions = OpinionDimension.query.filter_by(is_active=True).all()
+    dimensions = get_registry().active()
     
     return jsonify({
         'dimensions': [{
@@ -157,10 +217,9 @@ def get_opinion_dimensions():
 
 
 @matching_bp.route('/admin/run-matching', methods=['POST'])
-@login_required
+@admin_required
 def run_manual_matching():
     """Manually trigger batch matching"""
-    # TODO: Add admin permission check in production
     stats = MatchingService.run_batch_matching(max_matches_per_user=3)
     
     return jsonify({
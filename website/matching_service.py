@@ -11,26 +11,76 @@ UPDATED:
   who selected the same preferred language (User.language).
 """
 
-from flask import render_template
+from flask import current_app
+from sqlalchemy import Integer, and_, bindparam, case, column, func, insert, or_, select, tuple_, update, values
+from sqlalchemy.orm import aliased
 from datetime import datetime, timedelta
 
-from .models import UserOpinion, OpinionDimension, User, Match, db
-from . import send_email_safe
+from .models import OpinionDimension, User, Match, db
+from . import notify_eligibility_change
+from . import opposition_scoring
+from . import pair_assignment
+from . import slot_scheduler
+from .candidate_index import CandidateRecord, availability_of, candidate_index, load_candidate, load_candidates
+from .time_slots import common_mask, first_bit, slot_value
+from .dimension_registry import get_registry
 
 
 def time_overlap(u1, u2):
     """
-    Return a common time slot string if any overlap, else None.
-    Cleans None and stray whitespace/newlines.
+    Return the earliest common time slot string if any overlap, else None.
+    One AND of the availability bitmasks (see time_slots.py).
     """
-    slots1 = {u1.time_slot_1, u1.time_slot_2, u1.time_slot_3}
-    slots2 = {u2.time_slot_1, u2.time_slot_2, u2.time_slot_3}
+    week1, mask1 = availability_of(u1)
+    week2, mask2 = availability_of(u2)
+    common = common_mask(week1, mask1, week2, mask2)
+    return slot_value(week1, first_bit(common)) if common else None
 
-    slots1 = {s.strip() for s in slots1 if s}
-    slots2 = {s.strip() for s in slots2 if s}
 
-    common = list(slots1 & slots2)
-    return common[0] if common else None
+def openness_compatibility(user, candidate):
+    """
+    Compatibility of two users based on openness_score (higher = better):
+    closeness of the scores, with a slight preference for higher average openness.
+    """
+    u_open = float(user.openness_score)
+    c_open = float(candidate.openness_score)
+
+    diff = abs(u_open - c_open)
+    avg = (u_open + c_open) / 2.0
+
+    return (4.0 - diff) + avg
+
+
+# Match.opposition_score has a check constraint of 0..4
+MATCH_SCORE_MIN = 0.0
+MATCH_SCORE_MAX = 4.0
+
+
+def stored_match_score(score):
+    """
+    Value for Match.opposition_score. Scores inside 0..4 are stored as they
+    are, so new rows keep the meaning of the existing ones. Only an openness
+    compatibility outside that range (it can reach -2..6), which the check
+    constraint would reject, is clamped to the nearest bound.
+    """
+    return min(max(float(score), MATCH_SCORE_MIN), MATCH_SCORE_MAX)
+
+
+def bump_matches_version(user_ids):
+    """
+    Increment User.matches_version of these users (in the current transaction).
+    Every write to a user's matches must call this, otherwise clients polling
+    /api/matching/matches keep getting 304 for their old ETag.
+    """
+    user_ids = list(set(user_ids))
+    if not user_ids:
+        return
+    db.session.execute(
+        update(User)
+        .where(User.id.in_(user_ids))
+        .values(matches_version=func.coalesce(User.matches_version, 0) + 1)
+        .execution_options(synchronize_session=False)
+    )
 
 
 class MatchingService:
@@ -43,16 +93,11 @@ class MatchingService:
         Calculate an opposition score (0–4) using only the 10 matching dimensions.
         This is kept for future use, but NOT used in the current openness-based matching.
         """
-        a_ops = {
-            op.dimension.id: op
-            for op in user_a.opinions
-            if op.dimension and op.dimension.question_type == "matching"
-        }
-        b_ops = {
-            op.dimension.id: op
-            for op in user_b.opinions
-            if op.dimension and op.dimension.question_type == "matching"
-        }
+        registry = get_registry()
+        matching_ids = {dim.id for dim in registry.matching}
+
+        a_ops = {op.dimension_id: op for op in user_a.opinions if op.dimension_id in matching_ids}
+        b_ops = {op.dimension_id: op for op in user_b.opinions if op.dimension_id in matching_ids}
 
         common_dims = set(a_ops.keys()) & set(b_ops.keys())
         if not common_dims:
@@ -84,6 +129,26 @@ class MatchingService:
 
         return opposition_score, decision
 
+    # ------------------------------------------------------------------
+    # 1b) Batched opposition scores (match1–match10) for a whole bucket
+    # ------------------------------------------------------------------
+    @staticmethod
+    def score_bucket(topic, language, weights=None):
+        """
+        Score every pair of eligible users in one topic/language bucket.
+        Uses one query for the users and one for the dimension weights,
+        instead of one weight query per pair.
+
+        Returns (user_ids, opposition, decisions) where opposition[i, j] and
+        decisions[i, j] belong to the pair (user_ids[i], user_ids[j]).
+        """
+        user_ids, scores = opposition_scoring.load_bucket(topic, language)
+        if weights is None:
+            weights = opposition_scoring.load_matching_weights()
+
+        opposition, decisions = opposition_scoring.compute_opposition_matrix(scores, weights)
+        return user_ids, opposition, decisions
+
     # ------------------------------------------------------------------
     # 2) Core: openness-based matching for ONE user + language constraint
     # ------------------------------------------------------------------
@@ -128,55 +193,65 @@ class MatchingService:
             print(f"[MATCH] User {user.id} has no language, skipping.")
             return None
 
-        # Base candidate filter: same topic + same language, eligible, no partner yet
-        candidates = User.query.filter(
-            User.id != user.id,
-            User.topic == user.topic,
+        result = MatchingService.find_best_candidate(CandidateRecord.from_user(user))
+        if not result:
+            return None
 
-            # NEW: language match
-            User.language == user.language,
+        record, score, decision, slot = result
+        return User.query.get(record.user_id), score, decision, slot
 
-            User.demo.is_(True),
-            User.is_extremist.is_(False),
-            (User.haspartner.is_(False) | User.haspartner.is_(None)),
-            User.openness_score.isnot(None),
-        ).all()
+    @staticmethod
+    def find_best_candidate(record):
+        """
+        Best partner for an eligible user given as CandidateRecord.
+        Works on CandidateRecords only (no full User objects).
+        Returns (partner_record, score, decision, slot) or None.
+        """
+        # Candidates come from the in-memory (topic, language, slot) index,
+        # so only users sharing a bucket with this user are looked at.
+        candidates = candidate_index.candidates_for(record)
 
         if not candidates:
-            print(f"[MATCH] No candidates for user {user.id} on topic {user.topic} + language {user.language}")
+            print(f"[MATCH] No candidates for user {record.user_id} on topic {record.topic} + language {record.language}")
             return None
 
+        ranked = sorted(
+            candidates,
+            key=lambda item: openness_compatibility(record, item[0]),  # higher = better
+            reverse=True,
+        )
+
         best_candidate = None
         best_score = None
         best_slot = None
 
-        u_open = float(user.openness_score)
-
-        for candidate in candidates:
-            common_slot = time_overlap(user, candidate)
-            if not common_slot:
+        for indexed, _indexed_slot in ranked:
+            # The index may be stale (e.g. changed by another worker),
+            # so confirm the chosen partner against the database.
+            candidate = load_candidate(indexed.user_id)
+            common_slot = record.common_slot(candidate) if candidate is not None else None
+            if (
+                candidate is None
+                or candidate.topic != record.topic
+                or candidate.language != record.language
+                or common_slot is None
+            ):
+                candidate_index.update_record(indexed.user_id, candidate)
                 continue
 
-            c_open = float(candidate.openness_score)
-
-            diff = abs(u_open - c_open)
-            avg = (u_open + c_open) / 2.0
-
-            compatibility = (4.0 - diff) + avg  # higher = better
-
-            if (best_candidate is None) or (compatibility > best_score):
-                best_candidate = candidate
-                best_score = compatibility
-                best_slot = common_slot
+            best_candidate = candidate
+            best_score = openness_compatibility(record, candidate)
+            best_slot = common_slot
+            break
 
         if not best_candidate:
-            print(f"[MATCH] No candidate with overlapping slot for user {user.id}")
+            print(f"[MATCH] No candidate with overlapping slot for user {record.user_id}")
             return None
 
         decision = "openness_match"
         print(
-            f"[MATCH] Found openness-based match: {user.id} <-> {best_candidate.id}, "
-            f"score={best_score:.2f}, slot={best_slot}, language={user.language}"
+            f"[MATCH] Found openness-based match: {record.user_id} <-> {best_candidate.user_id}, "
+            f"score={best_score:.2f}, slot={best_slot}, language={record.language}"
         )
         return best_candidate, best_score, decision, best_slot
 
@@ -199,7 +274,7 @@ class MatchingService:
             user_a_id=user_a.id,
             user_b_id=user_b.id,
             topic=user_a.topic or user_b.topic,
-            opposition_score=opposition_score,
+            opposition_score=stored_match_score(opposition_score),
             match_decision=decision,
             scheduled_time_slot=common_slot,
             both_open_minded=(not user_a.is_extremist and not user_b.is_extremist),
@@ -209,8 +284,13 @@ class MatchingService:
         )
 
         db.session.add(match)
+        bump_matches_version([user_a.id, user_b.id])
         db.session.commit()
 
+        # Both users are about to be partnered, so they leave the candidate pool
+        candidate_index.remove_user(user_a.id)
+        candidate_index.remove_user(user_b.id)
+
         print(
             f"[MATCH] Match row created: {match.id} "
             f"({user_a.id} <-> {user_b.id}) topic={match.topic}"
@@ -218,109 +298,257 @@ class MatchingService:
         return match
 
     # ------------------------------------------------------------------
-    # 4) Batch matching for scheduler (wrapper around per-user)
+    # 4) Batch matching for scheduler
     # ------------------------------------------------------------------
     @staticmethod
-    def run_batch_matching(**kwargs):
+    def create_matches_batch(pairs):
+        """
+        Store a whole batch of pairs in ONE transaction:
+        - claim all users with one conditional UPDATE (haspartner = True only
+          where it is still unset); a pair is kept only if both of its users
+          were claimed, the other user of a conflicting pair is released again
+        - all Match rows of the kept pairs with one bulk INSERT
+        - partner_id / meeting_id of both users with one bulk UPDATE
+          (PostgreSQL: UPDATE ... FROM (VALUES ...); other databases: executemany by id)
+
+        Users that were partnered concurrently therefore only cost their own
+        pair; the rest of the batch is stored.
+
+        `pairs` is a list of (user, partner, score, decision, slot); users may be
+        User objects or CandidateRecords.
+        Returns [(match_id, pair)] of the stored pairs (empty if nothing was written).
+        Nothing is sent here; call notify_pairs() with the stored pairs afterwards.
+        """
+        pairs = [p for p in pairs if p[0] and p[1] and p[0].id != p[1].id]
+        if not pairs:
+            return []
+
+        try:
+            claimed = MatchingService._claim_users({user.id for pair in pairs for user in pair[:2]})
+
+            stored = []
+            used = set()
+            for pair in pairs:
+                ids = (pair[0].id, pair[1].id)
+                if all(user_id in claimed and user_id not in used for user_id in ids):
+                    stored.append(pair)
+                    used.update(ids)
+
+            skipped = len(pairs) - len(stored)
+            if skipped:
+                # Claimed users of a conflicting pair stay unpartnered
+                released = claimed - used
+                if released:
+                    db.session.execute(
+                        update(User)
+                        .where(User.id.in_(released))
+                        .values(haspartner=False)
+                        .execution_options(synchronize_session=False)
+                    )
+                print(f"[MATCH] Skipped {skipped} of {len(pairs)} pairs: some users were already partnered")
+
+            if not stored:
+                db.session.commit()
+                return []
+
+            now = datetime.utcnow()
+            match_rows = []
+            partner_rows = []
+            for user, partner, score, decision, slot in stored:
+                match_rows.append({
+                    "user_a_id": user.id,
+                    "user_b_id": partner.id,
+                    "topic": user.topic or partner.topic,
+                    "opposition_score": stored_match_score(score),
+                    "match_decision": decision,
+                    "scheduled_time_slot": slot,
+                    "both_open_minded": (not user.is_extremist and not partner.is_extremist),
+                    "status": "accepted",
+                    "created_at": now,
+                    "expires_at": now + timedelta(days=14),
+                })
+                partner_rows.append((user.id, partner.id, user.id))
+                partner_rows.append((partner.id, user.id, user.id))
+
+            match_ids = list(db.session.scalars(insert(Match).returning(Match.id), match_rows))
+
+            if db.session.get_bind().dialect.name == "postgresql":
+                v = values(
+                    column("id", Integer),
+                    column("partner_id", Integer),
+                    column("meeting_id", Integer),
+                    name="v",
+                ).data(partner_rows)
+                db.session.execute(
+                    update(User)
+                    .where(User.id == v.c.id)
+                    .values(partner_id=v.c.partner_id, meeting_id=v.c.meeting_id)
+                    .execution_options(synchronize_session=False)
+                )
+            else:
+                users = User.__table__
+                db.session.connection().execute(
+                    users.update()
+                    .where(users.c.id == bindparam("b_id"))
+                    .values(partner_id=bindparam("b_partner_id"), meeting_id=bindparam("b_meeting_id")),
+                    [
+                        {"b_id": user_id, "b_partner_id": partner_id, "b_meeting_id": meeting_id}
+                        for user_id, partner_id, meeting_id in partner_rows
+                    ],
+                )
+
+            bump_matches_version(used)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        # Partnered users leave the candidate pool, also those partnered elsewhere
+        for pair in pairs:
+            for user in pair[:2]:
+                if user.id in used or user.id not in claimed:
+                    candidate_index.remove_user(user.id)
+
+        print(f"[MATCH] Batch created {len(match_ids)} match rows")
+        return list(zip(match_ids, stored))
+
+    @staticmethod
+    def _claim_users(user_ids):
+        """
+        Set haspartner = True for the users of `user_ids` that are still
+        unpartnered (in the current transaction). Returns the set of claimed ids.
+        """
+        not_partnered = User.haspartner.is_(False) | User.haspartner.is_(None)
+        claim = (
+            update(User)
+            .where(not_partnered)
+            .values(haspartner=True)
+            .execution_options(synchronize_session=False)
+        )
+
+        if db.session.get_bind().dialect.update_returning:
+            return set(db.session.scalars(claim.where(User.id.in_(user_ids)).returning(User.id)))
+
+        return {
+            user_id for user_id in user_ids
+            if db.session.execute(claim.where(User.id == user_id)).rowcount == 1
+        }
+
+    @staticmethod
+    def notify_pairs(pairs):
+        """
+        Queue the zusage email for both users of every pair (after the matches
+        were committed). Only the payload is stored here; the emails are
+        rendered and sent in the background (see notifications.py).
+        """
+        from .notifications import enqueue_notifications
+
+        items = []
+        for user, partner, _score, _decision, slot in pairs:
+            items.append(("match", user.id, {"partner_id": partner.id, "topic": user.topic, "slot": slot}))
+            items.append(("match", partner.id, {"partner_id": user.id, "topic": partner.topic, "slot": slot}))
+
+        try:
+            enqueue_notifications(items)
+        except Exception as e:
+            db.session.rollback()
+            print(f"[BATCH MATCH] Could not queue match emails for {len(pairs)} pair(s): {e}")
+
+    @staticmethod
+    def pair_and_notify(user, partner, score, decision, slot):
+        """
+        Schedule the pair's session (slot_scheduler.py), create the Match row,
+        mark both users as partnered (one transaction), then queue the zusage
+        email for both of them.
+        Returns the new match id or None (also if all common slots are full).
+        """
+        scheduled, _unscheduled = slot_scheduler.schedule_pairs([(user, partner, score, decision, slot)])
+        if not scheduled:
+            return None
+        created = MatchingService.create_matches_batch(scheduled)
+        if not created:
+            return None
+        MatchingService.notify_pairs([pair for _match_id, pair in created])
+        return created[0][0]
+
+    @staticmethod
+    def run_batch_matching(mode=None, buckets=None, **kwargs):
         """
         Run a batch matching pass over all eligible users.
-        Uses the same openness-based logic as find_best_match_for_user.
         Returns a small stats dict.
+
+        mode:
+          - "optimal": pair everybody at once with a maximum-weight matching
+                       per (topic, language) group (see pair_assignment.py)
+          - "greedy":  every user in query order takes their personal best
+                       partner via find_best_candidate
+        Defaults to the MATCHING_MODE config value.
+
+        buckets: optional set of (topic, language) pairs; if given, only users
+        in these buckets are matched (used by the event-driven scheduler).
         """
+        if mode is None:
+            mode = current_app.config.get("MATCHING_MODE", "optimal")
+
         stats = {
             "users_processed": 0,
             "matches_created": 0,
             "topics_processed": 0,
+            "mode": mode,
         }
 
-        # All eligible users without partner
-        eligible_users = User.query.filter(
-            User.demo.is_(True),
-            User.is_extremist.is_(False),
-            (User.haspartner.is_(False) | User.haspartner.is_(None)),
-            User.openness_score.isnot(None),
-            User.topic.isnot(None),
+        # All eligible users without partner (topic AND language set),
+        # loaded as compact CandidateRecords instead of full User objects
+        criteria = []
+        if buckets is not None:
+            if not buckets:
+                return stats
+            criteria.append(or_(*[
+                and_(User.topic == topic, User.language == language)
+                for topic, language in buckets
+            ]))
 
-            # NEW: only users with language set can be matched
-            User.language.isnot(None),
-        ).all()
+        eligible_users = load_candidates(*criteria)
 
         stats["users_processed"] = len(eligible_users)
+        stats["topics_processed"] = len({user.topic for user in eligible_users})
+
+        if mode == "optimal":
+            pairs = [
+                (user, partner, score, "openness_match", slot)
+                for user, partner, score, slot
+                in pair_assignment.assign_pairs(eligible_users, openness_compatibility)
+            ]
+            # Then the sessions are spread over the slots (per-slot capacity)
+            pairs, unscheduled = slot_scheduler.schedule_pairs(pairs)
+            stats["unscheduled_pairs"] = len(unscheduled)
+
+            # One transaction for the whole pass, emails only after it committed
+            created = MatchingService.create_matches_batch(pairs)
+            if created:
+                MatchingService.notify_pairs([pair for _match_id, pair in created])
+                stats["matches_created"] += len(created)
+        else:
+            taken = set()
+            for user in eligible_users:
+                if user.user_id in taken:
+                    continue
 
-        topics = set()
-        for user in eligible_users:
-            topics.add(user.topic)
-
-            if user.haspartner:
-                continue
-
-            result = MatchingService.find_best_match_for_user(user)
-            if not result:
-                continue
-
-            partner, score, decision, slot = result
-
-            if partner.haspartner:
-                continue
-
-            match = MatchingService.create_match(user, partner, score, decision, slot)
-
-            user.haspartner = True
-            partner.haspartner = True
-            user.partner_id = partner.id
-            partner.partner_id = user.id
-            user.meeting_id = user.id
-            partner.meeting_id = user.id
-
-            # ---------- Format the time slot for email ----------
-            slot_label = None
-            if slot:
-                try:
-                    dt = datetime.fromisoformat(slot)
-                    slot_label = dt.strftime('%A, %d %B %Y, %H:%M')
-                except Exception as e:
-                    print(f"[BATCH MATCH] Could not parse slot '{slot}': {e}")
-                    slot_label = slot  # fallback
-
-            # ---------- Send zusage email to both users ----------
-            try:
-                html_a = render_template(
-                    "Email/zusage.html",
-                    user=user,
-                    partner=partner,
-                    topic=user.topic,
-                    slot_label=slot_label,
-                )
-                html_b = render_template(
-                    "Email/zusage.html",
-                    user=partner,
-                    partner=user,
-                    topic=partner.topic,
-                    slot_label=slot_label,
-                )
-
-                ok_a = send_email_safe(
-                    subject="You have been matched for a dialogue session",
-                    recipients=[user.email],
-                    html=html_a,
-                )
-                ok_b = send_email_safe(
-                    subject="You have been matched for a dialogue session",
-                    recipients=[partner.email],
-                    html=html_b,
-                )
+                result = MatchingService.find_best_candidate(user)
+                if not result:
+                    continue
 
-                print(f"[BATCH MATCH] Email status A={ok_a}, B={ok_b} for {user.email} & {partner.email}")
+                partner, score, decision, slot = result
 
-            except Exception as mail_exc:
-                print(f"[BATCH MATCH] Unexpected error while preparing match emails: {mail_exc}")
+                if partner.user_id in taken:
+                    continue
 
-            db.session.commit()
-            stats["matches_created"] += 1
+                if MatchingService.pair_and_notify(user, partner, score, decision, slot):
+                    taken.update((user.user_id, partner.user_id))
+                    stats["matches_created"] += 1
 
-        stats["topics_processed"] = len(topics)
         print(
-            f"[BATCH MATCH] users={stats['users_processed']}, "
+            f"[BATCH MATCH] mode={mode}, users={stats['users_processed']}, "
             f"topics={stats['topics_processed']}, "
             f"matches_created={stats['matches_created']}"
         )
@@ -342,6 +570,40 @@ class MatchingService:
             query = query.filter(Match.status == status)
         return query.order_by(Match.created_at.desc()).all()
 
+    @staticmethod
+    def get_user_match_page(user_id, status=None, before_id=None, limit=20):
+        """
+        One page of the user's matches together with the matched user, in ONE query.
+        Only the columns the API returns are selected (no Match / User objects).
+
+        Newest first by id (ids grow with created_at); pass the last id of a page
+        as `before_id` to get the next one.
+        Returns (rows, has_more); each row has id, opposition_score, status,
+        expires_at, partner_id and partner_user_name.
+        """
+        partner = aliased(User)
+        partner_id = case((Match.user_a_id == user_id, Match.user_b_id), else_=Match.user_a_id)
+
+        query = (
+            select(
+                Match.id,
+                Match.opposition_score,
+                Match.status,
+                Match.expires_at,
+                partner.id.label("partner_id"),
+                partner.user_name.label("partner_user_name"),
+            )
+            .join(partner, partner.id == partner_id)
+            .where(or_(Match.user_a_id == user_id, Match.user_b_id == user_id))
+        )
+        if status:
+            query = query.where(Match.status == status)
+        if before_id is not None:
+            query = query.where(Match.id < before_id)
+
+        rows = db.session.execute(query.order_by(Match.id.desc()).limit(limit + 1)).all()
+        return rows[:limit], len(rows) > limit
+
     # ------------------------------------------------------------------
     # 6) Accept / reject (kept for completeness)
     # ------------------------------------------------------------------
@@ -368,7 +630,11 @@ class MatchingService:
             user_a.meeting_id = user_a.id
             user_b.meeting_id = user_a.id
 
+        bump_matches_version([match.user_a_id, match.user_b_id])
         db.session.commit()
+
+        candidate_index.remove_user(match.user_a_id)
+        candidate_index.remove_user(match.user_b_id)
         return True
 
     @staticmethod
@@ -381,6 +647,8 @@ class MatchingService:
             return False
 
         match.status = "rejected"
+        bump_matches_version([match.user_a_id, match.user_b_id])
+        notify_eligibility_change(match.user_a_id, match.user_b_id)
         db.session.commit()
         return True
 
@@ -390,22 +658,52 @@ class MatchingService:
     @staticmethod
     def expire_old_matches():
         """
-        Expire matches whose expires_at is in the past and status is still pending.
+        Expire matches whose expires_at is in the past and status is still pending,
+        in ONE transaction:
+        - one UPDATE matches ... RETURNING of all expired matches
+        - one UPDATE user that releases both users (haspartner / partner_id /
+          meeting_id), but only while they are still partnered with each other
+        Released users go back into the candidate index.
         Returns the number of expired matches.
         """
         now = datetime.utcnow()
-        old_matches = Match.query.filter(
-            Match.status == "pending",
-            Match.expires_at.isnot(None),
-            Match.expires_at < now,
-        ).all()
-
-        count = 0
-        for match in old_matches:
-            match.status = "expired"
-            count += 1
-
-        if count > 0:
+        try:
+            expired = db.session.execute(
+                update(Match)
+                .where(
+                    Match.status == "pending",
+                    Match.expires_at.isnot(None),
+                    Match.expires_at < now,
+                )
+                .values(status="expired")
+                .returning(Match.id, Match.user_a_id, Match.user_b_id)
+                .execution_options(synchronize_session=False)
+            ).all()
+            if not expired:
+                db.session.rollback()
+                return 0
+
+            pairs = [(m.user_a_id, m.user_b_id) for m in expired]
+            pairs += [(b, a) for a, b in pairs]
+            released = db.session.scalars(
+                update(User)
+                .where(tuple_(User.id, User.partner_id).in_(pairs))
+                .values(haspartner=False, partner_id=None, meeting_id=None)
+                .returning(User.id)
+                .execution_options(synchronize_session=False)
+            ).all()
+
+            bump_matches_version(user_id for pair in pairs for user_id in pair)
             db.session.commit()
-
-        return count
+        except Exception:
+            db.session.rollback()
+            raise
+
+        # Released users are candidates again
+        if released:
+            records = {r.user_id: r for r in load_candidates(User.id.in_(released))}
+            for user_id in released:
+                candidate_index.update_record(user_id, records.get(user_id))
+
+        print(f"[MATCH] Expired {len(expired)} matches, released {len(released)} users")
+        return len(expired)
@@ -9,6 +9,8 @@ from . import db
 from flask_login import UserMixin
 from sqlalchemy.sql import func
 from datetime import datetime  
+from .feature_vectors import MATCH_FIELDS, features_from_user, pack_features
+from .time_slots import encode_slots
 
 
 class User(db.Model, UserMixin):
@@ -33,6 +35,8 @@ class User(db.Model, UserMixin):
     meeting_id = db.Column(db.Integer)
     hasarrived = db.Column(db.Boolean, default=False)
     paypal = db.Column(db.Boolean, default=False)
+    # Incremented whenever one of the user's matches changes (ETag of /api/matching/matches)
+    matches_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # ========================================
     #  ATTITUDE COLUMNS
@@ -56,11 +60,18 @@ class User(db.Model, UserMixin):
     match9 = db.Column(db.Integer)
     match10 = db.Column(db.Integer)
 
+    # match1..match10 packed as 10 float32 values (see feature_vectors.py), kept in sync automatically
+    matching_features = db.Column(db.LargeBinary, nullable=True)
+
     # Availability for up to three time slots
     time_slot_1 = db.Column(db.String(50), nullable=True)
     time_slot_2 = db.Column(db.String(50), nullable=True)
     time_slot_3 = db.Column(db.String(50), nullable=True)
 
+    # The same slots as one bit per slot of the form's week (see time_slots.py), kept in sync automatically
+    availability_week = db.Column(db.Date, nullable=True)
+    availability_mask = db.Column(db.Integer, nullable=True)
+
         # Post-discussion opinion response (after the discussion)
     post_match1_support = db.Column(db.Integer)              # I generally support the main idea or goal of this topic
     post_match2_benefits = db.Column(db.Integer)             # I believe the benefits of this topic outweigh its risks
@@ -101,6 +112,67 @@ class User(db.Model, UserMixin):
     matches_initiated = db.relationship('Match', foreign_keys='Match.user_a_id', back_populates='user_a', cascade='all, delete-orphan')
     matches_received = db.relationship('Match', foreign_keys='Match.user_b_id', back_populates='user_b', cascade='all, delete-orphan')
 
+    def refresh_matching_features(self):
+        """Recompute matching_features from match1..match10."""
+        self.matching_features = pack_features(features_from_user(self))
+
+    def refresh_availability(self):
+        """Recompute availability_week / availability_mask from time_slot_1..3."""
+        self.availability_week, self.availability_mask = encode_slots(
+            [self.time_slot_1, self.time_slot_2, self.time_slot_3]
+        )
+
+
+# Partial index for the matching eligibility filter (see candidate_index.eligible_criteria):
+# only eligible, unmatched users are in it, ordered by their (topic, language) bucket
+ELIGIBLE_USER_PREDICATE = db.and_(
+    User.demo.is_(True),
+    User.is_extremist.is_(False),
+    (User.haspartner.is_(False) | User.haspartner.is_(None)),
+    User.openness_score.isnot(None),
+)
+db.Index(
+    'ix_user_eligible_topic_language',
+    User.topic,
+    User.language,
+    postgresql_where=ELIGIBLE_USER_PREDICATE,
+    sqlite_where=ELIGIBLE_USER_PREDICATE,
+)
+
+
+SLOT_FIELDS = ['time_slot_1', 'time_slot_2', 'time_slot_3']
+
+
+@db.event.listens_for(User, 'before_insert')
+def _set_derived_columns_on_insert(mapper, connection, target):
+    target.refresh_matching_features()
+    target.refresh_availability()
+
+
+@db.event.listens_for(User, 'before_update')
+def _sync_derived_columns_on_update(mapper, connection, target):
+    state = db.inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in MATCH_FIELDS):
+        target.refresh_matching_features()
+    if any(state.attrs[field].history.has_changes() for field in SLOT_FIELDS):
+        target.refresh_availability()
+
+
+@db.event.listens_for(User, 'after_update')
+def _bump_partners_on_rename(mapper, connection, target):
+    # Every partner's match list shows this user_name, so their ETags must change
+    if not db.inspect(target).attrs.user_name.history.has_changes():
+        return
+    users = User.__table__
+    connection.execute(
+        users.update()
+        .where(
+            users.c.id.in_(db.select(Match.user_b_id).where(Match.user_a_id == target.id))
+            | users.c.id.in_(db.select(Match.user_a_id).where(Match.user_b_id == target.id))
+        )
+        .values(matches_version=func.coalesce(users.c.matches_version, 0) + 1)
+    )
+
  
 
 
@@ -162,7 +234,15 @@ class UserOpinion(db.Model):
     @property
     def effective_weight(self):
         """Get the effective weight (custom or default)"""
-        return self.custom_weight if self.custom_weight is not None else self.dimension.default_weight
+        if self.custom_weight is not None:
+            return self.custom_weight
+
+        # Default weights come from the cached registry instead of lazy-loading self.dimension
+        from .dimension_registry import get_registry
+        dimension = get_registry().get(self.dimension_id)
+        if dimension is not None:
+            return dimension.default_weight
+        return self.dimension.default_weight
 
 
 class Match(db.Model):
@@ -204,6 +284,10 @@ class Match(db.Model):
     __table_args__ = (
         db.CheckConstraint('user_a_id != user_b_id', name='check_different_users'),
         db.CheckConstraint('opposition_score >= 0 AND opposition_score <= 4', name='check_score_range'),
+        # Lookups of a user's matches and the expiry job
+        db.Index('ix_matches_user_a_id', 'user_a_id'),
+        db.Index('ix_matches_user_b_id', 'user_b_id'),
+        db.Index('ix_matches_status_expires_at', 'status', 'expires_at'),
     )
     
     @property
@@ -214,9 +298,14 @@ class Match(db.Model):
     @property
     def is_active(self):
         """Check if match is still active"""
-        if self.status not in ['pending', 'accepted']:
+        return Match.active_at(self.status, self.expires_at, datetime.utcnow())
+
+    @staticmethod
+    def active_at(status, expires_at, now):
+        """is_active for plain column values (e.g. rows of a column query) at the time `now`"""
+        if status not in ['pending', 'accepted']:
             return False
-        if self.expires_at and datetime.utcnow() > self.expires_at:
+        if expires_at and now > expires_at:
             return False
         return True
 
@@ -290,3 +379,96 @@ class ScheduledEmail(db.Model):
     body_html = db.Column(db.Text, nullable=False)
 
     sent = db.Column(db.Boolean, default=False)
+
+    __table_args__ = (
+        # Supports the "due and not yet sent" lookup of the email dispatcher;
+        # the predicate is written exactly like in claim_due_scheduled_emails()
+        db.Index(
+            'ix_scheduled_emails_unsent_send_at',
+            'send_at',
+            postgresql_where=sent.is_(False),
+            sqlite_where=sent.is_(False),
+        ),
+    )
+
+
+class OutboxEmail(db.Model):
+    """Outgoing email waiting to be sent by the mail worker pool"""
+    __tablename__ = 'outbox_emails'
+
+    id = db.Column(db.Integer, primary_key=True)
+    recipients = db.Column(db.Text, nullable=False)  # comma-separated addresses
+    subject = db.Column(db.String(200), nullable=False)
+    body = db.Column(db.Text, nullable=True)
+    body_html = db.Column(db.Text, nullable=True)
+    sender = db.Column(db.String(200), nullable=True)
+
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_error = db.Column(db.Text, nullable=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+
+class Notification(db.Model):
+    """Email to render later: kind + recipient + small payload (see notifications.py)"""
+    __tablename__ = 'notifications'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(30), nullable=False)  # match, followup, payout
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    payload = db.Column(db.JSON, nullable=True)  # partner_id, topic, slot
+
+    send_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending, rendered, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False, server_default='0')
+    last_error = db.Column(db.Text, nullable=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    rendered_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        # "due and still pending" lookup of the renderer
+        db.Index(
+            'ix_notifications_pending_send_at',
+            'send_at',
+            postgresql_where=status == 'pending',
+            sqlite_where=status == 'pending',
+        ),
+    )
+
+
+class CohortSnapshot(db.Model):
+    """Running opinion shift aggregates of one topic + language cohort (see cohort_analytics.py)"""
+    __tablename__ = 'cohort_snapshots'
+
+    id = db.Column(db.Integer, primary_key=True)
+    topic = db.Column(db.String(100), nullable=False, default='')     # '' = no topic
+    language = db.Column(db.String(10), nullable=False, default='')   # '' = no language
+    users = db.Column(db.Integer, nullable=False, default=0)
+    stats = db.Column(db.JSON, nullable=True)  # sums per question, shift distributions
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('topic', 'language', name='uq_cohort_snapshots_topic_language'),
+    )
+
+
+class MatchingEvent(db.Model):
+    """User whose matching eligibility changed; consumed by the scheduler leader"""
+    __tablename__ = 'matching_events'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class SchedulerLease(db.Model):
+    """Leader lease for background jobs (used when advisory locks are not available)"""
+    __tablename__ = 'scheduler_leases'
+
+    name = db.Column(db.String(100), primary_key=True)
+    holder = db.Column(db.String(200), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
@@ -0,0 +1,276 @@
+"""
+This file contains the notification pipeline (match, follow-up and payout emails).
+
+The matching code and the request handlers do not render any email.
+enqueue_notification() only stores a small structured payload in the
+notifications table (kind, recipient user id, partner id, topic, slot,
+send_at). The templates are rendered later, in batches, off the matching
+and request paths:
+
+- by the mail worker pool (mail_queue.py), right before it drains the outbox
+- by the scheduler's full pass and /admin/run_scheduled_emails
+- inline, only if there is no worker pool (MAIL_QUEUE_WORKERS=0)
+
+Rendering a batch:
+- all recipients and partners are loaded with one query
+- each template is compiled once per process and kept in _templates
+- a body is rendered once per distinct content: the cache key is the values
+  of the variables the template actually uses (found with jinja2.meta).
+  A zusage email only uses slot_label, so every email for the same slot
+  is rendered once
+- the bodies go to the outbox in the same transaction that marks the
+  notifications as rendered
+
+A notification that cannot be rendered or sent is retried like an outbox
+email: its send_at moves on by mail_queue.backoff_delay(), and after
+mail_queue.MAX_ATTEMPTS attempts it stays "failed". A recipient without an
+email address fails at once.
+"""
+
+from datetime import datetime, timedelta
+
+from flask import current_app
+from flask_mail import Message
+from jinja2 import meta
+from sqlalchemy import insert, update
+
+from . import db
+from .models import Notification, User
+
+
+RENDER_BATCH_SIZE = 100
+
+# kind -> (template, subject)
+NOTIFICATION_TYPES = {
+    "match": ("Email/zusage.html", "You have been matched for a dialogue session"),
+    "followup": ("Email/followup.html", "Your Dialogue Experience – One Week Later"),
+    "payout": ("Email/auszahlung.html", "Payout Information"),
+}
+
+
+# ========================================
+# Enqueue
+# ========================================
+
+def enqueue_notification(kind, user_id, send_at=None, commit=True, **payload):
+    """Store one notification for user_id; payload holds partner_id / topic / slot."""
+    return enqueue_notifications([(kind, user_id, payload)], send_at=send_at, commit=commit)
+
+
+def enqueue_notifications(items, send_at=None, commit=True):
+    """
+    Store several notifications with one bulk INSERT.
+    items: [(kind, user_id, payload dict)]. Returns the number stored.
+    """
+    now = datetime.utcnow()
+    rows = []
+    for kind, user_id, payload in items:
+        if kind not in NOTIFICATION_TYPES:
+            raise ValueError(f"Unknown notification kind: {kind}")
+        rows.append({
+            "kind": kind,
+            "user_id": user_id,
+            "payload": payload or {},
+            "send_at": send_at or now,
+            "status": "pending",
+            "created_at": now,
+        })
+    if not rows:
+        return 0
+
+    db.session.execute(insert(Notification), rows)
+    if commit:
+        db.session.commit()
+
+    from . import mail_queue
+    if mail_queue.pool is not None:
+        mail_queue.pool.wake()
+    elif commit and (send_at is None or send_at <= now):
+        # No background workers: render (and send) right away
+        render_due_notifications()
+    return len(rows)
+
+
+# ========================================
+# Rendering
+# ========================================
+
+# template name -> (compiled template, names of the variables it uses)
+_templates = {}
+
+
+def get_template(name):
+    """Compiled template plus its used variable names, cached for the process."""
+    cached = _templates.get(name)
+    if cached is None:
+        env = current_app.jinja_env
+        source = env.loader.get_source(env, name)[0]
+        cached = (env.get_template(name), frozenset(meta.find_undeclared_variables(env.parse(source))))
+        _templates[name] = cached
+    return cached
+
+
+def format_slot_label(slot):
+    """'2026-10-18T18:00:00' -> 'Sunday, 18 October 2026, 18:00' (the slot itself if unparsable)."""
+    if not slot:
+        return None
+    try:
+        return datetime.fromisoformat(slot).strftime('%A, %d %B %Y, %H:%M')
+    except Exception as e:
+        print(f"[NOTIFY] Could not parse slot '{slot}': {e}")
+        return slot
+
+
+def _cache_value(value):
+    # Model objects count by id; everything else must be hashable
+    if isinstance(value, db.Model):
+        return (type(value).__name__, getattr(value, "id", None))
+    hash(value)
+    return value
+
+
+def _render_key(template_name, used, context):
+    """Key of identical bodies, or None if a used value cannot be hashed."""
+    try:
+        return (template_name,) + tuple((name, _cache_value(context.get(name))) for name in sorted(used))
+    except TypeError:
+        return None
+
+
+class BodyCache:
+    """Rendered bodies of one batch, by _render_key."""
+
+    def __init__(self):
+        self.bodies = {}
+        self.rendered = 0
+        self.reused = 0
+
+    def render(self, template_name, context):
+        template, used = get_template(template_name)
+        key = _render_key(template_name, used, context)
+        if key is not None and key in self.bodies:
+            self.reused += 1
+            return self.bodies[key]
+
+        body = template.render(context)
+        self.rendered += 1
+        if key is not None:
+            self.bodies[key] = body
+        return body
+
+
+def claim_due_notifications(now, limit=RENDER_BATCH_SIZE):
+    """
+    Claim due, pending notifications (in the current transaction).
+    PostgreSQL: FOR UPDATE SKIP LOCKED; other databases: one conditional UPDATE.
+    """
+    query = (
+        Notification.query
+        .filter(Notification.status == "pending", Notification.send_at <= now)
+        .order_by(Notification.send_at, Notification.id)
+        .limit(limit)
+    )
+    if db.session.get_bind().dialect.name == "postgresql":
+        return query.with_for_update(skip_locked=True).all()
+
+    notifications = query.all()
+    if not notifications:
+        return []
+    claimed = set(db.session.scalars(
+        update(Notification)
+        .where(Notification.id.in_([n.id for n in notifications]), Notification.status == "pending")
+        .values(status="rendering")
+        .returning(Notification.id)
+        # "fetch": the loaded rows must know they are "rendering", or a retry
+        # that sets them back to "pending" would not be written
+        .execution_options(synchronize_session="fetch")
+    ))
+    return [n for n in notifications if n.id in claimed]
+
+
+def _context(notification, users):
+    payload = notification.payload or {}
+    user = users.get(notification.user_id)
+    return {
+        "user": user,
+        "partner": users.get(payload.get("partner_id")),
+        "topic": payload.get("topic") or (user.topic if user else None),
+        "slot_label": format_slot_label(payload.get("slot")),
+    }
+
+
+def render_due_notifications(limit=RENDER_BATCH_SIZE):
+    """
+    Render one batch of due notifications and hand the emails to the outbox
+    (or send them right away without a worker pool). Returns the number processed.
+    """
+    from .mail_queue import MAX_ATTEMPTS, backoff_delay, enqueue_email
+    from .smtp_pool import send_pooled
+
+    use_queue = current_app.config.get('MAIL_QUEUE_WORKERS', 0) > 0
+    now = datetime.utcnow()
+
+    try:
+        batch = claim_due_notifications(now, limit)
+        if not batch:
+            db.session.rollback()
+            return 0
+
+        user_ids = {n.user_id for n in batch}
+        user_ids |= {(n.payload or {}).get("partner_id") for n in batch} - {None}
+        users = {u.id: u for u in User.query.filter(User.id.in_(user_ids)).all()}
+
+        cache = BodyCache()
+        sent = 0
+        for notification in batch:
+            template_name, subject = NOTIFICATION_TYPES[notification.kind]
+            user = users.get(notification.user_id)
+            has_address = user is not None and bool(user.email)
+            try:
+                if not has_address:
+                    raise ValueError(f"user {notification.user_id} has no email address")
+
+                html = cache.render(template_name, _context(notification, users))
+                if use_queue:
+                    enqueue_email(subject, [user.email], html=html, commit=False)
+                else:
+                    msg = Message(subject=subject, recipients=[user.email])
+                    msg.html = html
+                    send_pooled(msg)
+
+                notification.status = "rendered"
+                notification.rendered_at = datetime.utcnow()
+                sent += 1
+            except Exception as e:
+                notification.attempts = (notification.attempts or 0) + 1
+                notification.last_error = str(e)[:1000]
+                if not has_address or notification.attempts >= MAX_ATTEMPTS:
+                    notification.status = "failed"
+                else:
+                    notification.status = "pending"
+                    notification.send_at = datetime.utcnow() + timedelta(seconds=backoff_delay(notification.attempts))
+                print(
+                    f"[NOTIFY] Notification {notification.id} ({notification.kind}) failed "
+                    f"(attempt {notification.attempts}): {e}"
+                )
+
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    print(
+        f"[NOTIFY] {sent}/{len(batch)} notification(s) rendered "
+        f"({cache.rendered} bodies rendered, {cache.reused} reused)"
+    )
+    return len(batch)
+
+
+def render_all_due_notifications():
+    """Render batches until nothing is due. Returns the number processed."""
+    total = 0
+    while True:
+        processed = render_due_notifications()
+        total += processed
+        if processed == 0:
+            return total
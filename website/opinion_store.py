@@ -0,0 +1,68 @@
+"""
+This file contains the bulk write path for UserOpinion rows.
+
+Saving a questionnaire used to look up every OpinionDimension and every
+existing UserOpinion one by one (about 30 queries per submit). Here the
+dimension ids come from the in-memory dimension registry, and all answers
+of a user are written with a single upsert backed by the
+unique_user_dimension constraint:
+
+- PostgreSQL: INSERT ... ON CONFLICT (user_id, dimension_id) DO UPDATE
+- SQLite:     the same statement in SQLite syntax (used for local tests)
+- others:     one SELECT of the existing rows, then plain ORM updates/inserts
+"""
+
+from datetime import datetime
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from . import db
+from .models import UserOpinion
+
+
+def upsert_user_opinions(user_id, scores):
+    """
+    Insert or update all given opinions of one user in one statement.
+    `scores` is {dimension_id: score}. Does not commit.
+    """
+    if not scores:
+        return
+
+    now = datetime.utcnow()
+    rows = [
+        {"user_id": user_id, "dimension_id": dim_id, "score": score, "updated_at": now}
+        for dim_id, score in scores.items()
+    ]
+
+    dialect = db.session.get_bind().dialect.name
+    table = UserOpinion.__table__
+
+    if dialect == "postgresql":
+        stmt = postgresql.insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            constraint="unique_user_dimension",
+            set_={"score": stmt.excluded.score, "updated_at": stmt.excluded.updated_at},
+        )
+        db.session.execute(stmt)
+    elif dialect == "sqlite":
+        stmt = sqlite.insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "dimension_id"],
+            set_={"score": stmt.excluded.score, "updated_at": stmt.excluded.updated_at},
+        )
+        db.session.execute(stmt)
+    else:
+        existing = {
+            op.dimension_id: op
+            for op in UserOpinion.query.filter(
+                UserOpinion.user_id == user_id,
+                UserOpinion.dimension_id.in_(list(scores)),
+            ).all()
+        }
+        for dim_id, score in scores.items():
+            opinion = existing.get(dim_id)
+            if opinion:
+                opinion.score = score
+                opinion.updated_at = now
+            else:
+                db.session.add(UserOpinion(user_id=user_id, dimension_id=dim_id, score=score))
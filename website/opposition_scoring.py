@@ -0,0 +1,146 @@
+"""
+This file contains the batched opposition-score engine used by matching.
+
+Instead of comparing two users at a time, it loads all eligible users
+of one topic/language bucket into a dense (N, 10) score matrix and
+computes every pairwise opposition score and match decision at once.
+
+The formula is the same as the per-pair one:
+    Opposition_Score = [∑(wi × |Ai - Bi|)] / ∑wi
+with the decisions:
+- "too_similar" (score < 1.0)
+- "ideal_match" (1.0 <= score <= 2.5)
+- "too_extreme" (score > 2.5)
+
+The dimensions are accumulated one after another in question order, so
+the floating point results are bit-identical to the per-pair loop.
+"""
+
+import numpy as np
+
+from . import db
+from .models import User
+from .dimension_registry import get_registry
+from .feature_vectors import MATCH_FIELDS, unpack_matrix
+
+MIN_DIMENSIONS = 8        # a pair needs at least 8 shared answers
+TOO_SIMILAR_BELOW = 1.0
+IDEAL_MAX = 2.5
+
+# Decision codes stored in the decision matrix
+TOO_SIMILAR = 0
+IDEAL_MATCH = 1
+TOO_EXTREME = 2
+DECISIONS = ("too_similar", "ideal_match", "too_extreme")
+
+
+def load_matching_weights():
+    """
+    Return the weights of the 10 matching dimensions as a (read-only) float64
+    vector, ordered by question_number, or None if the dimensions are incomplete.
+    """
+    registry = get_registry()
+
+    if len(registry.matching) != len(MATCH_FIELDS):
+        print(f"[SCORE] Warning: Expected 10 matching dimensions, found {len(registry.matching)}")
+        return None
+
+    return registry.matching_weights
+
+
+def build_score_matrix(users):
+    """
+    Build an (N, 10) float64 matrix from match1..match10 of the given users.
+    Missing or invalid answers are stored as NaN.
+    """
+    scores = np.full((len(users), len(MATCH_FIELDS)), np.nan, dtype=np.float64)
+
+    for row, user in enumerate(users):
+        for col, field in enumerate(MATCH_FIELDS):
+            value = getattr(user, field, None)
+            if value is None:
+                continue
+            try:
+                scores[row, col] = float(value)
+            except (ValueError, TypeError):
+                continue
+
+    return scores
+
+
+def compute_opposition_matrix(scores, weights):
+    """
+    Compute all pairwise opposition scores for a bucket.
+
+    Returns (opposition, decisions):
+    - opposition: (N, N) float64 matrix of opposition scores
+    - decisions:  (N, N) int8 matrix of TOO_SIMILAR / IDEAL_MATCH / TOO_EXTREME
+
+    Pairs with fewer than MIN_DIMENSIONS shared answers (or missing weights)
+    get score 0.0 and "too_similar", exactly like the per-pair formula.
+    """
+    n = scores.shape[0]
+    opposition = np.zeros((n, n), dtype=np.float64)
+    decisions = np.full((n, n), TOO_SIMILAR, dtype=np.int8)
+
+    if weights is None or n == 0:
+        return opposition, decisions
+
+    valid = ~np.isnan(scores)
+    weighted_diff_sum = np.zeros((n, n), dtype=np.float64)
+    total_weight = np.zeros((n, n), dtype=np.float64)
+    dimensions_used = np.zeros((n, n), dtype=np.int16)
+
+    # Accumulate dimension by dimension (same order as the per-pair loop),
+    # so every partial sum is rounded exactly the same way.
+    for k in range(scores.shape[1]):
+        column = scores[:, k]
+        pair_valid = valid[:, k][:, None] & valid[:, k][None, :]
+
+        with np.errstate(invalid="ignore"):
+            diff = np.abs(column[:, None] - column[None, :])
+
+        weighted_diff_sum += np.where(pair_valid, weights[k] * diff, 0.0)
+        total_weight += np.where(pair_valid, weights[k], 0.0)
+        dimensions_used += pair_valid
+
+    usable = (dimensions_used >= MIN_DIMENSIONS) & (total_weight != 0)
+    np.divide(weighted_diff_sum, total_weight, out=opposition, where=usable)
+
+    decisions[usable & (opposition >= TOO_SIMILAR_BELOW)] = IDEAL_MATCH
+    decisions[usable & (opposition > IDEAL_MAX)] = TOO_EXTREME
+
+    return opposition, decisions
+
+
+def load_bucket(topic, language):
+    """
+    Load the eligible, unmatched users of one topic/language bucket.
+    Only (id, matching_features) is selected, no full User objects.
+    Returns (user_ids, scores) where scores is the (N, 10) score matrix.
+    """
+    rows = db.session.query(User.id, User.matching_features).filter(
+        User.topic == topic,
+        User.language == language,
+        User.demo.is_(True),
+        User.is_extremist.is_(False),
+        (User.haspartner.is_(False) | User.haspartner.is_(None)),
+        User.openness_score.isnot(None),
+    ).order_by(User.id).all()
+
+    user_ids = [row.id for row in rows]
+    return user_ids, unpack_matrix([row.matching_features for row in rows])
+
+
+def score_pair(user_a, user_b, weights=None):
+    """
+    Opposition score and decision for a single pair, using the same engine.
+    Returns (opposition_score, decision).
+    """
+    if weights is None:
+        weights = load_matching_weights()
+
+    opposition, decisions = compute_opposition_matrix(
+        build_score_matrix([user_a, user_b]), weights
+    )
+    return float(opposition[0, 1]), DECISIONS[decisions[0, 1]]
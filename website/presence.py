@@ -0,0 +1,209 @@
+"""
+This file contains the presence tracking for the interaction waiting room.
+
+The waiting page used to POST every 2 seconds, and every POST wrote
+hasarrived = True and committed. Now:
+
+- hasarrived is written once, when the user opens the waiting page
+  (a conditional UPDATE, so reloading the page writes nothing)
+- the page listens to /Interaction/WaitingPage/events (server-sent events);
+  the stream sends one 'partner_arrived' event as soon as the partner is there
+- /Interaction/WaitingPage/poll stays as a read-only fallback for browsers
+  without EventSource
+
+Open streams do not hold a worker thread: gunicorn runs gevent workers
+(see Procfile), so every stream is a greenlet that sleeps in
+ArrivalBoard.wait_for(), and no database connection is held while waiting.
+
+One ArrivalBoard per worker process learns about arrivals for all of its
+waiting streams together:
+
+- PostgreSQL: user_arrived() sends NOTIFY waiting_room in the same
+  transaction as the hasarrived write; the board LISTENs on one dedicated
+  connection, so arrivals handled by any worker arrive within milliseconds
+- other databases (SQLite): the board reads the hasarrived flag of all
+  watched partners in ONE query every SHARED_CHECK_INTERVAL seconds
+"""
+
+import select
+import time
+from threading import Condition, Thread
+
+from flask import current_app
+from sqlalchemy import text, update
+
+from . import db
+from .models import User
+
+
+POLL_INTERVAL = 3            # seconds between two polls of the fallback page
+STREAM_TIMEOUT = 300         # seconds one event stream stays open; the browser reconnects
+HEARTBEAT_SECONDS = 15       # keep-alive comment, also detects closed streams
+RECONNECT_DELAY = 3          # seconds the browser waits before it reconnects
+SHARED_CHECK_INTERVAL = 2    # seconds between the board's database checks (no LISTEN)
+LISTEN_TIMEOUT = 30          # seconds without notification before the listener checks its connection
+CHANNEL = "waiting_room"
+
+
+class ArrivalBoard:
+    """Wakes the waiting streams of this worker process when their partner arrives."""
+
+    def __init__(self):
+        self.condition = Condition()
+        self.watched = {}     # partner_id -> number of streams waiting for it
+        self.arrived = set()  # watched partners that have arrived
+        self.app = None
+        self.thread = None
+
+    def start(self, app):
+        with self.condition:
+            if self.thread is not None:
+                return
+            self.app = app
+            self.thread = Thread(target=self._run_listener, name="waiting-room", daemon=True)
+        self.thread.start()
+
+    def watch(self, partner_id):
+        with self.condition:
+            self.watched[partner_id] = self.watched.get(partner_id, 0) + 1
+
+    def unwatch(self, partner_id):
+        with self.condition:
+            count = self.watched.get(partner_id, 0) - 1
+            if count > 0:
+                self.watched[partner_id] = count
+            else:
+                self.watched.pop(partner_id, None)
+                self.arrived.discard(partner_id)
+
+    def mark_arrived(self, user_id):
+        with self.condition:
+            if user_id in self.watched:
+                self.arrived.add(user_id)
+                self.condition.notify_all()
+
+    def wait_for(self, partner_id, timeout):
+        """Block until a watched partner has arrived or the timeout ran out. Returns True if arrived."""
+        with self.condition:
+            return self.condition.wait_for(lambda: partner_id in self.arrived, timeout)
+
+    # ---------------- listener ----------------
+
+    def _run_listener(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    if db.engine.dialect.name == "postgresql":
+                        self._listen()
+                    else:
+                        self._check_watched()
+            except Exception as e:
+                print(f"✗ Waiting room listener error: {e}")
+            time.sleep(SHARED_CHECK_INTERVAL)
+
+    def _listen(self):
+        connection = db.engine.raw_connection()
+        try:
+            dbapi_connection = connection.driver_connection
+            dbapi_connection.autocommit = True
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f"LISTEN {CHANNEL}")
+            # Arrivals from before the LISTEN: one check of the watched partners
+            self._mark_arrived_in_db()
+            print(f"[PRESENCE] Listening for arrivals on '{CHANNEL}'")
+
+            while True:
+                if select.select([dbapi_connection], [], [], LISTEN_TIMEOUT) == ([], [], []):
+                    cursor.execute("SELECT 1")  # fails if the connection is gone
+                    continue
+                dbapi_connection.poll()
+                while dbapi_connection.notifies:
+                    notification = dbapi_connection.notifies.pop(0)
+                    self.mark_arrived(int(notification.payload))
+        finally:
+            # Never hand a LISTENing autocommit connection back to the pool
+            connection.invalidate()
+
+    def _check_watched(self):
+        while True:
+            self._mark_arrived_in_db()
+            time.sleep(SHARED_CHECK_INTERVAL)
+
+    def _mark_arrived_in_db(self):
+        with self.condition:
+            partner_ids = list(self.watched)
+        if not partner_ids:
+            return
+        try:
+            arrived = db.session.query(User.id).filter(User.id.in_(partner_ids), User.hasarrived.is_(True)).all()
+        finally:
+            db.session.rollback()
+        for (user_id,) in arrived:
+            self.mark_arrived(user_id)
+
+
+# Global board (one per worker process)
+arrivals = ArrivalBoard()
+
+
+def user_arrived(user):
+    """Record that a user opened the waiting page. Writes hasarrived only once."""
+    if user.hasarrived:
+        return
+    result = db.session.execute(
+        update(User)
+        .where(User.id == user.id, User.hasarrived.isnot(True))
+        .values(hasarrived=True)
+    )
+    if result.rowcount == 1 and db.session.get_bind().dialect.name == "postgresql":
+        # Delivered to the listening workers only when this transaction commits
+        db.session.execute(text("SELECT pg_notify(:channel, :user_id)"),
+                           {"channel": CHANNEL, "user_id": str(user.id)})
+    db.session.commit()
+    arrivals.mark_arrived(user.id)
+
+
+def user_left(user):
+    if user.hasarrived:
+        user.hasarrived = False
+        db.session.commit()
+
+
+def partner_arrived(partner_id):
+    """Read-only check of the partner's hasarrived flag."""
+    if not partner_id:
+        return False
+    arrived = db.session.query(User.hasarrived).filter(User.id == partner_id).scalar()
+    return bool(arrived)
+
+
+def arrival_events(partner_id, timeout=None):
+    """
+    Server-sent event stream for the waiting page: sends 'partner_arrived'
+    as soon as the partner is there. The stream ends after `timeout`
+    seconds; EventSource then reconnects on its own.
+    """
+    yield f"retry: {RECONNECT_DELAY * 1000}\n\n"
+    if not partner_id:
+        return
+
+    arrivals.start(current_app._get_current_object())
+    # Watch before the first check, so an arrival in between is not missed
+    arrivals.watch(partner_id)
+    try:
+        arrived = partner_arrived(partner_id)
+        # End the read transaction so no connection is held while waiting
+        db.session.rollback()
+
+        deadline = time.monotonic() + (STREAM_TIMEOUT if timeout is None else timeout)
+        while not arrived:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            arrived = arrivals.wait_for(partner_id, min(HEARTBEAT_SECONDS, remaining))
+            if not arrived:
+                yield ": keep-alive\n\n"
+    finally:
+        arrivals.unwatch(partner_id)
+
+    yield "event: partner_arrived\ndata: {}\n\n"
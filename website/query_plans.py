@@ -0,0 +1,106 @@
+"""
+This file checks that the hot matching queries use their indexes.
+
+For each query below it runs EXPLAIN (PostgreSQL) or EXPLAIN QUERY PLAN
+(SQLite) and looks for the expected index name in the plan. It is used by
+
+    flask --app main check-indexes
+
+which prints the plans and exits with status 1 if an index is not used,
+so it can run after every migration or schema change.
+
+On PostgreSQL sequential scans are switched off for the check
+(SET LOCAL enable_seqscan = off): on a small table the planner would
+rightly prefer a full scan, but the question here is whether the index
+CAN be used for the query.
+"""
+
+from datetime import datetime
+
+from . import db
+from .models import User, Match, Notification, ScheduledEmail
+from .candidate_index import CANDIDATE_COLUMNS, eligible_criteria
+
+
+def _matching_queries():
+    """(name, query, expected index names) of the queries to check."""
+    now = datetime.utcnow()
+    return [
+        (
+            "eligible users of one bucket",
+            db.session.query(*CANDIDATE_COLUMNS).filter(
+                *eligible_criteria(), User.topic == "climate", User.language == "en"
+            ),
+            ["ix_user_eligible_topic_language"],
+        ),
+        (
+            "matches of one user",
+            Match.query.filter((Match.user_a_id == 1) | (Match.user_b_id == 1)),
+            ["ix_matches_user_a_id", "ix_matches_user_b_id"],
+        ),
+        (
+            "expired matches",
+            Match.query.filter(
+                Match.status == "pending",
+                Match.expires_at.isnot(None),
+                Match.expires_at < now,
+            ),
+            ["ix_matches_status_expires_at"],
+        ),
+        (
+            "due scheduled emails",
+            ScheduledEmail.query.filter(
+                ScheduledEmail.sent.is_(False),
+                ScheduledEmail.send_at <= now,
+            ).order_by(ScheduledEmail.send_at),
+            ["ix_scheduled_emails_unsent_send_at"],
+        ),
+        (
+            "due notifications",
+            Notification.query.filter(
+                Notification.status == "pending",
+                Notification.send_at <= now,
+            ).order_by(Notification.send_at, Notification.id),
+            ["ix_notifications_pending_send_at"],
+        ),
+    ]
+
+
+def explain(query):
+    """Return the query plan of a Query / select as a list of text lines."""
+    connection = db.session.connection()
+    dialect = connection.dialect
+    compiled = query.statement.compile(dialect=dialect) if hasattr(query, "statement") else query.compile(dialect=dialect)
+
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+
+    if dialect.name == "postgresql":
+        connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        rows = connection.exec_driver_sql("EXPLAIN " + str(compiled), params).all()
+        return [row[0] for row in rows]
+
+    rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled), params).all()
+    return [row[-1] for row in rows]
+
+
+def check_index_usage():
+    """
+    EXPLAIN every matching query.
+    Returns a list of dicts with name, expected indexes, missing indexes and the plan.
+    """
+    results = []
+    try:
+        for name, query, expected in _matching_queries():
+            plan = explain(query)
+            text = "\n".join(plan)
+            results.append({
+                "name": name,
+                "expected": expected,
+                "missing": [index for index in expected if index not in text],
+                "plan": plan,
+            })
+    finally:
+        db.session.rollback()  # also resets enable_seqscan
+    return results
@@ -0,0 +1,163 @@
+"""
+This file contains opt-in SQL instrumentation (query counter and N+1 detector).
+
+With SQL_QUERY_STATS=true every request records, via the SQLAlchemy
+before_cursor_execute / after_cursor_execute events:
+- the number of SQL statements and the total database time
+- how often each statement "shape" ran (parameters and IN-lists removed)
+
+and adds them to the response headers:
+    X-DB-Query-Count, X-DB-Query-Time-ms, X-DB-Repeated-Queries
+
+A shape that ran N_PLUS_ONE_THRESHOLD times or more in one request is
+almost always a query inside a loop (N+1); it is logged as [N+1].
+
+For tests and scripts, count_queries() and query_budget() work without the
+config flag:
+
+    with query_budget(5):
+        client.get('/api/matching/matches')
+"""
+
+import os
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from threading import local
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+
+N_PLUS_ONE_THRESHOLD = 5
+
+_PLACEHOLDER = re.compile(r"%\([^)]*\)s|\$\d+|:\w+|\?")
+_PLACEHOLDER_LIST = re.compile(r"\?(\s*,\s*\?)+")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement):
+    """Normalize a statement so that the same query with other values has the same shape."""
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _PLACEHOLDER.sub("?", shape)
+    shape = _LITERAL.sub("?", shape)
+    shape = _PLACEHOLDER_LIST.sub("?", shape)
+    return shape
+
+
+class QueryStats:
+    """Statements seen while this collector was active."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement, seconds):
+        self.count += 1
+        self.total_time += seconds
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold=N_PLUS_ONE_THRESHOLD):
+        """[(shape, count)] of the shapes that ran at least `threshold` times."""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+# Collectors of count_queries() blocks, per thread
+_active = local()
+
+
+def _collectors():
+    if not hasattr(_active, "stack"):
+        _active.stack = []
+    return _active.stack
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_start_time"].pop()
+    seconds = time.perf_counter() - started
+
+    for stats in _collectors():
+        stats.record(statement, seconds)
+
+    if has_request_context():
+        stats = g.get("query_stats")
+        if stats is not None:
+            stats.record(statement, seconds)
+
+
+def install(engine):
+    """Attach the counting events to an engine (once)."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@contextmanager
+def count_queries():
+    """Collect the statements of this thread inside the block into a QueryStats."""
+    from . import db
+
+    install(db.engine)
+    stats = QueryStats()
+    _collectors().append(stats)
+    try:
+        yield stats
+    finally:
+        _collectors().remove(stats)
+
+
+@contextmanager
+def query_budget(max_queries):
+    """Fail with AssertionError if the block runs more than max_queries statements."""
+    with count_queries() as stats:
+        yield stats
+
+    if stats.count > max_queries:
+        details = "\n".join(f"  {count}x {shape}" for shape, count in stats.shapes.most_common(5))
+        raise AssertionError(
+            f"{stats.count} SQL queries, budget is {max_queries}. Most frequent:\n{details}"
+        )
+
+
+def init_query_stats(app):
+    """Per-request query statistics (only if SQL_QUERY_STATS is enabled)."""
+    app.config['SQL_QUERY_STATS'] = os.getenv('SQL_QUERY_STATS', 'false').lower() == 'true'
+    if not app.config['SQL_QUERY_STATS']:
+        return
+
+    from . import db
+
+    with app.app_context():
+        install(db.engine)
+
+    @app.before_request
+    def start_query_stats():
+        g.query_stats = QueryStats()
+
+    @app.after_request
+    def report_query_stats(response):
+        stats = g.pop("query_stats", None)
+        if stats is None:
+            return response
+
+        repeated = stats.repeated()
+        response.headers["X-DB-Query-Count"] = str(stats.count)
+        response.headers["X-DB-Query-Time-ms"] = f"{stats.total_time * 1000:.1f}"
+        response.headers["X-DB-Repeated-Queries"] = str(len(repeated))
+
+        print(
+            f"[SQL] {request.method} {request.path}: {stats.count} queries, "
+            f"{stats.total_time * 1000:.1f} ms"
+        )
+        for shape, count in repeated:
+            print(f"[N+1] {request.method} {request.path}: {count}x {shape[:200]}")
+        return response
+
+    print("✓ SQL query statistics enabled")
@@ -6,87 +6,62 @@ calculates the openness score based on attitude questions,
 and classifies users into openness categories for matching eligibility.
 """
 
-from datetime import datetime
 
 def save_questionnaire_responses(user_id, form_data):
     """
     Save responses from the 15-question questionnaire
     Using -2 to +2 scale (no conversion needed)
     """
-    from .models import User, UserOpinion, OpinionDimension
+    from .models import User
+    from .opinion_store import upsert_user_opinions
+    from .dimension_registry import get_registry
     from . import db  
+    from .candidate_index import candidate_index
+    from . import notify_eligibility_change
     
     user = User.query.get(user_id)
     if not user:
         return None
     
     attitude_scores = []
-    
+    registry = get_registry()
+    scores = {}
+
     # Process attitude questions (1-5)
     for i in range(1, 6):
         field_name = f'attitude{i}'
         if field_name in form_data:
             score = float(form_data[field_name])
-            
-            dimension = OpinionDimension.query.filter_by(
-                question_type='attitude',
-                question_number=i
-            ).first()
-            
+
+            dimension = registry.get_by_number('attitude', i)
             if dimension:
-                opinion = UserOpinion.query.filter_by(
-                    user_id=user_id,
-                    dimension_id=dimension.id
-                ).first()
-                
-                if opinion:
-                    opinion.score = score
-                    opinion.updated_at = datetime.utcnow()
-                else:
-                    opinion = UserOpinion(
-                        user_id=user_id,
-                        dimension_id=dimension.id,
-                        score=score
-                    )
-                    db.session.add(opinion)
-                
+                scores[dimension.id] = score
                 attitude_scores.append(score)
-    
+
     # Process matching questions (1-10)
     for i in range(1, 11):
         field_name = f'match{i}'
         if field_name in form_data:
             score = float(form_data[field_name])
-            
-            dimension = OpinionDimension.query.filter_by(
-                question_type='matching',
-                question_number=i
-            ).first()
-            
+
+            dimension = registry.get_by_number('matching', i)
             if dimension:
-                opinion = UserOpinion.query.filter_by(
-                    user_id=user_id,
-                    dimension_id=dimension.id
-                ).first()
-                
-                if opinion:
-                    opinion.score = score
-                    opinion.updated_at = datetime.utcnow()
-                else:
-                    opinion = UserOpinion(
-                        user_id=user_id,
-                        dimension_id=dimension.id,
-                        score=score
-                    )
-                    db.session.add(opinion)
-    
+                scores[dimension.id] = score
+
+    # Write all answers in one upsert statement
+    upsert_user_opinions(user_id, scores)
+
     # Calculate openness score (average of 5 attitude questions)
     if attitude_scores:
         openness_score = sum(attitude_scores) / len(attitude_scores)
         user.openness_score = openness_score
         user.is_extremist = openness_score < 0.0  # Threshold: below neutral
-    
+
+    # Openness / extremist flag may change matching eligibility
+    notify_eligibility_change(user.id)
     db.session.commit()
+
+    candidate_index.update_user(user)
     
     return {
         'openness_score': user.openness_score,
@@ -0,0 +1,180 @@
+"""
+This file contains the scheduling stage that runs after pairing.
+
+Pairing only decides who meets whom. This stage decides WHEN: every pair
+gets one slot of its shared availability (the AND of both bitmasks, see
+time_slots.py), so that
+- no slot gets more than SLOT_CAPACITY sessions (0 = no limit), counting
+  the active matches that are already scheduled there, and
+- the sessions are spread evenly over the slots instead of all landing
+  in the earliest common one.
+
+assign_slots() is a greedy pass with repair:
+1. the most constrained pairs (fewest common slots) go first, each into its
+   least loaded common slot that still has room (earliest on a tie)
+2. a pair that found every common slot full looks for an augmenting path:
+   another pair in one of those slots moves to one of ITS free slots
+   (breadth-first search over the slots, like in bipartite matching)
+3. a pair moves to another common slot while that lowers the load
+   difference by at least 2 (each move lowers the sum of squared loads,
+   so this ends)
+
+It is O(pairs x common slots) plus the searches for the few pairs that
+hit a full slot, so a pass over thousands of pairs stays in milliseconds.
+Pairs that cannot be placed are not matched; the users stay in the pool.
+"""
+
+from collections import defaultdict, deque
+
+from flask import current_app
+
+from . import db
+from .models import Match
+from .candidate_index import availability_of
+from .time_slots import common_mask, mask_bits, slot_value
+
+
+ACTIVE_MATCH_STATUSES = ("pending", "accepted")
+BALANCE_PASSES = 10
+
+
+def slot_capacity():
+    """Maximum number of sessions per slot (SLOT_CAPACITY config, 0 = unlimited)."""
+    return current_app.config.get("SLOT_CAPACITY", 0)
+
+
+def common_slots(user, partner):
+    """Slot strings both users are available in, earliest first."""
+    week, mask = availability_of(user)
+    partner_week, partner_mask = availability_of(partner)
+    common = common_mask(week, mask, partner_week, partner_mask)
+    return [slot_value(week, bit) for bit in mask_bits(common)]
+
+
+def current_load(slots):
+    """{slot: number of active matches already scheduled in it} (one query)."""
+    if not slots:
+        return {}
+    rows = (
+        db.session.query(Match.scheduled_time_slot, db.func.count(Match.id))
+        .filter(
+            Match.scheduled_time_slot.in_(list(slots)),
+            Match.status.in_(ACTIVE_MATCH_STATUSES),
+        )
+        .group_by(Match.scheduled_time_slot)
+        .all()
+    )
+    return dict(rows)
+
+
+def assign_slots(options, load, capacity=0):
+    """
+    Choose one slot per pair.
+
+    options:  per pair, the list of its common slots (earliest first)
+    load:     {slot: sessions already there}; updated in place
+    capacity: maximum sessions per slot, 0 = unlimited
+
+    Returns a list with the chosen slot (or None) per pair.
+    """
+    load = defaultdict(int, load)
+    chosen = [None] * len(options)
+    members = defaultdict(set)  # slot -> pairs placed in it
+
+    def has_room(slot):
+        return not capacity or load[slot] < capacity
+
+    def place(i, slot):
+        chosen[i] = slot
+        members[slot].add(i)
+        load[slot] += 1
+
+    # 1) Greedy, most constrained pairs first
+    unplaced = []
+    for i in sorted(range(len(options)), key=lambda i: (len(options[i]), i)):
+        free = [slot for slot in options[i] if has_room(slot)]
+        if free:
+            place(i, min(free, key=lambda slot: load[slot]))
+        elif options[i]:
+            unplaced.append(i)
+
+    # 2) Repair: augmenting paths through full slots
+    for i in unplaced:
+        parent = {slot: (i, None) for slot in options[i]}
+        queue = deque(options[i])
+        target = None
+        while queue:
+            slot = queue.popleft()
+            if has_room(slot):
+                target = slot
+                break
+            for q in members[slot]:
+                for other in options[q]:
+                    if other not in parent:
+                        parent[other] = (q, slot)
+                        queue.append(other)
+
+        if target is None:
+            continue
+
+        # Shift every pair on the path one step; only `target` gets one more session
+        load[target] += 1
+        slot = target
+        while True:
+            pair, previous = parent[slot]
+            chosen[pair] = slot
+            members[slot].add(pair)
+            if previous is None:
+                break
+            members[previous].discard(pair)
+            slot = previous
+
+    # 3) Balance: move pairs to clearly less loaded common slots
+    for _ in range(BALANCE_PASSES):
+        moved = False
+        for i, current in enumerate(chosen):
+            if current is None:
+                continue
+            best = min(options[i], key=lambda slot: load[slot])
+            if load[best] + 1 < load[current]:
+                members[current].discard(i)
+                load[current] -= 1
+                place(i, best)
+                moved = True
+        if not moved:
+            break
+
+    return chosen
+
+
+def schedule_pairs(pairs, capacity=None):
+    """
+    Give every pair of a pairing pass its session slot.
+
+    `pairs` is a list of (user, partner, score, decision, slot) with
+    CandidateRecords or Users. Returns (scheduled, unscheduled): the pairs
+    with the chosen slot filled in, and the pairs for which every common
+    slot is full.
+    """
+    if capacity is None:
+        capacity = slot_capacity()
+
+    options = [common_slots(user, partner) for user, partner, *_ in pairs]
+    load = current_load({slot for slot_list in options for slot in slot_list})
+    chosen = assign_slots(options, load, capacity)
+
+    scheduled = []
+    unscheduled = []
+    for pair, slot_list, slot in zip(pairs, options, chosen):
+        user, partner, score, decision, fallback_slot = pair
+        if not slot_list:
+            # No common slot on the grid (old free-form slots): keep the pairing's slot
+            scheduled.append(pair)
+        elif slot is None:
+            unscheduled.append(pair)
+        else:
+            scheduled.append((user, partner, score, decision, slot))
+
+    if unscheduled:
+        print(f"[SCHEDULE] {len(unscheduled)} pair(s) not matched: all common slots are full (capacity {capacity})")
+    return scheduled, unscheduled
@@ -0,0 +1,154 @@
+"""
+This file contains a small pool of persistent SMTP connections.
+
+mail.send(msg) opens a new SMTP connection (TCP + TLS + login) for every
+single message. The pool keeps authenticated Flask-Mail connections
+(mail.connect()) open and reuses them across messages:
+
+- at most MAIL_POOL_SIZE connections are open at the same time
+- a connection that has been idle for a while is checked with NOOP first
+- if the server dropped the connection, it reconnects and retries once
+"""
+
+import smtplib
+import socket
+import time
+from threading import BoundedSemaphore, Lock
+
+from . import mail
+
+
+# Errors that mean "the connection is gone", not "this message is bad"
+RECONNECT_ERRORS = (
+    smtplib.SMTPServerDisconnected,
+    smtplib.SMTPConnectError,
+    ConnectionError,
+    socket.timeout,
+)
+
+
+class SMTPConnectionPool:
+    def __init__(self, max_connections=2, idle_timeout=60):
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.slots = BoundedSemaphore(max_connections)
+        self.lock = Lock()
+        self.idle = []  # [(connection, last_used)]
+        self.opened = 0
+        self.reconnects = 0
+
+    # ---------------- connections ----------------
+
+    def _open(self):
+        connection = mail.connect()
+        connection.__enter__()  # connects, starts TLS and logs in
+        with self.lock:
+            self.opened += 1
+        return connection
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.__exit__(None, None, None)
+        except Exception:
+            pass  # already broken, nothing to clean up
+
+    def _is_alive(self, connection, last_used):
+        if connection.host is None:  # sending is suppressed
+            return True
+        if time.monotonic() - last_used < self.idle_timeout:
+            return True
+        try:
+            return connection.host.noop()[0] == 250
+        except Exception:
+            return False
+
+    def acquire(self):
+        """Get an open connection (reused if possible). Blocks if all are in use."""
+        self.slots.acquire()
+        try:
+            while True:
+                with self.lock:
+                    entry = self.idle.pop() if self.idle else None
+                if entry is None:
+                    return self._open()
+                connection, last_used = entry
+                if self._is_alive(connection, last_used):
+                    return connection
+                self._close(connection)
+        except Exception:
+            self.slots.release()
+            raise
+
+    def release(self, connection, broken=False):
+        if broken:
+            self._close(connection)
+        else:
+            with self.lock:
+                self.idle.append((connection, time.monotonic()))
+        self.slots.release()
+
+    def close_all(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for connection, _last_used in idle:
+            self._close(connection)
+
+    # ---------------- sending ----------------
+
+    def send_many(self, messages):
+        """Send several messages over one pooled connection."""
+        connection = self.acquire()
+        broken = False
+        try:
+            for msg in messages:
+                try:
+                    msg.send(connection)
+                except RECONNECT_ERRORS:
+                    # Server closed the connection: reconnect once and retry
+                    self._close(connection)
+                    with self.lock:
+                        self.reconnects += 1
+                    connection = self._open()
+                    msg.send(connection)
+        except Exception:
+            broken = True
+            raise
+        finally:
+            self.release(connection, broken=broken)
+
+    def send(self, msg):
+        self.send_many([msg])
+
+    def stats(self):
+        with self.lock:
+            return {
+                "max_connections": self.max_connections,
+                "idle_connections": len(self.idle),
+                "connections_opened": self.opened,
+                "reconnects": self.reconnects,
+            }
+
+
+# Global pool instance (one per worker process)
+smtp_pool = SMTPConnectionPool()
+
+
+def init_smtp_pool(app):
+    """Size the pool from MAIL_POOL_SIZE / MAIL_POOL_IDLE_TIMEOUT."""
+    global smtp_pool
+    smtp_pool.close_all()
+    smtp_pool = SMTPConnectionPool(
+        max_connections=app.config.get('MAIL_POOL_SIZE', 2),
+        idle_timeout=app.config.get('MAIL_POOL_IDLE_TIMEOUT', 60),
+    )
+    return smtp_pool
+
+
+def send_pooled(*messages):
+    """Send one or more Flask-Mail messages over the pooled connections."""
+    smtp_pool.send_many(messages)
+
+
+def smtp_pool_stats():
+    return smtp_pool.stats()
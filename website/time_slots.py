@@ -0,0 +1,121 @@
+"""
+This file contains the compact availability representation of a user.
+
+The demographics form offers a fixed grid of 28 slots per week
+(7 days from Sunday x 11:00 / 13:00 / 15:00 / 18:00, see
+views.generate_time_slots). A user's chosen slots are stored a second time as
+
+    User.availability_week   the Sunday the week starts with
+    User.availability_mask   one bit per slot of that week
+                             (bit = day_index * 4 + hour_index, Sunday 11:00 = bit 0)
+
+Both columns are filled automatically whenever time_slot_1..3 change
+(mapper events in models.py). Two users overlap if they have the same week
+and `mask_a & mask_b` is not 0; the lowest common bit is the earliest
+common slot.
+
+The ISO strings in time_slot_1..3 stay the source for emails and
+Match.scheduled_time_slot: slot_value(week, bit) gives back exactly the
+string the form stored, and the same (week, bit) always returns the same
+interned string object.
+"""
+
+from datetime import datetime, time, timedelta
+
+
+SLOT_HOURS = (11, 13, 15, 18)
+DAYS_PER_WEEK = 7
+SLOT_COUNT = DAYS_PER_WEEK * len(SLOT_HOURS)  # 28 bits, fits an INTEGER column
+
+
+def week_start(day):
+    """The Sunday on or before `day` (a week of the form starts on Sunday)."""
+    return day - timedelta(days=(day.weekday() + 1) % 7)
+
+
+def parse_slot(slot):
+    """ISO slot string -> (week, bit), or None if it is not on the slot grid."""
+    if not slot or not slot.strip():
+        return None
+    try:
+        dt = datetime.fromisoformat(slot.strip())
+    except ValueError:
+        return None
+    if dt.hour not in SLOT_HOURS or dt.minute or dt.second or dt.microsecond:
+        return None
+
+    week = week_start(dt.date())
+    day_index = (dt.date() - week).days
+    return week, day_index * len(SLOT_HOURS) + SLOT_HOURS.index(dt.hour)
+
+
+# (week, bit) -> slot string; every slot string exists only once per process
+_slot_values = {}
+
+
+def slot_value(week, bit):
+    """The ISO string of one slot (as stored by the demographics form)."""
+    key = (week, bit)
+    value = _slot_values.get(key)
+    if value is None:
+        day = week + timedelta(days=bit // len(SLOT_HOURS))
+        hour = SLOT_HOURS[bit % len(SLOT_HOURS)]
+        value = _slot_values.setdefault(key, datetime.combine(day, time(hour, 0)).isoformat())
+    return value
+
+
+def encode_slots(slots):
+    """
+    (week, mask) of a list of slot strings; (None, None) if none is on the grid.
+    All slots of the form are in one week; slots in another week than the
+    first one are dropped.
+    """
+    week = None
+    mask = 0
+    for slot in slots:
+        parsed = parse_slot(slot)
+        if parsed is None:
+            if slot and slot.strip():
+                print(f"[SLOTS] Slot '{slot}' is not on the slot grid, ignored")
+            continue
+        slot_week, bit = parsed
+        if week is None:
+            week = slot_week
+        if slot_week != week:
+            print(f"[SLOTS] Slot '{slot}' is not in the week of {week}, ignored")
+            continue
+        mask |= 1 << bit
+
+    if week is None:
+        return None, None
+    return week, mask
+
+
+def mask_bits(mask):
+    """Set bits of a mask, lowest (earliest slot) first."""
+    bits = []
+    while mask:
+        low = mask & -mask
+        bits.append(low.bit_length() - 1)
+        mask ^= low
+    return bits
+
+
+def decode_slots(week, mask):
+    """Slot strings of (week, mask), earliest first."""
+    if week is None or not mask:
+        return ()
+    return tuple(slot_value(week, bit) for bit in mask_bits(mask))
+
+
+def common_mask(week_a, mask_a, week_b, mask_b):
+    """Bits both users are available in (0 if none or different weeks)."""
+    if week_a is None or week_a != week_b:
+        return 0
+    return (mask_a or 0) & (mask_b or 0)
+
+
+def first_bit(mask):
+    """The lowest set bit (earliest slot) of a non-zero mask."""
+    return (mask & -mask).bit_length() - 1
+
@@ -13,15 +13,28 @@ In short, this file controls how users move through the study
 from registration until the end of the experiment.
 """
 
-from flask import Blueprint, render_template, request, flash, redirect, url_for, session
+import tempfile
+
+from flask import Blueprint, render_template, request, flash, redirect, url_for, session, jsonify
+from flask import Response, send_file, stream_with_context
 from flask_login import login_required, current_user
-from datetime import datetime, timedelta, time, date
+from datetime import datetime, timedelta, date
 from threading import Thread
 
-from . import db, send_email_safe
-from .models import User, SuggestedTopic, ScheduledEmail
+from . import db
+from .models import User, SuggestedTopic
+from .auth import admin_required
 from .matching_service import MatchingService
-from . import save_questionnaire_responses, get_openness_category
+from .candidate_index import candidate_index
+from .mail_queue import mail_queue_metrics
+from .db_pool import pool_metrics
+from .presence import POLL_INTERVAL, arrival_events, partner_arrived, user_arrived, user_left
+from .notifications import enqueue_notification, render_all_due_notifications
+from .time_slots import SLOT_COUNT, slot_value
+from .export import ExportError, build_query, check_format, export_to_file, iter_csv, parse_date
+from .cohort_analytics import cohort_comparison, cohort_overview, post_answers, record_post_questionnaire
+from . import save_questionnaire_responses, get_openness_category, send_due_followup_emails
+from . import notify_eligibility_change
 
 
 views = Blueprint('views', __name__)
@@ -33,76 +46,88 @@ def is_button_disabled():
 
 
 def schedule_followup_email(user):
-    """Schedule a follow-up email 7 days after the discussion."""
+    """Schedule a follow-up email 7 days after the discussion (rendered when it is due)."""
     try:
         print(f"[FOLLOWUP] Scheduling follow-up for user {user.id} ({user.email})")
 
         # When you are done testing, change minutes=1 to days=7
         send_time = datetime.utcnow() + timedelta(days=7)
 
-        body_html = render_template("Email/followup.html", user=user)
-
-        email = ScheduledEmail(
-            user_id=user.id,
-            send_at=send_time,
-            subject="Your Dialogue Experience – One Week Later",
-            body_html=body_html,
-            sent=False,  # <-- important, so scheduler knows it's not sent yet
-        )
-
-        db.session.add(email)
-        db.session.commit()
-        print(f"[FOLLOWUP] Created ScheduledEmail id={email.id} for {user.email} at {send_time}")
+        enqueue_notification("followup", user.id, send_at=send_time)
+        print(f"[FOLLOWUP] Queued follow-up for {user.email} at {send_time}")
     except Exception as e:
         db.session.rollback()
         print(f"[FOLLOWUP] ERROR while scheduling follow-up for user {user.id}: {e}")
 
-def send_due_scheduled_emails():
-    """Send all scheduled emails that are due and not yet sent."""
-    now = datetime.utcnow()
-    try:
-        due_emails = (
-            ScheduledEmail.query
-            .filter(ScheduledEmail.sent == False)   # noqa: E712
-            .filter(ScheduledEmail.send_at <= now)
-            .all()
-        )
 
-        print(f"[FOLLOWUP] Found {len(due_emails)} due scheduled email(s)")
+@views.route('/admin/run_scheduled_emails')
+@admin_required
+def run_scheduled_emails():
+    """Manually trigger sending of all due scheduled emails and notifications."""
+    rendered = render_all_due_notifications()
+    sent = send_due_followup_emails()
+    return f"Scheduled emails processed ({sent} sent, {rendered} notifications rendered)."
 
-        for email in due_emails:
-            # we store only user_id in ScheduledEmail, so fetch the user
-            user = User.query.get(email.user_id)
-            if not user:
-                print(f"[FOLLOWUP] No user found for ScheduledEmail id={email.id}, marking as sent to skip")
-                email.sent = True
-                continue
 
-            try:
-                ok = send_email_safe(
-                    subject=email.subject,
-                    recipients=[user.email],
-                    html=email.body_html,
-                )
-                if ok:
-                    email.sent = True
-                    print(f"[FOLLOWUP] Sent follow-up email id={email.id} to {user.email}")
-                else:
-                    print(f"[FOLLOWUP] Failed to send follow-up email id={email.id} to {user.email}")
-            except Exception as exc:
-                # don't mark as sent so we can retry later
-                print(f"[FOLLOWUP] Error sending email id={email.id} to {user.email}: {exc}")
+@views.route('/admin/mail_queue')
+@admin_required
+def mail_queue_status():
+    """Show outbox queue depth and send latency of the mail worker pool."""
+    return jsonify(mail_queue_metrics())
 
-        db.session.commit()
-    except Exception as exc:
-        db.session.rollback()
-        print(f"[FOLLOWUP] ERROR in send_due_scheduled_emails: {exc}")
-@views.route('/admin/run_scheduled_emails')
-@login_required
-def run_scheduled_emails():
-    """Manually trigger sending of all due scheduled emails."""
-    send_due_scheduled_emails()
-    return "Scheduled emails processed."
+
+@views.route('/admin/db_pool')
+@admin_required
+def db_pool_status():
+    """Show database pool usage and checkout wait times of this worker."""
+    return jsonify(pool_metrics(db.engine))
+
+
+@views.route('/admin/cohort_stats')
+@admin_required
+def cohort_stats():
+    """Show the cached opinion shift statistics per topic and per language."""
+    return jsonify(cohort_overview())
+
+
+@views.route('/admin/export/<dataset>')
+@admin_required
+def export_results(dataset):
+    """
+    Download participants or matches, streamed chunk by chunk.
+    ?format=csv|parquet|arrow, filters: topic, language, since, until (YYYY-MM-DD).
+    Parquet / Arrow are written to a temporary file first (their footer comes last).
+    """
+    file_format = request.args.get('format', 'csv')
+    try:
+        filters = {
+            'topic': request.args.get('topic') or None,
+            'language': request.args.get('language') or None,
+            'since': parse_date(request.args.get('since')),
+            'until': parse_date(request.args.get('until'), end=True),
+        }
+        # Validate the format and the dataset before anything is streamed or written
+        check_format(file_format)
+        build_query(dataset, **filters)
+        filename = f"{dataset}-{datetime.utcnow():%Y%m%d-%H%M%S}.{file_format}"
+
+        if file_format == 'csv':
+            return Response(
+                stream_with_context(iter_csv(dataset, **filters)),
+                mimetype='text/csv',
+                headers={'Content-Disposition': f'attachment; filename={filename}'},
+            )
+
+        tmp = tempfile.NamedTemporaryFile(suffix=f".{file_format}")
+        try:
+            rows = export_to_file(dataset, tmp.name, file_format, **filters)
+        except Exception:
+            tmp.close()  # deletes the file; on success send_file closes it
+            raise
+        print(f"[EXPORT] {rows} {dataset} rows as {file_format}")
+        return send_file(tmp, mimetype='application/octet-stream', as_attachment=True, download_name=filename)
+    except ExportError as e:
+        return jsonify({'error': str(e)}), 400
 
 
 @views.route('/index', methods=['GET', 'POST'])
@@ -236,20 +261,15 @@ def generate_time_slots():
     days_until_sunday = (6 - today.weekday()) % 7
     start_day = today + timedelta(days=days_until_sunday)
 
-    times = [11, 13, 15, 18]  # Hours for the sessions
+    # One slot per bit of the availability mask (see time_slots.py)
     slots = []
-
-    for day_offset in range(7):  # Only 7 days for one full week
-        this_day = start_day + timedelta(days=day_offset)
+    for bit in range(SLOT_COUNT):
+        value = slot_value(start_day, bit)  # Stored in DB
+        dt = datetime.fromisoformat(value)
 
         # Example label: "Sun 01.12. 11:00"
-        prefix = this_day.strftime('%a %d.%m.')
-
-        for hour in times:
-            dt = datetime.combine(this_day, time(hour, 0))
-            label = f"{prefix} {dt.strftime('%H:%M')}"
-            value = dt.isoformat()  # Stored in DB
-            slots.append({'value': value, 'label': label})
+        label = f"{dt.strftime('%a %d.%m.')} {dt.strftime('%H:%M')}"
+        slots.append({'value': value, 'label': label})
 
     return slots
 
@@ -288,8 +308,12 @@ def demographics():
             current_user.time_slot_1 = slot1
             current_user.time_slot_2 = slot2
             current_user.time_slot_3 = slot3
+            # Language and slots decide the user's matching buckets
+            notify_eligibility_change(current_user.id)
             db.session.commit()
 
+            candidate_index.update_user(current_user)
+
             find_matches_for_user(current_user.id)
             flash('Questionnaire and timeslots data saved. We will notify you when a match is found.', 'success')
             return redirect(url_for('views.endofq1'))
@@ -316,60 +340,12 @@ def find_matches_for_user(user_id):
             return
 
         matched_user, score, decision, common_slot = result
-        match = MatchingService.create_match(user, matched_user, score, decision, common_slot)
-
-        # Mark both users as matched
-        user.haspartner = True
-        matched_user.haspartner = True
-        user.partner_id = matched_user.id
-        matched_user.partner_id = user.id
-        user.meeting_id = user.id
-        matched_user.meeting_id = user.id
 
-        db.session.commit()
-
-        # ---------- Format the time slot for email ----------
-        slot_label = None
-        if common_slot:
-            try:
-                dt = datetime.fromisoformat(common_slot)
-                slot_label = dt.strftime('%A, %d %B %Y, %H:%M')
-            except Exception as e:
-                print(f"[MATCH] Could not parse common_slot '{common_slot}': {e}")
-                slot_label = common_slot  # fallback
-
-        # ---------- Send notification emails to both users ----------
-        try:
-            html_a = render_template(
-                'Email/zusage.html',
-                user=user,
-                partner=matched_user,
-                topic=user.topic,
-                slot_label=slot_label
-            )
-            html_b = render_template(
-                'Email/zusage.html',
-                user=matched_user,
-                partner=user,
-                topic=matched_user.topic,
-                slot_label=slot_label
-            )
-
-            ok_a = send_email_safe(
-                subject='You have been matched for a dialogue session',
-                recipients=[user.email],
-                html=html_a,
-            )
-            ok_b = send_email_safe(
-                subject='You have been matched for a dialogue session',
-                recipients=[matched_user.email],
-                html=html_b,
-            )
-
-            print(f"[MATCH] Email status A={ok_a}, B={ok_b} for {user.email} & {matched_user.email}")
-
-        except Exception as mail_exc:
-            print(f"[MATCH] Warning: failed to send match emails: {mail_exc}")
+        # Schedules the session, creates the match, marks both users as
+        # matched and queues the notification emails
+        match_id = MatchingService.pair_and_notify(user, matched_user, score, decision, common_slot)
+        if not match_id:
+            print(f"[MATCH] Could not create a match for user {user_id}")
 
     except Exception as exc:
         print(f"[MATCH] Error during matching: {exc}")
@@ -395,25 +371,49 @@ def introduction():
 def waitpage():
     try:
         partner = User.query.get(current_user.partner_id) if current_user.partner_id else None
-        current_user.hasarrived = True
-        db.session.commit()
-
         is_test_mode = request.args.get('test') == '4'
 
         if request.method == 'POST':
-            if is_test_mode or (partner and getattr(partner, 'hasarrived', False)):
+            # Plain status check (no write); the page itself polls waitpage_poll
+            if is_test_mode or (partner and partner.hasarrived):
                 return 'partner_arrived'
             return 'no_partner_arrived'
 
+        user_arrived(current_user)
+
         if is_test_mode and partner:
-            partner.hasarrived = True
-            db.session.commit()
+            user_arrived(partner)
 
-        return render_template('Interaction/waitPage.html', user=current_user, test_mode=is_test_mode)
+        return render_template('Interaction/waitPage.html', user=current_user, test_mode=is_test_mode,
+                               poll_interval=POLL_INTERVAL)
     except Exception:
         return render_template('Interaction/waitPage.html', user=current_user)
 
 
+@views.route('/Interaction/WaitingPage/events')
+@login_required
+def waitpage_events():
+    """Server-sent events: one 'partner_arrived' event as soon as the partner is there."""
+    if request.args.get('test') == '4':
+        events = iter(["event: partner_arrived\ndata: {}\n\n"])
+    else:
+        events = stream_with_context(arrival_events(current_user.partner_id))
+    return Response(events, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@views.route('/Interaction/WaitingPage/poll')
+@login_required
+def waitpage_poll():
+    """Short poll (fallback without EventSource): answers right away whether the partner has arrived."""
+    if request.args.get('test') == '4':
+        return 'partner_arrived'
+
+    if partner_arrived(current_user.partner_id):
+        return 'partner_arrived'
+    return 'no_partner_arrived'
+
+
 @views.route('/Interaction/climate')
 @login_required
 def climate():
@@ -429,8 +429,7 @@ def opinion():
 @views.route('/Interaction/future')
 @login_required
 def future():
-    current_user.hasarrived = False
-    db.session.commit()
+    user_left(current_user)
     return render_template('Interaction/future.html', user=current_user)
 
 
@@ -446,6 +445,11 @@ def post_match_questionnaire():
 
     if request.method == 'POST':
         try:
+            # Answers of an earlier submission, to replace them in the cohort statistics
+            previous_answers = post_answers(current_user)
+            if all(v is None for v in previous_answers):
+                previous_answers = None
+
             for f in fields:
                 val = request.form.get(f)
                 if val in (None, ''):
@@ -457,15 +461,22 @@ def post_match_questionnaire():
                         except (ValueError, TypeError):
                             val = None
                 setattr(current_user, f, val)
-                print(f"[DEBUG] {f} = {getattr(current_user, f)}")  # Debug print
 
             db.session.commit()
-            return redirect(url_for('views.discussion_evaluation'))
-
         except Exception as exc:
             db.session.rollback()
             print(f"Error saving post match questionnaire: {exc}")
             flash('There was an error saving your answers. Please try again.', 'error')
+            return render_template('Questionnaire2/post_match_questionnaire.html', user=current_user)
+
+        # The answers are saved; a failed statistics update is repaired by the next rebuild
+        try:
+            record_post_questionnaire(current_user, previous_answers)
+            db.session.commit()
+        except Exception as exc:
+            db.session.rollback()
+            print(f"[COHORT] Could not update the cohort statistics of user {current_user.id}: {exc}")
+        return redirect(url_for('views.discussion_evaluation'))
 
     return render_template('Questionnaire2/post_match_questionnaire.html', user=current_user)
 
@@ -562,6 +573,13 @@ def opinion_shift_analysis():
         openness_score = getattr(current_user, 'openness_score', None)
         openness_category = get_openness_category(openness_score) if openness_score is not None else None
 
+        # The user's shift against their cohort, from the cached snapshots
+        try:
+            cohort = cohort_comparison(current_user, avg_shift)
+        except Exception as e:
+            print(f"[COHORT] Could not load the cohort statistics: {e}")
+            cohort = {}
+
         return render_template(
             'Questionnaire2/opinion_shift_analysis.html',
             user=current_user,
@@ -573,7 +591,8 @@ def opinion_shift_analysis():
             avg_before=avg_before,
             avg_after=avg_after,
             openness_score=openness_score,
-            openness_category=openness_category
+            openness_category=openness_category,
+            cohort=cohort
         )
 
     except Exception as e:
@@ -595,15 +614,7 @@ def closing():
 
     try:
         if getattr(current_user, 'behaviour_score', None):
-            html = render_template('Email/auszahlung.html', user=current_user)
-            ok = send_email_safe(
-                subject='Payout Information',
-                recipients=[current_user.email],
-                html=html,
-            )
-            if not ok:
-                print(f"Error sending payout email to {current_user.email}")
-                flash('There was an error sending the payout email. Please contact the study administrator.', 'error')
+            enqueue_notification("payout", current_user.id)
     except Exception as exc:
         print(f"Error sending payout email: {exc}")
         flash('There was an error sending the payout email. Please contact the study administrator.', 'error')